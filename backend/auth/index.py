@@ -1,19 +1,134 @@
-import json
 import os
-import hashlib
-import hmac
+import sys
 from typing import Dict, Any
-import psycopg2
 
-def hash_password(password: str) -> str:
-    return hashlib.sha256(password.encode()).hexdigest()
+FUNCTION_DIR = os.path.dirname(os.path.abspath(__file__))
+# Deployed copies carry shared/ beside index.py (scripts/vendor_shared.py); a checkout uses backend/shared
+sys.path.insert(0, FUNCTION_DIR if os.path.isdir(os.path.join(FUNCTION_DIR, 'shared'))
+                else os.path.dirname(FUNCTION_DIR))
 
-def verify_password(password: str, password_hash: str) -> bool:
-    return hash_password(password) == password_hash
+from shared.db import connection
+from shared.http import JSON_HEADERS, Api, HttpError, Request, json_response, too_many_requests
+from shared.passwords import (DUMMY_HASH, PasswordBusy, hash_password_limited, needs_rehash,
+                              verify_password_limited)
+from shared.ratelimit import limiter_from_env
+from shared.tokens import issue_token, revoke_token, verify_token
+
+api = Api('auth', 'Content-Type, X-Session-Token')
+
+USERNAME_LIMITER = limiter_from_env('LOGIN_USER_RATE', burst=5, per_minute=10)
+IP_LIMITER = limiter_from_env('LOGIN_IP_RATE', burst=20, per_minute=30)
+# How long a login waits for a free KDF slot before answering 503
+VERIFY_TIMEOUT = float(os.environ.get('PASSWORD_VERIFY_TIMEOUT', '10'))
+
+
+def password_busy() -> Dict[str, Any]:
+    headers = dict(JSON_HEADERS)
+    headers['Retry-After'] = '1'
+    return json_response(503, {'error': 'Too many logins in progress, retry'}, headers)
+
+
+def login(request: Request, body_data: Dict[str, Any]) -> Dict[str, Any]:
+    username = body_data.get('username', '')
+    password = body_data.get('password', '')
+
+    if not isinstance(username, str) or not isinstance(password, str) or not username or not password:
+        raise HttpError(400, 'Username and password required')
+
+    retry_after = max(IP_LIMITER.acquire(request.source_ip), USERNAME_LIMITER.acquire(username.lower()))
+    if retry_after > 0:
+        return too_many_requests(retry_after, 'Too many login attempts')
+
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT id, username, role, password_hash FROM users WHERE username = %s",
+            (username,)
+        )
+        user = cur.fetchone()
+        cur.close()
+
+    stored_hash = user[3] if user else DUMMY_HASH
+    try:
+        valid = verify_password_limited(password, stored_hash, VERIFY_TIMEOUT)
+    except PasswordBusy:
+        return password_busy()
+
+    if not user or not valid:
+        raise HttpError(401, 'Invalid credentials')
+
+    user_id, username, role, stored_hash = user
+
+    new_hash = None
+    if needs_rehash(stored_hash):
+        try:
+            new_hash = hash_password_limited(password, VERIFY_TIMEOUT)
+        except PasswordBusy:
+            pass  # the login itself succeeded; upgrade the hash on a later one
+    if new_hash is not None:
+        with connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "UPDATE users SET password_hash = %s WHERE id = %s AND password_hash = %s",
+                (new_hash, user_id, stored_hash)
+            )
+            conn.commit()
+            cur.close()
+
+    session_token = issue_token(user_id, username, role)
+
+    return json_response(200, {
+        'success': True,
+        'user': {
+            'id': user_id,
+            'username': username,
+            'role': role
+        },
+        'sessionToken': session_token
+    })
+
+
+def verify(request: Request, body_data: Dict[str, Any]) -> Dict[str, Any]:
+    claims = verify_token(body_data.get('sessionToken', ''))
+
+    if claims is None:
+        return json_response(401, {'valid': False})
+
+    return json_response(200, {
+        'valid': True,
+        'user': {
+            'id': claims['sub'],
+            'username': claims['usr'],
+            'role': claims['role']
+        },
+        'expiresAt': claims['exp']
+    })
+
+
+def logout(request: Request, body_data: Dict[str, Any]) -> Dict[str, Any]:
+    claims = verify_token(body_data.get('sessionToken', ''))
+
+    if claims is not None:
+        revoke_token(claims)
+
+    return json_response(200, {'success': True})
+
+
+ACTIONS = {
+    'login': login,
+    'verify': verify,
+    'logout': logout,
+}
+
+
+@api.route('POST')
+def dispatch_action(request: Request) -> Dict[str, Any]:
+    body_data = request.json()
+    action = ACTIONS.get(body_data.get('action', 'login'))
+    if action is None:
+        raise HttpError(400, 'Invalid action')
+    return action(request, body_data)
 
-def create_session_token(user_id: int, username: str, role: str) -> str:
-    data = f"{user_id}:{username}:{role}"
-    return hashlib.sha256(data.encode()).hexdigest()
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
@@ -21,107 +136,4 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     Args: event with httpMethod, body
     Returns: HTTP response with user session data
     '''
-    method: str = event.get('httpMethod', 'GET')
-    
-    if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Session-Token',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
-    
-    if method != 'POST':
-        return {
-            'statusCode': 405,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'error': 'Method not allowed'}),
-            'isBase64Encoded': False
-        }
-    
-    body_data = json.loads(event.get('body', '{}'))
-    action = body_data.get('action', 'login')
-    
-    database_url = os.environ.get('DATABASE_URL')
-    
-    if action == 'login':
-        username = body_data.get('username', '')
-        password = body_data.get('password', '')
-        
-        if not username or not password:
-            return {
-                'statusCode': 400,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Username and password required'}),
-                'isBase64Encoded': False
-            }
-        
-        password_hash = hash_password(password)
-        
-        conn = psycopg2.connect(database_url)
-        try:
-            cur = conn.cursor()
-            cur.execute(
-                "SELECT id, username, role FROM users WHERE username = %s AND password_hash = %s",
-                (username, password_hash)
-            )
-            user = cur.fetchone()
-            cur.close()
-        finally:
-            conn.close()
-        
-        if not user:
-            return {
-                'statusCode': 401,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'error': 'Invalid credentials'}),
-                'isBase64Encoded': False
-            }
-        
-        user_id, username, role = user
-        session_token = create_session_token(user_id, username, role)
-        
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({
-                'success': True,
-                'user': {
-                    'id': user_id,
-                    'username': username,
-                    'role': role
-                },
-                'sessionToken': session_token
-            }),
-            'isBase64Encoded': False
-        }
-    
-    elif action == 'verify':
-        session_token = body_data.get('sessionToken', '')
-        
-        if not session_token:
-            return {
-                'statusCode': 401,
-                'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-                'body': json.dumps({'valid': False}),
-                'isBase64Encoded': False
-            }
-        
-        return {
-            'statusCode': 200,
-            'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-            'body': json.dumps({'valid': True}),
-            'isBase64Encoded': False
-        }
-    
-    return {
-        'statusCode': 400,
-        'headers': {'Content-Type': 'application/json', 'Access-Control-Allow-Origin': '*'},
-        'body': json.dumps({'error': 'Invalid action'}),
-        'isBase64Encoded': False
-    }
\ No newline at end of file
+    return api.dispatch(event, context)
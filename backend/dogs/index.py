@@ -1,8 +1,170 @@
-import json
 import os
-from typing import Dict, Any, List
-import psycopg2
-import psycopg2.extras
+import sys
+from typing import Dict, Any
+
+FUNCTION_DIR = os.path.dirname(os.path.abspath(__file__))
+# Deployed copies carry shared/ beside index.py (scripts/vendor_shared.py); a checkout uses backend/shared
+sys.path.insert(0, FUNCTION_DIR if os.path.isdir(os.path.join(FUNCTION_DIR, 'shared'))
+                else os.path.dirname(FUNCTION_DIR))
+
+from shared.bulk import check_items, delete_many, insert_many, parse_ids, update_many
+from shared.cache import create_cache
+from shared.catalog import DOG_FIELDS, DOG_ORDER, DOGS_VERSION_SQL, query_dogs
+from shared.db import connection
+from shared.http import Api, Request, cached_response, dumps, json_response
+from shared.images import attach_variants
+from shared.listing import cache_key, parse_listing
+from shared.patch import expected_version, parse_changes, parse_row_id, update_row, written_response
+from shared.snapshots import publish_snapshots, read_snapshot
+from shared.statements import execute, register
+
+LIST_CACHE = create_cache(DOGS_VERSION_SQL)
+
+DOG_COLUMNS = ['name', 'gender', 'breed', 'titles', 'achievements', 'parents', 'image_url', 'image_variants',
+               'sire_id', 'dam_id']
+DOG_CASTS = {'titles': 'text[]', 'image_variants': 'jsonb', 'sire_id': 'integer', 'dam_id': 'integer'}
+# image_variants is derived from image_url, never patched directly
+PATCH_COLUMNS = [column for column in DOG_COLUMNS if column != 'image_variants']
+
+INSERT_DOG = register('dogs_insert', """INSERT INTO dogs (name, gender, breed, titles, achievements, parents, image_url,
+    image_variants, sire_id, dam_id)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING id""")
+DELETE_DOG = register('dogs_delete', "DELETE FROM dogs WHERE id=%s")
+
+api = Api('dogs', 'Content-Type, X-Session-Token, X-User-Role, If-None-Match, If-Match')
+
+
+def after_write() -> None:
+    LIST_CACHE.invalidate()
+    publish_snapshots(['dogs', 'home'])
+
+
+def dog_values(item: Dict[str, Any]) -> tuple:
+    return (
+        item.get('name'),
+        item.get('gender'),
+        item.get('breed'),
+        item.get('titles', []),
+        item.get('achievements'),
+        item.get('parents'),
+        item.get('image_url'),
+        item.get('image_variants'),
+        item.get('sire_id'),
+        item.get('dam_id')
+    )
+
+
+@api.route('GET')
+def list_dogs(request: Request) -> Dict[str, Any]:
+    listing = parse_listing(request.query, DOG_FIELDS, len(DOG_ORDER))
+    key = cache_key('dogs', listing, DOG_FIELDS)
+    entry = read_snapshot(key) if key == 'dogs' else None
+    if entry is None:
+        entry = LIST_CACHE.get_or_load(key, lambda conn: dumps(query_dogs(conn, listing)))
+    return cached_response(request.event, entry)
+
+
+@api.route('POST', admin=True)
+def create_dogs(request: Request) -> Dict[str, Any]:
+    body_data = request.json()
+
+    if isinstance(body_data, list):
+        items = check_items(body_data)
+        attach_variants(items)
+        with connection() as conn:
+            new_ids = insert_many(conn, 'dogs', DOG_COLUMNS, [dog_values(item) for item in items], DOG_CASTS)
+            conn.commit()
+        after_write()
+        return json_response(201, {
+            'success': True,
+            'results': [{'index': index, 'id': new_id} for index, new_id in enumerate(new_ids)]
+        })
+
+    attach_variants([body_data])
+    with connection() as conn:
+        cur = conn.cursor()
+        execute(cur, INSERT_DOG, dog_values(body_data))
+        new_id = cur.fetchone()[0]
+        conn.commit()
+        cur.close()
+    after_write()
+
+    return json_response(201, {'id': new_id, 'success': True})
+
+
+@api.route('PUT', admin=True)
+def update_dogs(request: Request) -> Dict[str, Any]:
+    body_data = request.json()
+
+    if isinstance(body_data, list):
+        items = check_items(body_data, require_id=True)
+        attach_variants(items)
+        with connection() as conn:
+            updated = set(update_many(
+                conn, 'dogs', DOG_COLUMNS,
+                [(item['id'],) + dog_values(item) for item in items], DOG_CASTS
+            ))
+            conn.commit()
+        after_write()
+        return json_response(200, {
+            'success': True,
+            'results': [{'id': item['id'], 'updated': item['id'] in updated} for item in items]
+        })
+
+    dog_id = parse_row_id(request, body_data)
+    version = expected_version(request, body_data)
+    attach_variants([body_data])
+
+    with connection() as conn:
+        changes = dict(zip(DOG_COLUMNS, dog_values(body_data)))
+        updated_at = update_row(conn, 'dogs', dog_id, changes, DOG_CASTS, version)
+        conn.commit()
+    after_write()
+
+    return written_response(200, dog_id, updated_at)
+
+
+@api.route('PATCH', admin=True)
+def patch_dog(request: Request) -> Dict[str, Any]:
+    body_data = request.json()
+    changes = parse_changes(body_data, PATCH_COLUMNS)
+    dog_id = parse_row_id(request, body_data)
+    version = expected_version(request, body_data)
+    if 'image_url' in changes:
+        attach_variants([changes])
+
+    with connection() as conn:
+        updated_at = update_row(conn, 'dogs', dog_id, changes, DOG_CASTS, version)
+        conn.commit()
+    after_write()
+
+    return written_response(200, dog_id, updated_at)
+
+
+@api.route('DELETE', admin=True)
+def delete_dogs(request: Request) -> Dict[str, Any]:
+    if request.query.get('ids'):
+        ids = parse_ids(request.query['ids'])
+        with connection() as conn:
+            deleted = set(delete_many(conn, 'dogs', ids))
+            conn.commit()
+        after_write()
+        return json_response(200, {
+            'success': True,
+            'results': [{'id': item_id, 'deleted': item_id in deleted} for item_id in ids]
+        })
+
+    dog_id = request.query.get('id')
+
+    with connection() as conn:
+        cur = conn.cursor()
+        execute(cur, DELETE_DOG, (dog_id,))
+        conn.commit()
+        cur.close()
+    after_write()
+
+    return json_response(200, {'success': True})
+
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
@@ -10,178 +172,4 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     Args: event with httpMethod, body, queryStringParameters
     Returns: HTTP response with dogs data
     '''
-    method: str = event.get('httpMethod', 'GET')
-    
-    if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Session-Token, X-User-Role',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
-    
-    database_url = os.environ.get('DATABASE_URL')
-    headers = {
-        'Content-Type': 'application/json',
-        'Access-Control-Allow-Origin': '*'
-    }
-    
-    if method == 'GET':
-        conn = psycopg2.connect(database_url)
-        try:
-            cur = conn.cursor()
-            cur.execute(
-                "SELECT id, name, gender, breed, titles, achievements, parents, image_url FROM dogs ORDER BY id"
-            )
-            rows = cur.fetchall()
-            cur.close()
-        finally:
-            conn.close()
-        
-        dogs = []
-        for row in rows:
-            dogs.append({
-                'id': row[0],
-                'name': row[1],
-                'gender': row[2],
-                'breed': row[3],
-                'titles': row[4] if row[4] else [],
-                'achievements': row[5],
-                'parents': row[6],
-                'image_url': row[7]
-            })
-        
-        return {
-            'statusCode': 200,
-            'headers': headers,
-            'body': json.dumps({'dogs': dogs}),
-            'isBase64Encoded': False
-        }
-    
-    elif method == 'POST':
-        user_role = event.get('headers', {}).get('X-User-Role', 'guest')
-        
-        if user_role != 'admin':
-            return {
-                'statusCode': 403,
-                'headers': headers,
-                'body': json.dumps({'error': 'Admin access required'}),
-                'isBase64Encoded': False
-            }
-        
-        body_data = json.loads(event.get('body', '{}'))
-        
-        conn = psycopg2.connect(database_url)
-        try:
-            cur = conn.cursor()
-            cur.execute(
-                """INSERT INTO dogs (name, gender, breed, titles, achievements, parents, image_url)
-                   VALUES (%s, %s, %s, %s, %s, %s, %s) RETURNING id""",
-                (
-                    body_data.get('name'),
-                    body_data.get('gender'),
-                    body_data.get('breed'),
-                    body_data.get('titles', []),
-                    body_data.get('achievements'),
-                    body_data.get('parents'),
-                    body_data.get('image_url')
-                )
-            )
-            new_id = cur.fetchone()[0]
-            conn.commit()
-            cur.close()
-        finally:
-            conn.close()
-        
-        return {
-            'statusCode': 201,
-            'headers': headers,
-            'body': json.dumps({'id': new_id, 'success': True}),
-            'isBase64Encoded': False
-        }
-    
-    elif method == 'PUT':
-        user_role = event.get('headers', {}).get('X-User-Role', 'guest')
-        
-        if user_role != 'admin':
-            return {
-                'statusCode': 403,
-                'headers': headers,
-                'body': json.dumps({'error': 'Admin access required'}),
-                'isBase64Encoded': False
-            }
-        
-        body_data = json.loads(event.get('body', '{}'))
-        dog_id = body_data.get('id')
-        
-        conn = psycopg2.connect(database_url)
-        try:
-            cur = conn.cursor()
-            cur.execute(
-                """UPDATE dogs SET name=%s, gender=%s, breed=%s, titles=%s, 
-                   achievements=%s, parents=%s, image_url=%s, updated_at=CURRENT_TIMESTAMP
-                   WHERE id=%s""",
-                (
-                    body_data.get('name'),
-                    body_data.get('gender'),
-                    body_data.get('breed'),
-                    body_data.get('titles', []),
-                    body_data.get('achievements'),
-                    body_data.get('parents'),
-                    body_data.get('image_url'),
-                    dog_id
-                )
-            )
-            conn.commit()
-            cur.close()
-        finally:
-            conn.close()
-        
-        return {
-            'statusCode': 200,
-            'headers': headers,
-            'body': json.dumps({'success': True}),
-            'isBase64Encoded': False
-        }
-    
-    elif method == 'DELETE':
-        user_role = event.get('headers', {}).get('X-User-Role', 'guest')
-        
-        if user_role != 'admin':
-            return {
-                'statusCode': 403,
-                'headers': headers,
-                'body': json.dumps({'error': 'Admin access required'}),
-                'isBase64Encoded': False
-            }
-        
-        params = event.get('queryStringParameters', {})
-        dog_id = params.get('id')
-        
-        conn = psycopg2.connect(database_url)
-        try:
-            cur = conn.cursor()
-            cur.execute("DELETE FROM dogs WHERE id=%s", (dog_id,))
-            conn.commit()
-            cur.close()
-        finally:
-            conn.close()
-        
-        return {
-            'statusCode': 200,
-            'headers': headers,
-            'body': json.dumps({'success': True}),
-            'isBase64Encoded': False
-        }
-    
-    return {
-        'statusCode': 405,
-        'headers': headers,
-        'body': json.dumps({'error': 'Method not allowed'}),
-        'isBase64Encoded': False
-    }
\ No newline at end of file
+    return api.dispatch(event, context)
@@ -0,0 +1,389 @@
+import abc
+import asyncio
+import json
+import os
+import smtplib
+import time
+import traceback
+import urllib.request
+from email.message import EmailMessage
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from shared.db import connection
+from shared.metrics import log_event
+
+CHANNEL = 'notification_outbox'
+TELEGRAM_MAX_TEXT = 4096
+
+
+class Transport(abc.ABC):
+    '''
+    One notification channel. send() receives a batch of outbox events
+    ({'id', 'topic', 'payload'}) and raises to have the whole batch retried.
+    Only events whose topic is in topics are sent to it; other rows count
+    as already delivered for this transport. Subclasses must implement
+    send(); one that does not fails when it is constructed.
+    '''
+
+    name = 'transport'
+    topics = ('message.created',)
+
+    def accepts(self, topic: str) -> bool:
+        return topic in self.topics
+
+    @abc.abstractmethod
+    async def send(self, events: List[Dict[str, Any]]) -> None:
+        ...
+
+
+def render_event(event: Dict[str, Any]) -> str:
+    payload = event['payload']
+    if event['topic'] != 'message.created':
+        return '%s: %s' % (event['topic'], json.dumps(payload, ensure_ascii=False))
+    contact = payload.get('email') or ''
+    if payload.get('phone'):
+        contact += ', ' + payload['phone']
+    return 'Сообщение #%s от %s (%s):\n%s' % (payload.get('id'), payload.get('name'), contact, payload.get('message'))
+
+
+def render_digest(events: List[Dict[str, Any]]) -> str:
+    header = 'Новых сообщений: %d' % len(events)
+    return '\n\n'.join([header] + [render_event(event) for event in events])
+
+
+def post_json(url: str, payload: Any, timeout: float) -> None:
+    '''Blocking POST; urlopen raises HTTPError for 4xx/5xx answers.'''
+    request = urllib.request.Request(
+        url,
+        data=json.dumps(payload, ensure_ascii=False, default=str).encode('utf-8'),
+        headers={'Content-Type': 'application/json; charset=utf-8'},
+        method='POST'
+    )
+    with urllib.request.urlopen(request, timeout=timeout) as answer:
+        answer.read()
+
+
+class WebhookTransport(Transport):
+    '''POSTs {"events": [...]} to NOTIFY_WEBHOOK_URL, one request per batch.'''
+
+    name = 'webhook'
+
+    def __init__(self, url: str, timeout: float = 10.0):
+        self.url = url
+        self.timeout = timeout
+
+    async def send(self, events: List[Dict[str, Any]]) -> None:
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, post_json, self.url, {'events': events}, self.timeout)
+
+
+class TelegramTransport(Transport):
+    '''One Bot API sendMessage per batch with a plain-text digest.'''
+
+    name = 'telegram'
+
+    def __init__(self, token: str, chat_id: str, timeout: float = 10.0):
+        self.url = 'https://api.telegram.org/bot%s/sendMessage' % token
+        self.chat_id = chat_id
+        self.timeout = timeout
+
+    async def send(self, events: List[Dict[str, Any]]) -> None:
+        text = render_digest(events)
+        if len(text) > TELEGRAM_MAX_TEXT:
+            text = text[:TELEGRAM_MAX_TEXT - 1] + '…'
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(
+            None, post_json, self.url, {'chat_id': self.chat_id, 'text': text}, self.timeout
+        )
+
+
+class EmailTransport(Transport):
+    '''One digest e-mail per batch over SMTP (STARTTLS when credentials are set).'''
+
+    name = 'email'
+
+    def __init__(self, host: str, port: int, sender: str, recipients: List[str],
+                 user: Optional[str] = None, password: Optional[str] = None, timeout: float = 10.0):
+        self.host = host
+        self.port = port
+        self.sender = sender
+        self.recipients = recipients
+        self.user = user
+        self.password = password
+        self.timeout = timeout
+
+    def _deliver(self, message: EmailMessage) -> None:
+        with smtplib.SMTP(self.host, self.port, timeout=self.timeout) as smtp:
+            if self.user:
+                smtp.starttls()
+                smtp.login(self.user, self.password or '')
+            smtp.send_message(message)
+
+    async def send(self, events: List[Dict[str, Any]]) -> None:
+        message = EmailMessage()
+        message['Subject'] = 'Новых сообщений: %d' % len(events)
+        message['From'] = self.sender
+        message['To'] = ', '.join(self.recipients)
+        message.set_content(render_digest(events))
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(None, self._deliver, message)
+
+
+class StubTransport(Transport):
+    '''
+    In-memory stand-in for tests and local runs: records every batch in
+    sent, and raises for the next fail_times sends.
+    '''
+
+    def __init__(self, name: str = 'stub', fail_times: int = 0):
+        self.name = name
+        self.fail_times = fail_times
+        self.sent: List[List[Dict[str, Any]]] = []
+
+    async def send(self, events: List[Dict[str, Any]]) -> None:
+        if self.fail_times > 0:
+            self.fail_times -= 1
+            raise RuntimeError('stub transport failure')
+        self.sent.append(events)
+        log_event('notify_stub', transport=self.name, events=len(events))
+
+
+def _email_from_env() -> EmailTransport:
+    return EmailTransport(
+        os.environ['SMTP_HOST'],
+        int(os.environ.get('SMTP_PORT', '587')),
+        os.environ['NOTIFY_EMAIL_FROM'],
+        [address.strip() for address in os.environ['NOTIFY_EMAIL_TO'].split(',') if address.strip()],
+        os.environ.get('SMTP_USER'),
+        os.environ.get('SMTP_PASSWORD'),
+    )
+
+
+TRANSPORTS: Dict[str, Callable[[], Transport]] = {
+    'webhook': lambda: WebhookTransport(os.environ['NOTIFY_WEBHOOK_URL']),
+    'telegram': lambda: TelegramTransport(os.environ['TELEGRAM_BOT_TOKEN'], os.environ['TELEGRAM_CHAT_ID']),
+    'email': _email_from_env,
+    'stub': StubTransport,
+}
+
+
+def register_transport(name: str, factory: Callable[[], Transport]) -> None:
+    TRANSPORTS[name] = factory
+
+
+def transports_from_env() -> List[Transport]:
+    '''NOTIFY_TRANSPORTS is a comma-separated list of TRANSPORTS names; unset means none.'''
+    names = [name.strip() for name in os.environ.get('NOTIFY_TRANSPORTS', '').split(',') if name.strip()]
+    unknown = [name for name in names if name not in TRANSPORTS]
+    if unknown:
+        raise ValueError('Unknown NOTIFY_TRANSPORTS: ' + ', '.join(unknown))
+    return [TRANSPORTS[name]() for name in names]
+
+
+CLAIM_SQL = """
+    UPDATE notification_outbox SET next_attempt_at = CURRENT_TIMESTAMP + make_interval(secs => %s)
+    WHERE id IN (
+        SELECT id FROM notification_outbox
+        WHERE done_at IS NULL AND attempts < %s AND next_attempt_at <= CURRENT_TIMESTAMP
+        ORDER BY next_attempt_at, id
+        LIMIT %s
+        FOR UPDATE SKIP LOCKED
+    )
+    RETURNING id, topic, payload, delivered, attempts
+"""
+
+SETTLE_SQL = """
+    UPDATE notification_outbox o SET
+        delivered = v.delivered::jsonb,
+        done_at = CASE WHEN v.done THEN CURRENT_TIMESTAMP END,
+        attempts = o.attempts + CASE WHEN v.done THEN 0 ELSE 1 END,
+        next_attempt_at = CASE WHEN v.done THEN o.next_attempt_at
+            ELSE CURRENT_TIMESTAMP + make_interval(secs => least(%s, 2 ^ o.attempts)) END,
+        last_error = v.error
+    FROM (VALUES %%s) AS v (id, delivered, done, error)
+    WHERE o.id = v.id
+"""
+
+
+class Dispatcher:
+    '''
+    Delivers notification_outbox rows to every transport, in batches.
+
+    claim() leases up to batch_size due rows (FOR UPDATE SKIP LOCKED, so
+    several dispatchers can run side by side) by pushing next_attempt_at
+    lease seconds ahead, and commits before any network I/O. Each transport
+    then gets one send() with the rows it has not delivered yet, all
+    transports concurrently. settle() records per-transport success; rows
+    with a failed transport are retried after 1 s .. max_backoff with
+    exponential backoff and stay in the table after max_attempts.
+    '''
+
+    def __init__(self, transports: List[Transport], batch_size: int = 50, max_attempts: int = 10,
+                 lease: float = 60.0, max_backoff: float = 3600.0, retention_days: int = 30):
+        self.transports = transports
+        self.batch_size = batch_size
+        self.max_attempts = max_attempts
+        self.lease = lease
+        self.max_backoff = max_backoff
+        self.retention_days = retention_days
+
+    def claim(self) -> List[Dict[str, Any]]:
+        with connection() as conn:
+            cur = conn.cursor()
+            cur.execute(CLAIM_SQL, (self.lease, self.max_attempts, self.batch_size))
+            rows = cur.fetchall()
+            conn.commit()
+            cur.close()
+        return sorted(
+            ({'id': row[0], 'topic': row[1], 'payload': row[2], 'delivered': row[3] or {}, 'attempts': row[4]}
+             for row in rows),
+            key=lambda row: row['id']
+        )
+
+    def settle(self, rows: List[Dict[str, Any]], errors: Dict[str, Optional[str]]) -> None:
+        '''errors maps transport name to its failure message, or None when the send succeeded.'''
+        values = []
+        for row in rows:
+            delivered = dict(row['delivered'])
+            failures = []
+            for transport in self.transports:
+                name = transport.name
+                if name in delivered or not transport.accepts(row['topic']):
+                    continue
+                if errors.get(name) is None:
+                    delivered[name] = True
+                else:
+                    failures.append('%s: %s' % (name, errors[name]))
+            values.append((row['id'], json.dumps(delivered), not failures, '; '.join(failures) or None))
+
+        from psycopg2.extras import execute_values
+
+        with connection() as conn:
+            cur = conn.cursor()
+            execute_values(cur, SETTLE_SQL % self.max_backoff, values, page_size=len(values))
+            conn.commit()
+            cur.close()
+
+    async def _send(self, transport: Transport, events: List[Dict[str, Any]]) -> Optional[str]:
+        if not events:
+            return None
+        try:
+            await transport.send(events)
+        except Exception as e:
+            traceback.print_exc()
+            return str(e) or type(e).__name__
+        return None
+
+    async def dispatch_once(self) -> int:
+        '''
+        Returns: number of outbox rows claimed (0 when nothing was due)
+        '''
+        loop = asyncio.get_running_loop()
+        rows = await loop.run_in_executor(None, self.claim)
+        if not rows:
+            return 0
+
+        results = await asyncio.gather(*(
+            self._send(transport, [
+                {'id': row['id'], 'topic': row['topic'], 'payload': row['payload']}
+                for row in rows
+                if transport.name not in row['delivered'] and transport.accepts(row['topic'])
+            ])
+            for transport in self.transports
+        ))
+        errors = {transport.name: error for transport, error in zip(self.transports, results)}
+        await loop.run_in_executor(None, self.settle, rows, errors)
+        return len(rows)
+
+    async def drain(self, budget: Optional[float] = None) -> int:
+        '''Dispatch full batches until the outbox has nothing due or budget seconds have passed.'''
+        deadline = None if budget is None else time.monotonic() + budget
+        total = 0
+        while deadline is None or time.monotonic() < deadline:
+            claimed = await self.dispatch_once()
+            total += claimed
+            if claimed < self.batch_size:
+                break
+        return total
+
+    def prune(self) -> int:
+        with connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                "DELETE FROM notification_outbox WHERE done_at < CURRENT_TIMESTAMP - make_interval(days => %s)",
+                (self.retention_days,)
+            )
+            deleted = cur.rowcount
+            conn.commit()
+            cur.close()
+        return deleted
+
+    async def run_forever(self, poll_interval: float = 30.0) -> None:
+        '''
+        Long-running worker: LISTEN on the outbox channel for immediate wake-ups,
+        polling every poll_interval seconds for retries that came due.
+        '''
+        import psycopg2
+        import psycopg2.extensions
+
+        loop = asyncio.get_running_loop()
+        listener = psycopg2.connect(os.environ.get('DATABASE_URL', ''))
+        listener.set_isolation_level(psycopg2.extensions.ISOLATION_LEVEL_AUTOCOMMIT)
+        listener.cursor().execute('LISTEN ' + CHANNEL)
+        woken = asyncio.Event()
+        loop.add_reader(listener.fileno(), woken.set)
+        delay = poll_interval
+        try:
+            while True:
+                try:
+                    await self.drain()
+                    delay = poll_interval
+                except Exception:
+                    # database unavailable: back off instead of spinning
+                    traceback.print_exc()
+                    delay = min(delay * 2, 300.0)
+                try:
+                    await asyncio.wait_for(woken.wait(), delay)
+                except asyncio.TimeoutError:
+                    pass
+                woken.clear()
+                listener.poll()
+                listener.notifies.clear()
+        finally:
+            loop.remove_reader(listener.fileno())
+            listener.close()
+
+    def stats(self) -> Dict[str, Any]:
+        with connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """SELECT count(*) FILTER (WHERE attempts < %s),
+                          count(*) FILTER (WHERE attempts >= %s),
+                          min(created_at) FILTER (WHERE attempts < %s)
+                   FROM notification_outbox WHERE done_at IS NULL""",
+                (self.max_attempts, self.max_attempts, self.max_attempts)
+            )
+            pending, failed, oldest = cur.fetchone()
+            cur.close()
+        return {
+            'transports': [transport.name for transport in self.transports],
+            'pending': pending,
+            'failed': failed,
+            'oldest_pending': oldest,
+        }
+
+
+def create_dispatcher(extra: Sequence[Transport] = ()) -> Dispatcher:
+    '''Dispatcher for the NOTIFY_TRANSPORTS channels plus extra always-on transports.'''
+    return Dispatcher(
+        transports_from_env() + list(extra),
+        batch_size=int(os.environ.get('NOTIFY_BATCH_SIZE', '50')),
+        max_attempts=int(os.environ.get('NOTIFY_MAX_ATTEMPTS', '10')),
+        lease=float(os.environ.get('NOTIFY_LEASE', '60')),
+        max_backoff=float(os.environ.get('NOTIFY_MAX_BACKOFF', '3600')),
+        retention_days=int(os.environ.get('NOTIFY_RETENTION_DAYS', '30')),
+    )
+
+
+if __name__ == '__main__':
+    asyncio.run(create_dispatcher().run_forever(float(os.environ.get('NOTIFY_POLL_INTERVAL', '30'))))
@@ -0,0 +1,175 @@
+import base64
+import hashlib
+import hmac
+import json
+import os
+import secrets
+import threading
+import time
+import traceback
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Set
+
+from shared.db import connection
+
+SESSION_TTL = int(os.environ.get('SESSION_TTL', str(12 * 3600)))
+TOKEN_CACHE_SIZE = int(os.environ.get('TOKEN_CACHE_SIZE', '1024'))
+REVOCATION_REFRESH = float(os.environ.get('REVOCATION_REFRESH', '30'))
+
+
+class TokenConfigError(RuntimeError):
+    pass
+
+
+def _b64encode(raw: bytes) -> str:
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def _b64decode(text: str) -> bytes:
+    return base64.urlsafe_b64decode(text + '=' * (-len(text) % 4))
+
+
+def _secret() -> bytes:
+    secret = os.environ.get('SESSION_SECRET', '')
+    if not secret:
+        raise TokenConfigError('SESSION_SECRET is not set')
+    return secret.encode()
+
+
+def _sign(payload: str) -> str:
+    return _b64encode(hmac.new(_secret(), payload.encode(), hashlib.sha256).digest())
+
+
+def issue_token(user_id: int, username: str, role: str, ttl: Optional[int] = None) -> str:
+    '''
+    Business: Create an HMAC-SHA256 signed, expiring session token
+    Args: user identity and role; ttl in seconds (default SESSION_TTL)
+    Returns: token string "<base64url claims>.<base64url signature>"
+    '''
+    now = int(time.time())
+    claims = {
+        'sub': user_id,
+        'usr': username,
+        'role': role,
+        'iat': now,
+        'exp': now + (ttl if ttl is not None else SESSION_TTL),
+        'jti': secrets.token_hex(16),
+    }
+    payload = _b64encode(json.dumps(claims, separators=(',', ':')).encode())
+    return payload + '.' + _sign(payload)
+
+
+class RevocationList:
+    '''
+    In-memory copy of revoked token ids, reloaded from the revoked_tokens
+    table at most every REVOCATION_REFRESH seconds instead of per request.
+    '''
+
+    def __init__(self, refresh_after: float = REVOCATION_REFRESH):
+        self.refresh_after = refresh_after
+        self._jtis: Set[str] = set()
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+
+    def _refresh(self) -> None:
+        with connection() as conn:
+            cur = conn.cursor()
+            cur.execute("SELECT jti FROM revoked_tokens WHERE expires_at > CURRENT_TIMESTAMP")
+            jtis = {row[0] for row in cur.fetchall()}
+            cur.close()
+        with self._lock:
+            self._jtis = jtis
+            self._loaded_at = time.monotonic()
+
+    def contains(self, jti: str) -> bool:
+        loaded_at = self._loaded_at
+        if loaded_at is None or time.monotonic() - loaded_at > self.refresh_after:
+            try:
+                self._refresh()
+            except Exception:
+                if loaded_at is None:
+                    raise
+                traceback.print_exc()
+                self._loaded_at = time.monotonic()
+        return jti in self._jtis
+
+    def add(self, jti: str) -> None:
+        with self._lock:
+            self._jtis.add(jti)
+
+
+class TokenVerifier:
+    '''
+    Verifies signed tokens without touching the database on the hot path.
+    Recently verified tokens are kept in a bounded LRU so repeat requests
+    skip the HMAC and JSON decoding entirely.
+    '''
+
+    def __init__(self, cache_size: int = TOKEN_CACHE_SIZE):
+        self.cache_size = cache_size
+        self.revoked = RevocationList()
+        self._cache: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _decode(self, token: str) -> Optional[Dict[str, Any]]:
+        payload, _, signature = token.partition('.')
+        if not payload or not signature or not token.isascii():
+            return None
+        # compare_digest only takes ASCII str, so compare bytes
+        if not hmac.compare_digest(signature.encode(), _sign(payload).encode()):
+            return None
+        try:
+            claims = json.loads(_b64decode(payload))
+        except ValueError:
+            return None
+        if not isinstance(claims, dict) or 'exp' not in claims or 'jti' not in claims:
+            return None
+        return claims
+
+    def verify(self, token: Optional[str]) -> Optional[Dict[str, Any]]:
+        if not token or not isinstance(token, str):
+            return None
+        with self._lock:
+            claims = self._cache.get(token)
+            if claims is not None:
+                self._cache.move_to_end(token)
+        if claims is None:
+            claims = self._decode(token)
+            if claims is None:
+                return None
+            with self._lock:
+                self._cache[token] = claims
+                while len(self._cache) > self.cache_size:
+                    self._cache.popitem(last=False)
+        if claims['exp'] <= time.time():
+            with self._lock:
+                self._cache.pop(token, None)
+            return None
+        if self.revoked.contains(claims['jti']):
+            return None
+        return claims
+
+    def revoke(self, claims: Dict[str, Any]) -> None:
+        with connection() as conn:
+            cur = conn.cursor()
+            cur.execute(
+                """INSERT INTO revoked_tokens (jti, expires_at)
+                   VALUES (%s, to_timestamp(%s) AT TIME ZONE 'UTC')
+                   ON CONFLICT (jti) DO NOTHING""",
+                (claims['jti'], claims['exp'])
+            )
+            cur.execute("DELETE FROM revoked_tokens WHERE expires_at < CURRENT_TIMESTAMP")
+            conn.commit()
+            cur.close()
+        self.revoked.add(claims['jti'])
+
+
+_verifier = TokenVerifier()
+
+
+def verify_token(token: Optional[str]) -> Optional[Dict[str, Any]]:
+    return _verifier.verify(token)
+
+
+def revoke_token(claims: Dict[str, Any]) -> None:
+    _verifier.revoke(claims)
@@ -1,7 +1,79 @@
-import json
 import os
+import sys
 from typing import Dict, Any
-import psycopg2
+
+FUNCTION_DIR = os.path.dirname(os.path.abspath(__file__))
+# Deployed copies carry shared/ beside index.py (scripts/vendor_shared.py); a checkout uses backend/shared
+sys.path.insert(0, FUNCTION_DIR if os.path.isdir(os.path.join(FUNCTION_DIR, 'shared'))
+                else os.path.dirname(FUNCTION_DIR))
+
+from shared.cache import create_cache
+from shared.catalog import PHOTO_FIELDS, PHOTO_ORDER, GALLERY_VERSION_SQL, query_gallery
+from shared.db import connection
+from shared.http import Api, Request, cached_response, dumps, json_response
+from shared.images import attach_variants
+from shared.listing import cache_key, parse_listing
+from shared.snapshots import publish_snapshots, read_snapshot
+from shared.statements import execute, register
+
+LIST_CACHE = create_cache(GALLERY_VERSION_SQL)
+
+INSERT_PHOTO = register('gallery_insert', """INSERT INTO gallery (image_url, image_variants, title, description)
+    VALUES (%s, %s, %s, %s) RETURNING id""")
+DELETE_PHOTO = register('gallery_delete', "DELETE FROM gallery WHERE id=%s")
+
+api = Api('gallery', 'Content-Type, X-Session-Token, X-User-Role, If-None-Match')
+
+
+def after_write() -> None:
+    LIST_CACHE.invalidate()
+    publish_snapshots(['gallery', 'home'])
+
+
+@api.route('GET')
+def list_photos(request: Request) -> Dict[str, Any]:
+    listing = parse_listing(request.query, PHOTO_FIELDS, len(PHOTO_ORDER))
+    key = cache_key('gallery', listing, PHOTO_FIELDS)
+    entry = read_snapshot(key) if key == 'gallery' else None
+    if entry is None:
+        entry = LIST_CACHE.get_or_load(key, lambda conn: dumps(query_gallery(conn, listing)))
+    return cached_response(request.event, entry)
+
+
+@api.route('POST', admin=True)
+def create_photo(request: Request) -> Dict[str, Any]:
+    body_data = request.json()
+    attach_variants([body_data])
+
+    with connection() as conn:
+        cur = conn.cursor()
+        execute(cur, INSERT_PHOTO, (
+            body_data.get('image_url'),
+            body_data.get('image_variants'),
+            body_data.get('title'),
+            body_data.get('description')
+        ))
+        new_id = cur.fetchone()[0]
+        conn.commit()
+        cur.close()
+    after_write()
+
+    return json_response(201, {'id': new_id, 'success': True})
+
+
+@api.route('DELETE', admin=True)
+def delete_photo(request: Request) -> Dict[str, Any]:
+    photo_id = request.query.get('id')
+
+    with connection() as conn:
+        cur = conn.cursor()
+        execute(cur, DELETE_PHOTO, (photo_id,))
+        conn.commit()
+        cur.close()
+    after_write()
+
+    return json_response(200, {'success': True})
+
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
@@ -9,126 +81,4 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     Args: event with httpMethod, body, queryStringParameters
     Returns: HTTP response with gallery data
     '''
-    method: str = event.get('httpMethod', 'GET')
-    
-    if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Session-Token, X-User-Role',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
-    
-    database_url = os.environ.get('DATABASE_URL')
-    headers = {
-        'Content-Type': 'application/json',
-        'Access-Control-Allow-Origin': '*'
-    }
-    
-    if method == 'GET':
-        conn = psycopg2.connect(database_url)
-        try:
-            cur = conn.cursor()
-            cur.execute(
-                "SELECT id, image_url, title, description FROM gallery ORDER BY created_at DESC"
-            )
-            rows = cur.fetchall()
-            cur.close()
-        finally:
-            conn.close()
-        
-        photos = []
-        for row in rows:
-            photos.append({
-                'id': row[0],
-                'image_url': row[1],
-                'title': row[2],
-                'description': row[3]
-            })
-        
-        return {
-            'statusCode': 200,
-            'headers': headers,
-            'body': json.dumps({'photos': photos}),
-            'isBase64Encoded': False
-        }
-    
-    elif method == 'POST':
-        user_role = event.get('headers', {}).get('X-User-Role', 'guest')
-        
-        if user_role != 'admin':
-            return {
-                'statusCode': 403,
-                'headers': headers,
-                'body': json.dumps({'error': 'Admin access required'}),
-                'isBase64Encoded': False
-            }
-        
-        body_data = json.loads(event.get('body', '{}'))
-        
-        conn = psycopg2.connect(database_url)
-        try:
-            cur = conn.cursor()
-            cur.execute(
-                """INSERT INTO gallery (image_url, title, description)
-                   VALUES (%s, %s, %s) RETURNING id""",
-                (
-                    body_data.get('image_url'),
-                    body_data.get('title'),
-                    body_data.get('description')
-                )
-            )
-            new_id = cur.fetchone()[0]
-            conn.commit()
-            cur.close()
-        finally:
-            conn.close()
-        
-        return {
-            'statusCode': 201,
-            'headers': headers,
-            'body': json.dumps({'id': new_id, 'success': True}),
-            'isBase64Encoded': False
-        }
-    
-    elif method == 'DELETE':
-        user_role = event.get('headers', {}).get('X-User-Role', 'guest')
-        
-        if user_role != 'admin':
-            return {
-                'statusCode': 403,
-                'headers': headers,
-                'body': json.dumps({'error': 'Admin access required'}),
-                'isBase64Encoded': False
-            }
-        
-        params = event.get('queryStringParameters', {})
-        photo_id = params.get('id')
-        
-        conn = psycopg2.connect(database_url)
-        try:
-            cur = conn.cursor()
-            cur.execute("DELETE FROM gallery WHERE id=%s", (photo_id,))
-            conn.commit()
-            cur.close()
-        finally:
-            conn.close()
-        
-        return {
-            'statusCode': 200,
-            'headers': headers,
-            'body': json.dumps({'success': True}),
-            'isBase64Encoded': False
-        }
-    
-    return {
-        'statusCode': 405,
-        'headers': headers,
-        'body': json.dumps({'error': 'Method not allowed'}),
-        'isBase64Encoded': False
-    }
+    return api.dispatch(event, context)
@@ -0,0 +1,103 @@
+from typing import Any, Dict, List, Optional, Sequence
+
+from shared.http import ClientError
+from shared.patch import NEXT_VERSION_SQL
+
+MAX_BATCH = 500
+
+
+class BatchError(ClientError):
+    pass
+
+
+def _template(columns: Sequence[str], casts: Dict[str, str]) -> str:
+    return '(' + ', '.join('%s::' + casts[c] if c in casts else '%s' for c in columns) + ')'
+
+
+def parse_ids(raw: Any) -> List[int]:
+    '''
+    Business: Normalize ids from a JSON list or a "1,2,3" query string
+    Returns: list of integer ids (at most MAX_BATCH)
+    '''
+    if isinstance(raw, str):
+        raw = [part for part in raw.split(',') if part.strip()]
+    if not isinstance(raw, list) or not raw:
+        raise BatchError('ids must be a non-empty list')
+    if len(raw) > MAX_BATCH:
+        raise BatchError('At most %d items per batch' % MAX_BATCH)
+    try:
+        return [int(item) for item in raw]
+    except (TypeError, ValueError):
+        raise BatchError('ids must be integers')
+
+
+def check_items(items: Any, require_id: bool = False) -> List[Dict[str, Any]]:
+    if not isinstance(items, list) or not items:
+        raise BatchError('Batch body must be a non-empty JSON array')
+    if len(items) > MAX_BATCH:
+        raise BatchError('At most %d items per batch' % MAX_BATCH)
+    for index, item in enumerate(items):
+        if not isinstance(item, dict):
+            raise BatchError('Item %d is not an object' % index)
+        if require_id:
+            try:
+                item['id'] = int(item['id'])
+            except (KeyError, TypeError, ValueError):
+                raise BatchError('Item %d has no valid id' % index)
+    return items
+
+
+def insert_many(conn: Any, table: str, columns: Sequence[str], rows: List[tuple],
+                casts: Optional[Dict[str, str]] = None) -> List[int]:
+    '''
+    Business: Multi-row INSERT ... VALUES in one statement
+    Returns: new ids in input order
+    '''
+    from psycopg2.extras import execute_values
+
+    cur = conn.cursor()
+    result = execute_values(
+        cur,
+        'INSERT INTO ' + table + ' (' + ', '.join(columns) + ') VALUES %s RETURNING id',
+        rows,
+        template=_template(columns, casts or {}),
+        page_size=len(rows),
+        fetch=True
+    )
+    cur.close()
+    return [row[0] for row in result]
+
+
+def update_many(conn: Any, table: str, columns: Sequence[str], rows: List[tuple],
+                casts: Optional[Dict[str, str]] = None) -> List[int]:
+    '''
+    Business: UPDATE ... FROM (VALUES ...) joining on id, one statement per batch
+    Args: rows are (id, *columns) tuples
+    Returns: ids that matched an existing row
+    '''
+    from psycopg2.extras import execute_values
+
+    all_casts = dict(casts or {}, id='integer')
+    all_columns = ['id'] + list(columns)
+    assignments = ', '.join(c + ' = v.' + c for c in columns)
+    cur = conn.cursor()
+    result = execute_values(
+        cur,
+        'UPDATE ' + table + ' AS t SET ' + assignments + ', updated_at = ' + NEXT_VERSION_SQL +
+        ' FROM (VALUES %s) AS v (' + ', '.join(all_columns) + ')'
+        ' WHERE t.id = v.id RETURNING t.id',
+        rows,
+        template=_template(all_columns, all_casts),
+        page_size=len(rows),
+        fetch=True
+    )
+    cur.close()
+    return [row[0] for row in result]
+
+
+def delete_many(conn: Any, table: str, ids: List[int]) -> List[int]:
+    cur = conn.cursor()
+    cur.execute('DELETE FROM ' + table + ' WHERE id = ANY(%s) RETURNING id', (ids,))
+    deleted = [row[0] for row in cur.fetchall()]
+    cur.close()
+    return deleted
@@ -0,0 +1,41 @@
+import os
+import sys
+from typing import Dict, Any
+
+FUNCTION_DIR = os.path.dirname(os.path.abspath(__file__))
+# Deployed copies carry shared/ beside index.py (scripts/vendor_shared.py); a checkout uses backend/shared
+sys.path.insert(0, FUNCTION_DIR if os.path.isdir(os.path.join(FUNCTION_DIR, 'shared'))
+                else os.path.dirname(FUNCTION_DIR))
+
+from shared.cache import create_cache
+from shared.catalog import DOG_FIELDS, DOG_ORDER, HOME_VERSION_SQL, query_home
+from shared.http import Api, Request, cached_response, dumps
+from shared.listing import ListingError, parse_listing
+from shared.snapshots import read_snapshot
+
+BUNDLE_CACHE = create_cache(HOME_VERSION_SQL)
+
+api = Api('home', 'Content-Type, If-None-Match')
+
+
+@api.route('GET')
+def get_bundle(request: Request) -> Dict[str, Any]:
+    if request.query.get('after'):
+        raise ListingError('after is not supported on the bundle; page each list through its own endpoint')
+    # Validated and clamped first, so ?limit=05 and an over-the-cap limit share one cache entry
+    limit = parse_listing({'limit': request.query.get('limit')}, DOG_FIELDS, len(DOG_ORDER))['limit']
+    params = {'limit': str(limit)} if limit is not None else {}
+    key = 'home?limit=%d' % limit if limit is not None else 'home'
+    entry = read_snapshot(key) if key == 'home' else None
+    if entry is None:
+        entry = BUNDLE_CACHE.get_or_load(key, lambda conn: dumps(query_home(conn, params)))
+    return cached_response(request.event, entry)
+
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    '''
+    Business: Homepage bundle with dogs, litters and gallery in one response
+    Args: event with httpMethod, queryStringParameters (optional limit per section)
+    Returns: HTTP response with dogs, litters and photos sharing one ETag
+    '''
+    return api.dispatch(event, context)
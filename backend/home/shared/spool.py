@@ -0,0 +1,159 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import traceback
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+SPOOL_SCHEMA = """
+CREATE TABLE IF NOT EXISTS spool (
+    idempotency_key TEXT PRIMARY KEY,
+    fingerprint TEXT NOT NULL,
+    payload TEXT NOT NULL,
+    created_at REAL NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    retry_at REAL NOT NULL DEFAULT 0,
+    drained_at REAL
+);
+CREATE INDEX IF NOT EXISTS spool_pending ON spool (drained_at, created_at);
+CREATE INDEX IF NOT EXISTS spool_fingerprint ON spool (fingerprint, created_at);
+"""
+
+# sink receives [(idempotency_key, payload), ...] and must be idempotent per key
+Sink = Callable[[List[Tuple[str, Dict[str, Any]]]], None]
+
+
+class WriteBehindSpool:
+    '''
+    Durable local queue in front of a slow or scarce sink (the database).
+    enqueue() commits to a SQLite file (WAL, synchronous=FULL) and returns;
+    a daemon thread drains pending rows to the sink in batches. Drained
+    rows are kept for dedupe_window seconds so identical resubmissions
+    and replayed idempotency keys are recognised, then pruned. Failed rows
+    are retried one at a time with exponential backoff (1 s .. 5 min) and
+    left in place (logged) after max_attempts.
+    '''
+
+    def __init__(self, path: str, sink: Sink, batch_size: int = 100, interval: float = 1.0,
+                 dedupe_window: float = 600.0, max_attempts: int = 12):
+        self.path = path
+        self.sink = sink
+        self.batch_size = batch_size
+        self.interval = interval
+        self.dedupe_window = dedupe_window
+        self.max_attempts = max_attempts
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute('PRAGMA journal_mode=WAL')
+        self._db.execute('PRAGMA synchronous=FULL')
+        self._db.executescript(SPOOL_SCHEMA)
+
+    def enqueue(self, key: str, fingerprint: str, payload: Dict[str, Any]) -> bool:
+        '''
+        Returns: True if queued, False if the key or an identical payload was seen within the window
+        '''
+        now = time.time()
+        with self._lock:
+            duplicate = self._db.execute(
+                'SELECT 1 FROM spool WHERE idempotency_key = ? OR (fingerprint = ? AND created_at > ?) LIMIT 1',
+                (key, fingerprint, now - self.dedupe_window)
+            ).fetchone()
+            if duplicate is None:
+                self._db.execute(
+                    'INSERT INTO spool (idempotency_key, fingerprint, payload, created_at) VALUES (?, ?, ?, ?)',
+                    (key, fingerprint, json.dumps(payload, ensure_ascii=False), now)
+                )
+        self.start()
+        if duplicate is None:
+            self._wake.set()
+        return duplicate is None
+
+    def pending(self) -> int:
+        with self._lock:
+            return self._db.execute(
+                'SELECT count(*) FROM spool WHERE drained_at IS NULL AND attempts < ?', (self.max_attempts,)
+            ).fetchone()[0]
+
+    def drain_once(self) -> int:
+        '''
+        Returns: number of rows handed to the sink
+        '''
+        with self._lock:
+            rows = self._db.execute(
+                '''SELECT idempotency_key, payload, attempts FROM spool
+                   WHERE drained_at IS NULL AND attempts < ? AND retry_at <= ?
+                   ORDER BY attempts > 0, created_at LIMIT ?''',
+                (self.max_attempts, time.time(), self.batch_size)
+            ).fetchall()
+        if not rows:
+            return 0
+        if rows[0][2]:
+            # fresh rows go first; failed ones are retried alone so one bad row cannot sink a batch
+            rows = rows[:1]
+
+        keys = [row[0] for row in rows]
+        marks = ','.join('?' * len(keys))
+        try:
+            self.sink([(row[0], json.loads(row[1])) for row in rows])
+        except Exception:
+            traceback.print_exc()
+            with self._lock:
+                self._db.execute(
+                    '''UPDATE spool SET attempts = attempts + 1,
+                       retry_at = ? + min(300, 1 << attempts)
+                       WHERE idempotency_key IN (%s)''' % marks,
+                    [time.time()] + keys
+                )
+            raise
+
+        now = time.time()
+        with self._lock:
+            self._db.execute('UPDATE spool SET drained_at = ? WHERE idempotency_key IN (%s)' % marks, [now] + keys)
+            self._db.execute('DELETE FROM spool WHERE drained_at < ?', (now - self.dedupe_window,))
+        return len(rows)
+
+    def _run(self) -> None:
+        delay = self.interval
+        while True:
+            self._wake.wait(delay)
+            self._wake.clear()
+            try:
+                while self.drain_once() == self.batch_size:
+                    pass
+                delay = self.interval
+            except Exception:
+                # back off while the sink is failing
+                delay = min(delay * 2, 60.0)
+
+    def start(self) -> None:
+        if self._thread is None:
+            with self._lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, name='spool-drainer', daemon=True)
+                    self._thread.start()
+
+    def kick(self) -> None:
+        '''Wake the drainer, e.g. at the start of each invocation after the container was frozen.'''
+        self.start()
+        self._wake.set()
+
+
+def create_spool(path: Optional[str], sink: Sink) -> Optional[WriteBehindSpool]:
+    '''Write-behind is opt-in: None (write synchronously) unless a spool path is configured.'''
+    if not path:
+        return None
+    return WriteBehindSpool(
+        path,
+        sink,
+        batch_size=int(os.environ.get('SPOOL_BATCH_SIZE', '100')),
+        interval=float(os.environ.get('SPOOL_INTERVAL', '1')),
+        dedupe_window=float(os.environ.get('SPOOL_DEDUPE_WINDOW', '600')),
+        max_attempts=int(os.environ.get('SPOOL_MAX_ATTEMPTS', '12')),
+    )
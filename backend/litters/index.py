@@ -1,7 +1,171 @@
-import json
 import os
+import sys
 from typing import Dict, Any
-import psycopg2
+
+FUNCTION_DIR = os.path.dirname(os.path.abspath(__file__))
+# Deployed copies carry shared/ beside index.py (scripts/vendor_shared.py); a checkout uses backend/shared
+sys.path.insert(0, FUNCTION_DIR if os.path.isdir(os.path.join(FUNCTION_DIR, 'shared'))
+                else os.path.dirname(FUNCTION_DIR))
+
+from shared.bulk import check_items, delete_many, insert_many, parse_ids, update_many
+from shared.cache import create_cache
+from shared.catalog import LITTER_FIELDS, LITTER_ORDER, LITTERS_VERSION_SQL, query_litters
+from shared.db import connection
+from shared.http import Api, Request, cached_response, dumps, json_response
+from shared.images import attach_variants
+from shared.listing import cache_key, parse_listing
+from shared.patch import expected_version, parse_changes, parse_row_id, update_row, written_response
+from shared.snapshots import publish_snapshots, read_snapshot
+from shared.statements import execute, register
+
+LIST_CACHE = create_cache(LITTERS_VERSION_SQL)
+
+LITTER_COLUMNS = ['name', 'born_date', 'available', 'parents', 'description', 'image_url', 'image_variants',
+                  'sire_id', 'dam_id']
+LITTER_CASTS = {'born_date': 'date', 'available': 'integer', 'image_variants': 'jsonb', 'sire_id': 'integer',
+                'dam_id': 'integer'}
+# image_variants is derived from image_url, never patched directly
+PATCH_COLUMNS = [column for column in LITTER_COLUMNS if column != 'image_variants']
+
+INSERT_LITTER = register('litters_insert', """INSERT INTO litters (name, born_date, available, parents, description,
+    image_url, image_variants, sire_id, dam_id)
+    VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s) RETURNING id""")
+DELETE_LITTER = register('litters_delete', "DELETE FROM litters WHERE id=%s")
+
+api = Api('litters', 'Content-Type, X-Session-Token, X-User-Role, If-None-Match, If-Match')
+
+
+def after_write() -> None:
+    LIST_CACHE.invalidate()
+    publish_snapshots(['litters', 'home'])
+
+
+def litter_values(item: Dict[str, Any]) -> tuple:
+    return (
+        item.get('name'),
+        item.get('born_date'),
+        # NOT NULL since V0013; a litter written without a count has none available
+        item.get('available') if item.get('available') is not None else 0,
+        item.get('parents'),
+        item.get('description'),
+        item.get('image_url'),
+        item.get('image_variants'),
+        item.get('sire_id'),
+        item.get('dam_id')
+    )
+
+
+@api.route('GET')
+def list_litters(request: Request) -> Dict[str, Any]:
+    listing = parse_listing(request.query, LITTER_FIELDS, len(LITTER_ORDER))
+    key = cache_key('litters', listing, LITTER_FIELDS)
+    entry = read_snapshot(key) if key == 'litters' else None
+    if entry is None:
+        entry = LIST_CACHE.get_or_load(key, lambda conn: dumps(query_litters(conn, listing)))
+    return cached_response(request.event, entry)
+
+
+@api.route('POST', admin=True)
+def create_litters(request: Request) -> Dict[str, Any]:
+    body_data = request.json()
+
+    if isinstance(body_data, list):
+        items = check_items(body_data)
+        attach_variants(items)
+        with connection() as conn:
+            new_ids = insert_many(conn, 'litters', LITTER_COLUMNS, [litter_values(item) for item in items], LITTER_CASTS)
+            conn.commit()
+        after_write()
+        return json_response(201, {
+            'success': True,
+            'results': [{'index': index, 'id': new_id} for index, new_id in enumerate(new_ids)]
+        })
+
+    attach_variants([body_data])
+    with connection() as conn:
+        cur = conn.cursor()
+        execute(cur, INSERT_LITTER, litter_values(body_data))
+        new_id = cur.fetchone()[0]
+        conn.commit()
+        cur.close()
+    after_write()
+
+    return json_response(201, {'id': new_id, 'success': True})
+
+
+@api.route('PUT', admin=True)
+def update_litters(request: Request) -> Dict[str, Any]:
+    body_data = request.json()
+
+    if isinstance(body_data, list):
+        items = check_items(body_data, require_id=True)
+        attach_variants(items)
+        with connection() as conn:
+            updated = set(update_many(
+                conn, 'litters', LITTER_COLUMNS,
+                [(item['id'],) + litter_values(item) for item in items], LITTER_CASTS
+            ))
+            conn.commit()
+        after_write()
+        return json_response(200, {
+            'success': True,
+            'results': [{'id': item['id'], 'updated': item['id'] in updated} for item in items]
+        })
+
+    litter_id = parse_row_id(request, body_data)
+    version = expected_version(request, body_data)
+    attach_variants([body_data])
+
+    with connection() as conn:
+        changes = dict(zip(LITTER_COLUMNS, litter_values(body_data)))
+        updated_at = update_row(conn, 'litters', litter_id, changes, LITTER_CASTS, version)
+        conn.commit()
+    after_write()
+
+    return written_response(200, litter_id, updated_at)
+
+
+@api.route('PATCH', admin=True)
+def patch_litter(request: Request) -> Dict[str, Any]:
+    body_data = request.json()
+    changes = parse_changes(body_data, PATCH_COLUMNS)
+    litter_id = parse_row_id(request, body_data)
+    version = expected_version(request, body_data)
+    if 'image_url' in changes:
+        attach_variants([changes])
+
+    with connection() as conn:
+        updated_at = update_row(conn, 'litters', litter_id, changes, LITTER_CASTS, version)
+        conn.commit()
+    after_write()
+
+    return written_response(200, litter_id, updated_at)
+
+
+@api.route('DELETE', admin=True)
+def delete_litters(request: Request) -> Dict[str, Any]:
+    if request.query.get('ids'):
+        ids = parse_ids(request.query['ids'])
+        with connection() as conn:
+            deleted = set(delete_many(conn, 'litters', ids))
+            conn.commit()
+        after_write()
+        return json_response(200, {
+            'success': True,
+            'results': [{'id': item_id, 'deleted': item_id in deleted} for item_id in ids]
+        })
+
+    litter_id = request.query.get('id')
+
+    with connection() as conn:
+        cur = conn.cursor()
+        execute(cur, DELETE_LITTER, (litter_id,))
+        conn.commit()
+        cur.close()
+    after_write()
+
+    return json_response(200, {'success': True})
+
 
 def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     '''
@@ -9,175 +173,4 @@ def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
     Args: event with httpMethod, body, queryStringParameters
     Returns: HTTP response with litters data
     '''
-    method: str = event.get('httpMethod', 'GET')
-    
-    if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, PUT, DELETE, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Session-Token, X-User-Role',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
-    
-    database_url = os.environ.get('DATABASE_URL')
-    headers = {
-        'Content-Type': 'application/json',
-        'Access-Control-Allow-Origin': '*'
-    }
-    
-    if method == 'GET':
-        conn = psycopg2.connect(database_url)
-        try:
-            cur = conn.cursor()
-            cur.execute(
-                "SELECT id, name, born_date, available, parents, description, image_url FROM litters ORDER BY born_date DESC"
-            )
-            rows = cur.fetchall()
-            cur.close()
-        finally:
-            conn.close()
-        
-        litters = []
-        for row in rows:
-            litters.append({
-                'id': row[0],
-                'name': row[1],
-                'born_date': row[2].strftime('%d.%m.%Y') if row[2] else '',
-                'available': row[3],
-                'parents': row[4],
-                'description': row[5],
-                'image_url': row[6]
-            })
-        
-        return {
-            'statusCode': 200,
-            'headers': headers,
-            'body': json.dumps({'litters': litters}),
-            'isBase64Encoded': False
-        }
-    
-    elif method == 'POST':
-        user_role = event.get('headers', {}).get('X-User-Role', 'guest')
-        
-        if user_role != 'admin':
-            return {
-                'statusCode': 403,
-                'headers': headers,
-                'body': json.dumps({'error': 'Admin access required'}),
-                'isBase64Encoded': False
-            }
-        
-        body_data = json.loads(event.get('body', '{}'))
-        
-        conn = psycopg2.connect(database_url)
-        try:
-            cur = conn.cursor()
-            cur.execute(
-                """INSERT INTO litters (name, born_date, available, parents, description, image_url)
-                   VALUES (%s, %s, %s, %s, %s, %s) RETURNING id""",
-                (
-                    body_data.get('name'),
-                    body_data.get('born_date'),
-                    body_data.get('available'),
-                    body_data.get('parents'),
-                    body_data.get('description'),
-                    body_data.get('image_url')
-                )
-            )
-            new_id = cur.fetchone()[0]
-            conn.commit()
-            cur.close()
-        finally:
-            conn.close()
-        
-        return {
-            'statusCode': 201,
-            'headers': headers,
-            'body': json.dumps({'id': new_id, 'success': True}),
-            'isBase64Encoded': False
-        }
-    
-    elif method == 'PUT':
-        user_role = event.get('headers', {}).get('X-User-Role', 'guest')
-        
-        if user_role != 'admin':
-            return {
-                'statusCode': 403,
-                'headers': headers,
-                'body': json.dumps({'error': 'Admin access required'}),
-                'isBase64Encoded': False
-            }
-        
-        body_data = json.loads(event.get('body', '{}'))
-        litter_id = body_data.get('id')
-        
-        conn = psycopg2.connect(database_url)
-        try:
-            cur = conn.cursor()
-            cur.execute(
-                """UPDATE litters SET name=%s, born_date=%s, available=%s, parents=%s,
-                   description=%s, image_url=%s, updated_at=CURRENT_TIMESTAMP
-                   WHERE id=%s""",
-                (
-                    body_data.get('name'),
-                    body_data.get('born_date'),
-                    body_data.get('available'),
-                    body_data.get('parents'),
-                    body_data.get('description'),
-                    body_data.get('image_url'),
-                    litter_id
-                )
-            )
-            conn.commit()
-            cur.close()
-        finally:
-            conn.close()
-        
-        return {
-            'statusCode': 200,
-            'headers': headers,
-            'body': json.dumps({'success': True}),
-            'isBase64Encoded': False
-        }
-    
-    elif method == 'DELETE':
-        user_role = event.get('headers', {}).get('X-User-Role', 'guest')
-        
-        if user_role != 'admin':
-            return {
-                'statusCode': 403,
-                'headers': headers,
-                'body': json.dumps({'error': 'Admin access required'}),
-                'isBase64Encoded': False
-            }
-        
-        params = event.get('queryStringParameters', {})
-        litter_id = params.get('id')
-        
-        conn = psycopg2.connect(database_url)
-        try:
-            cur = conn.cursor()
-            cur.execute("DELETE FROM litters WHERE id=%s", (litter_id,))
-            conn.commit()
-            cur.close()
-        finally:
-            conn.close()
-        
-        return {
-            'statusCode': 200,
-            'headers': headers,
-            'body': json.dumps({'success': True}),
-            'isBase64Encoded': False
-        }
-    
-    return {
-        'statusCode': 405,
-        'headers': headers,
-        'body': json.dumps({'error': 'Method not allowed'}),
-        'isBase64Encoded': False
-    }
+    return api.dispatch(event, context)
@@ -0,0 +1,46 @@
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Tuple
+
+
+class TokenBucketLimiter:
+    '''
+    Per-key token buckets held in memory for the lifetime of the container.
+    Each key may burst up to `capacity` requests and refills at `rate` per
+    second. The number of tracked keys is capped (least recently used go first).
+    '''
+
+    def __init__(self, capacity: float, rate: float, max_keys: int = 10000):
+        self.capacity = capacity
+        self.rate = rate
+        self.max_keys = max_keys
+        self._buckets: 'OrderedDict[str, Tuple[float, float]]' = OrderedDict()
+        self._lock = threading.Lock()
+
+    def acquire(self, key: str) -> float:
+        '''
+        Returns: 0 when a token was taken, otherwise seconds until one is available
+        '''
+        now = time.monotonic()
+        with self._lock:
+            tokens, updated = self._buckets.get(key, (self.capacity, now))
+            tokens = min(self.capacity, tokens + (now - updated) * self.rate)
+            if tokens >= 1:
+                self._buckets[key] = (tokens - 1, now)
+                wait = 0.0
+            else:
+                self._buckets[key] = (tokens, now)
+                wait = (1 - tokens) / self.rate
+            self._buckets.move_to_end(key)
+            while len(self._buckets) > self.max_keys:
+                self._buckets.popitem(last=False)
+        return wait
+
+
+def limiter_from_env(prefix: str, burst: int, per_minute: int) -> TokenBucketLimiter:
+    return TokenBucketLimiter(
+        capacity=float(os.environ.get(prefix + '_BURST', str(burst))),
+        rate=float(os.environ.get(prefix + '_PER_MINUTE', str(per_minute))) / 60.0,
+    )
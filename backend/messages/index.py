@@ -1,108 +1,263 @@
+import hashlib
 import json
 import os
-from typing import Dict, Any
-import psycopg2
+import re
+import sys
+import uuid
+from datetime import date, datetime, timedelta
+from typing import Dict, Any, List, Tuple
 
-def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+FUNCTION_DIR = os.path.dirname(os.path.abspath(__file__))
+# Deployed copies carry shared/ beside index.py (scripts/vendor_shared.py); a checkout uses backend/shared
+sys.path.insert(0, FUNCTION_DIR if os.path.isdir(os.path.join(FUNCTION_DIR, 'shared'))
+                else os.path.dirname(FUNCTION_DIR))
+
+from shared.bulk import parse_ids
+from shared.db import connection
+from shared.http import DEFAULT_ALLOW_HEADERS, Api, ClientError, HttpError, Request, json_response, too_many_requests
+from shared.listing import ListingError, fetch_page, parse_listing
+from shared.ratelimit import limiter_from_env
+from shared.spool import create_spool
+
+MESSAGE_FIELDS = ['id', 'name', 'email', 'phone', 'message', 'status', 'created_at']
+MESSAGE_ORDER = ['created_at', 'id']
+
+# Column sizes from the messages table; message text is capped to keep spam cheap
+MESSAGE_LIMITS = {'name': 200, 'email': 200, 'phone': 50, 'message': 5000}
+IDEMPOTENCY_KEY_RE = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+SINCE_DEFAULT_LIMIT = 100
+
+IP_LIMITER = limiter_from_env('MESSAGE_IP_RATE', burst=5, per_minute=5)
+
+api = Api('messages', DEFAULT_ALLOW_HEADERS + ', Idempotency-Key')
+
+
+def insert_messages(rows: List[Tuple[str, Dict[str, Any]]]) -> None:
+    '''Spool sink: one multi-row INSERT; keys already stored are skipped.'''
+    from psycopg2.extras import execute_values
+
+    with connection() as conn:
+        cur = conn.cursor()
+        execute_values(
+            cur,
+            """INSERT INTO messages (name, email, phone, message, idempotency_key) VALUES %s
+               ON CONFLICT (idempotency_key) DO NOTHING""",
+            [(m['name'], m['email'], m['phone'], m['message'], key) for key, m in rows],
+            page_size=len(rows)
+        )
+        conn.commit()
+        cur.close()
+
+
+SPOOL = create_spool(os.environ.get('MESSAGE_SPOOL_PATH'), insert_messages)
+
+
+def validate_message(body_data: Any) -> Dict[str, Any]:
+    if not isinstance(body_data, dict):
+        raise ClientError('Message body must be an object')
+
+    message = {}
+    for field, limit in MESSAGE_LIMITS.items():
+        value = body_data.get(field)
+        if value is None or value == '':
+            if field != 'phone':
+                raise ClientError(field + ' is required')
+            message[field] = None
+            continue
+        if not isinstance(value, str):
+            raise ClientError(field + ' must be a string')
+        value = value.strip()
+        if len(value) > limit or (not value and field != 'phone'):
+            raise ClientError('%s must be 1-%d characters' % (field, limit))
+        message[field] = value or None
+    return message
+
+
+def fingerprint(message: Dict[str, Any]) -> str:
+    '''Identical resubmissions (same sender and text) share a fingerprint.'''
+    parts = [message['name'].lower(), message['email'].lower(), message['phone'] or '', message['message']]
+    return hashlib.sha256(json.dumps(parts, ensure_ascii=False).encode()).hexdigest()
+
+
+def idempotency_key(request: Request, body_data: Dict[str, Any]) -> str:
+    key = request.header('Idempotency-Key') or body_data.get('idempotency_key')
+    if key is None:
+        return uuid.uuid4().hex
+    if not isinstance(key, str) or not IDEMPOTENCY_KEY_RE.match(key):
+        raise ClientError('Idempotency-Key must be 8-64 letters, digits, "-" or "_"')
+    return key
+
+
+def parse_date_filters(params: Dict[str, Any]) -> List[Tuple[str, Any]]:
     '''
-    Business: Support messages API
-    Args: event with httpMethod, body
-    Returns: HTTP response with messages data
+    Business: Turn from/to query parameters into created_at predicates
+    Args: queryStringParameters; dates (YYYY-MM-DD) make "to" inclusive of that day
+    Returns: list of (sql predicate, value) pairs for fetch_page
     '''
-    method: str = event.get('httpMethod', 'GET')
-    
-    if method == 'OPTIONS':
-        return {
-            'statusCode': 200,
-            'headers': {
-                'Access-Control-Allow-Origin': '*',
-                'Access-Control-Allow-Methods': 'GET, POST, OPTIONS',
-                'Access-Control-Allow-Headers': 'Content-Type, X-Session-Token, X-User-Role',
-                'Access-Control-Max-Age': '86400'
-            },
-            'body': '',
-            'isBase64Encoded': False
-        }
-    
-    database_url = os.environ.get('DATABASE_URL')
-    headers = {
-        'Content-Type': 'application/json',
-        'Access-Control-Allow-Origin': '*'
-    }
-    
-    if method == 'GET':
-        user_role = event.get('headers', {}).get('X-User-Role', 'guest')
-        
-        if user_role != 'admin':
-            return {
-                'statusCode': 403,
-                'headers': headers,
-                'body': json.dumps({'error': 'Admin access required'}),
-                'isBase64Encoded': False
-            }
-        
-        conn = psycopg2.connect(database_url)
+    conditions = []
+    for name, predicate in (('from', 'created_at >= %s'), ('to', 'created_at < %s')):
+        raw = params.get(name)
+        if not raw:
+            continue
         try:
-            cur = conn.cursor()
-            cur.execute(
-                "SELECT id, name, email, phone, message, status, created_at FROM messages ORDER BY created_at DESC"
-            )
-            rows = cur.fetchall()
-            cur.close()
-        finally:
-            conn.close()
-        
-        messages = []
-        for row in rows:
-            messages.append({
-                'id': row[0],
-                'name': row[1],
-                'email': row[2],
-                'phone': row[3],
-                'message': row[4],
-                'status': row[5],
-                'created_at': row[6].strftime('%d.%m.%Y %H:%M') if row[6] else ''
-            })
-        
-        return {
-            'statusCode': 200,
-            'headers': headers,
-            'body': json.dumps({'messages': messages}),
-            'isBase64Encoded': False
-        }
-    
-    elif method == 'POST':
-        body_data = json.loads(event.get('body', '{}'))
-        
-        conn = psycopg2.connect(database_url)
-        try:
-            cur = conn.cursor()
-            cur.execute(
-                """INSERT INTO messages (name, email, phone, message)
-                   VALUES (%s, %s, %s, %s) RETURNING id""",
-                (
-                    body_data.get('name'),
-                    body_data.get('email'),
-                    body_data.get('phone'),
-                    body_data.get('message')
-                )
-            )
-            new_id = cur.fetchone()[0]
+            if len(raw) == 10:
+                value = datetime.combine(date.fromisoformat(raw), datetime.min.time())
+                if name == 'to':
+                    value += timedelta(days=1)
+            else:
+                value = datetime.fromisoformat(raw)
+        except ValueError:
+            raise ListingError(name + ' must be an ISO date or datetime')
+        conditions.append((predicate, value))
+    return conditions
+
+
+def count_by_status(conn: Any, conditions: List[Tuple[str, Any]]) -> Dict[str, int]:
+    sql = "SELECT status, count(*) FROM messages"
+    if conditions:
+        sql += " WHERE " + " AND ".join(predicate for predicate, _ in conditions)
+    sql += " GROUP BY status"
+    cur = conn.cursor()
+    cur.execute(sql, [value for _, value in conditions])
+    counts = {status: total for status, total in cur.fetchall()}
+    cur.close()
+    return counts
+
+
+def format_message(row: Dict[str, Any], fields: List[str]) -> Dict[str, Any]:
+    message = {field: row[field] for field in fields}
+    if 'created_at' in message:
+        message['created_at'] = message['created_at'].strftime('%d.%m.%Y %H:%M') if message['created_at'] else ''
+    return message
+
+
+def messages_since(params: Dict[str, Any]) -> Dict[str, Any]:
+    '''
+    Business: Incremental poll for the admin inbox: messages with id greater than since_id
+    Args: queryStringParameters with since_id and optional limit/fields
+    Returns: HTTP response with messages (oldest first), last_id to poll from next and has_more
+    '''
+    try:
+        since_id = int(params['since_id'])
+    except ValueError:
+        raise ListingError('since_id must be an integer')
+    listing = parse_listing(params, MESSAGE_FIELDS, len(MESSAGE_ORDER))
+    limit = listing['limit'] or SINCE_DEFAULT_LIMIT
+
+    # Primary-key range scan: cheap enough to poll every few seconds
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "SELECT %s FROM messages WHERE id > %%s ORDER BY id LIMIT %%s" % ', '.join(listing['fields']),
+            (since_id, limit + 1)
+        )
+        rows = [dict(zip(listing['fields'], row)) for row in cur.fetchall()]
+        cur.close()
+
+    has_more = len(rows) > limit
+    rows = rows[:limit]
+    return json_response(200, {
+        'messages': [format_message(row, listing['fields']) for row in rows],
+        'last_id': rows[-1]['id'] if rows else since_id,
+        'has_more': has_more
+    })
+
+
+@api.route('GET', admin=True)
+def list_messages(request: Request) -> Dict[str, Any]:
+    params = request.query
+    if params.get('since_id'):
+        return messages_since(params)
+
+    listing = parse_listing(params, MESSAGE_FIELDS, len(MESSAGE_ORDER))
+    date_conditions = parse_date_filters(params)
+
+    conditions = list(date_conditions)
+    if params.get('status'):
+        conditions.append(('status = %s', params['status']))
+
+    with connection() as conn:
+        page = fetch_page(conn, 'messages', listing, MESSAGE_ORDER, descending=True,
+                          conditions=conditions)
+        counts = count_by_status(conn, date_conditions)
+
+    result = {
+        'messages': [format_message(row, listing['fields']) for row in page['rows']],
+        'counts': counts,
+        'total': sum(counts.values())
+    }
+    if listing['limit'] is not None:
+        result['next_cursor'] = page['next_cursor']
+
+    return json_response(200, result)
+
+
+@api.route('POST')
+def create_message(request: Request) -> Dict[str, Any]:
+    retry_after = IP_LIMITER.acquire(request.source_ip)
+    if retry_after > 0:
+        return too_many_requests(retry_after, 'Too many messages')
+
+    body_data = request.json()
+    message = validate_message(body_data)
+    key = idempotency_key(request, body_data)
+
+    if SPOOL is not None:
+        queued = SPOOL.enqueue(key, fingerprint(message), message)
+        return json_response(202, {'success': True, 'queued': True, 'duplicate': not queued})
+
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """INSERT INTO messages (name, email, phone, message, idempotency_key)
+               VALUES (%s, %s, %s, %s, %s)
+               ON CONFLICT (idempotency_key) DO NOTHING RETURNING id""",
+            (message['name'], message['email'], message['phone'], message['message'], key)
+        )
+        row = cur.fetchone()
+        if row is None:
+            cur.execute("SELECT id FROM messages WHERE idempotency_key = %s", (key,))
+            row = cur.fetchone()
             conn.commit()
             cur.close()
-        finally:
-            conn.close()
-        
-        return {
-            'statusCode': 201,
-            'headers': headers,
-            'body': json.dumps({'id': new_id, 'success': True}),
-            'isBase64Encoded': False
-        }
-    
-    return {
-        'statusCode': 405,
-        'headers': headers,
-        'body': json.dumps({'error': 'Method not allowed'}),
-        'isBase64Encoded': False
-    }
+            return json_response(200, {'id': row[0], 'success': True, 'duplicate': True})
+        conn.commit()
+        cur.close()
+
+    return json_response(201, {'id': row[0], 'success': True})
+
+
+@api.route('PUT', admin=True)
+def update_status(request: Request) -> Dict[str, Any]:
+    body_data = request.json()
+    status = body_data.get('status')
+    ids = body_data.get('ids')
+    if ids is None and body_data.get('id') is not None:
+        ids = [body_data.get('id')]
+
+    if not isinstance(status, str) or not status or len(status) > 20:
+        raise HttpError(400, 'status is required')
+    ids = parse_ids(ids)
+
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            "UPDATE messages SET status=%s WHERE id = ANY(%s) AND status IS DISTINCT FROM %s RETURNING id",
+            (status, ids, status)
+        )
+        updated = [row[0] for row in cur.fetchall()]
+        conn.commit()
+        cur.close()
+
+    return json_response(200, {'success': True, 'updated': updated})
+
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    '''
+    Business: Support messages API
+    Args: event with httpMethod, body, queryStringParameters (status, from, to, limit, after, since_id)
+    Returns: HTTP response with messages data
+    '''
+    if SPOOL is not None:
+        SPOOL.kick()
+    return api.dispatch(event, context)
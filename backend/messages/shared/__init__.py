@@ -0,0 +1,4 @@
+'''
+Shared helpers for backend functions: connection pooling and other
+per-container state that survives between warm invocations.
+'''
@@ -0,0 +1,211 @@
+import asyncio
+import base64
+import hashlib
+import io
+import json
+import os
+import traceback
+import urllib.parse
+import urllib.request
+from typing import Any, Dict, Iterable, List
+
+from shared.db import connection
+from shared.images import IMAGE_TABLES
+from shared.metrics import log_event
+from shared.notify import Transport
+from shared.patch import NEXT_VERSION_SQL
+from shared.snapshots import publish_snapshots
+from shared.storage import get_storage, key_for_url
+
+IMAGE_WIDTHS = [int(w) for w in os.environ.get('IMAGE_WIDTHS', '320,640,1280').split(',') if w.strip()]
+IMAGE_FORMATS = [f.strip().lower() for f in os.environ.get('IMAGE_FORMATS', 'avif,webp').split(',') if f.strip()]
+IMAGE_QUALITY = int(os.environ.get('IMAGE_QUALITY', '70'))
+# Hosts other than MEDIA_BASE_URL's that originals may be downloaded from
+IMAGE_ALLOWED_HOSTS = os.environ.get('IMAGE_ALLOWED_HOSTS', 'cdn.poehali.dev')
+IMAGE_TIMEOUT = float(os.environ.get('IMAGE_TIMEOUT', '30'))
+IMAGE_MAX_BYTES = int(os.environ.get('IMAGE_MAX_BYTES', str(25 * 1024 * 1024)))
+PLACEHOLDER_SIZE = 16
+
+CONTENT_TYPES = {'avif': 'image/avif', 'webp': 'image/webp'}
+
+
+class SourceRejected(ValueError):
+    '''The image URL must not be fetched: disallowed host or scheme, or over IMAGE_MAX_BYTES.'''
+
+
+def pillow() -> Any:
+    '''PIL.Image, or None without Pillow; imported by the first ingest job.'''
+    try:
+        from PIL import Image
+    except ImportError:
+        return None
+    return Image
+
+
+def supported_formats() -> List[str]:
+    '''Requested formats this Pillow build can encode (AVIF needs Pillow >= 11.3 or the plugin).'''
+    Image = pillow()
+    if Image is None:
+        return []
+    Image.init()
+    return [fmt for fmt in IMAGE_FORMATS if fmt.upper() in Image.SAVE]
+
+
+def allowed_hosts() -> List[str]:
+    '''Hosts originals may be downloaded from: IMAGE_ALLOWED_HOSTS plus the host of an absolute MEDIA_BASE_URL.'''
+    hosts = [h.strip().lower() for h in IMAGE_ALLOWED_HOSTS.split(',') if h.strip()]
+    media_host = urllib.parse.urlsplit(os.environ.get('MEDIA_BASE_URL', '')).hostname
+    if media_host:
+        hosts.append(media_host.lower())
+    return hosts
+
+
+def host_allowed(url: str) -> bool:
+    parts = urllib.parse.urlsplit(url)
+    return parts.scheme in ('http', 'https') and (parts.hostname or '').lower() in allowed_hosts()
+
+
+class AllowedHostRedirects(urllib.request.HTTPRedirectHandler):
+    '''Follows a redirect only when it stays on an allowed host.'''
+
+    def redirect_request(self, req: Any, fp: Any, code: int, msg: str, headers: Any, newurl: str) -> Any:
+        if not host_allowed(newurl):
+            raise SourceRejected('Redirect to a host that is not allowed: ' + newurl)
+        return super().redirect_request(req, fp, code, msg, headers, newurl)
+
+
+def read_capped(chunks: Iterable[bytes], url: str) -> bytes:
+    data = bytearray()
+    for chunk in chunks:
+        data += chunk
+        if len(data) > IMAGE_MAX_BYTES:
+            raise SourceRejected('Image larger than %d bytes: %s' % (IMAGE_MAX_BYTES, url))
+    return bytes(data)
+
+
+def fetch_source(url: str) -> bytes:
+    '''
+    Originals under MEDIA_BASE_URL are read straight from storage; anything
+    else is downloaded only from an allowed host. Raises SourceRejected for
+    URLs that must never be fetched.
+    '''
+    key = key_for_url(url)
+    if key is not None:
+        return read_capped(get_storage().stream(key), url)
+    if not host_allowed(url):
+        raise SourceRejected('Image host is not allowed: ' + url)
+
+    opener = urllib.request.build_opener(AllowedHostRedirects)
+    with opener.open(url, timeout=IMAGE_TIMEOUT) as source:
+        length = source.headers.get('Content-Length')
+        if length and length.isdigit() and int(length) > IMAGE_MAX_BYTES:
+            raise SourceRejected('Image larger than %d bytes: %s' % (IMAGE_MAX_BYTES, url))
+        return read_capped(iter(lambda: source.read(64 * 1024), b''), url)
+
+
+def encode(image: Any, fmt: str, quality: int) -> bytes:
+    out = io.BytesIO()
+    image.save(out, fmt.upper(), quality=quality)
+    return out.getvalue()
+
+
+def ingest_image(url: str) -> Dict[str, Any]:
+    '''
+    Business: Read an original and publish its resized derivatives (notifier worker thread)
+    Args: public URL of the full-size original
+    Returns: dict with original width/height, blur placeholder data URI and sources (format, width, height, url)
+    '''
+    from PIL import Image, ImageOps
+
+    data = fetch_source(url)
+    digest = hashlib.sha256(data).hexdigest()
+    storage = get_storage()
+
+    original = ImageOps.exif_transpose(Image.open(io.BytesIO(data)))
+    original = original.convert('RGBA' if original.mode in ('RGBA', 'LA', 'P') else 'RGB')
+    width, height = original.size
+
+    widths = [w for w in IMAGE_WIDTHS if w < width] or [width]
+    sources = []
+    for target in widths:
+        resized = original if target == width else original.resize(
+            (target, max(1, round(height * target / width))), Image.LANCZOS
+        )
+        for fmt in supported_formats():
+            key = 'derivatives/%s/%s/%d.%s' % (digest[:2], digest, target, fmt)
+            if storage.exists(key):
+                derivative_url = storage.url(key)
+            else:
+                derivative_url = storage.put(key, encode(resized, fmt, IMAGE_QUALITY), CONTENT_TYPES[fmt])
+            sources.append({'format': fmt, 'width': resized.width, 'height': resized.height, 'url': derivative_url})
+
+    thumb = original.copy()
+    thumb.thumbnail((PLACEHOLDER_SIZE, PLACEHOLDER_SIZE))
+    placeholder = 'data:image/webp;base64,' + base64.b64encode(encode(thumb, 'webp', 30)).decode()
+
+    return {'width': width, 'height': height, 'placeholder': placeholder, 'sources': sources}
+
+
+def store_variants(url: str, variants: Dict[str, Any]) -> List[str]:
+    '''
+    Business: Fill image_variants into every row and upload that still lacks them for url
+    Returns: snapshot names to republish
+    '''
+    body = json.dumps(variants)
+    touched = []
+    with connection() as conn:
+        cur = conn.cursor()
+        for table in IMAGE_TABLES:
+            # updated_at is the row version (If-Match, listing caches), so filling variants bumps it
+            cur.execute(
+                'UPDATE ' + table + ' SET image_variants = %s::jsonb, updated_at = ' + NEXT_VERSION_SQL +
+                ' WHERE image_url = %s AND image_variants IS NULL',
+                (body, url)
+            )
+            if cur.rowcount:
+                touched.append(table)
+        cur.execute("UPDATE media_files SET image_variants = %s::jsonb WHERE url = %s AND image_variants IS NULL",
+                    (body, url))
+        conn.commit()
+        cur.close()
+    return sorted(set(touched + ['home'])) if touched else []
+
+
+class ImageTransport(Transport):
+    '''
+    Outbox consumer for image.ingest jobs: renders derivatives in a worker
+    thread (the event loop stays free for the other transports) and stores
+    them. URLs that may not be fetched or are not images are dropped after
+    logging; any other failure retries the batch with the outbox backoff.
+    '''
+
+    name = 'images'
+    topics = ('image.ingest',)
+
+    def ingest(self, url: str) -> List[str]:
+        try:
+            variants = ingest_image(url)
+        except SourceRejected as e:
+            log_event('image_skipped', url=url, reason=str(e))
+            return []
+        except Exception as e:
+            if type(e).__name__ == 'UnidentifiedImageError':
+                log_event('image_skipped', url=url, reason='not an image')
+                return []
+            raise
+        return store_variants(url, variants)
+
+    async def send(self, events: List[Dict[str, Any]]) -> None:
+        loop = asyncio.get_running_loop()
+        failures = []
+        republish = set()
+        for url in sorted({event['payload'].get('url') for event in events if event['payload'].get('url')}):
+            try:
+                republish.update(await loop.run_in_executor(None, self.ingest, url))
+            except Exception as e:
+                traceback.print_exc()
+                failures.append('%s: %s' % (url, e))
+        if republish:
+            await loop.run_in_executor(None, publish_snapshots, sorted(republish))
+        if failures:
+            raise RuntimeError('; '.join(failures))
@@ -0,0 +1,47 @@
+import asyncio
+import os
+import sys
+from typing import Dict, Any
+
+FUNCTION_DIR = os.path.dirname(os.path.abspath(__file__))
+# Deployed copies carry shared/ beside index.py (scripts/vendor_shared.py); a checkout uses backend/shared
+sys.path.insert(0, FUNCTION_DIR if os.path.isdir(os.path.join(FUNCTION_DIR, 'shared'))
+                else os.path.dirname(FUNCTION_DIR))
+
+from shared.http import Api, Request, is_warmup, json_response
+from shared.image_ingest import ImageTransport
+from shared.notify import create_dispatcher
+
+# Leave headroom below the function timeout; the rest waits for the next run
+DRAIN_BUDGET = float(os.environ.get('NOTIFY_DRAIN_BUDGET', '20'))
+
+# Image derivatives are always built here, whatever NOTIFY_TRANSPORTS says
+DISPATCHER = create_dispatcher([ImageTransport()])
+
+api = Api('notifier')
+
+
+def drain() -> Dict[str, Any]:
+    dispatched = asyncio.run(DISPATCHER.drain(DRAIN_BUDGET))
+    return {'dispatched': dispatched, 'pruned': DISPATCHER.prune()}
+
+
+@api.route('GET', admin=True)
+def get_stats(request: Request) -> Dict[str, Any]:
+    return json_response(200, DISPATCHER.stats())
+
+
+@api.route('POST', admin=True)
+def post_drain(request: Request) -> Dict[str, Any]:
+    return json_response(200, drain())
+
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    '''
+    Business: Deliver queued notifications about new messages and build queued image derivatives
+    Args: timer trigger event (no httpMethod) or HTTP event; GET = outbox stats, POST = drain now
+    Returns: HTTP response with dispatch counters or outbox stats
+    '''
+    if 'httpMethod' not in event and not is_warmup(event):
+        return drain()
+    return api.dispatch(event, context)
@@ -0,0 +1,96 @@
+from typing import Any, Dict
+
+from shared.db import consistent_reads
+from shared.listing import fetch_page, parse_listing
+
+DOG_FIELDS = ['id', 'name', 'gender', 'breed', 'titles', 'achievements', 'parents', 'image_url', 'image_variants',
+              'sire_id', 'dam_id', 'updated_at']
+DOG_ORDER = ['id']
+DOGS_VERSION_SQL = "SELECT count(*), max(updated_at), max(id) FROM dogs"
+
+LITTER_FIELDS = ['id', 'name', 'born_date', 'available', 'parents', 'description', 'image_url', 'image_variants',
+                 'sire_id', 'dam_id', 'updated_at']
+LITTER_ORDER = ['born_date', 'id']
+LITTERS_VERSION_SQL = "SELECT count(*), max(updated_at), max(id) FROM litters"
+
+PHOTO_FIELDS = ['id', 'image_url', 'image_variants', 'title', 'description']
+PHOTO_ORDER = ['created_at', 'id']
+GALLERY_VERSION_SQL = "SELECT count(*), max(updated_at), max(id) FROM gallery"
+
+HOME_VERSION_SQL = """SELECT
+    (SELECT count(*) FROM dogs), (SELECT max(updated_at) FROM dogs), (SELECT max(id) FROM dogs),
+    (SELECT count(*) FROM litters), (SELECT max(updated_at) FROM litters), (SELECT max(id) FROM litters),
+    (SELECT count(*) FROM gallery), (SELECT max(updated_at) FROM gallery), (SELECT max(id) FROM gallery)"""
+
+
+def _page_result(key: str, items: list, listing: Dict[str, Any], page: Dict[str, Any]) -> Dict[str, Any]:
+    result = {key: items}
+    if listing['limit'] is not None:
+        result['next_cursor'] = page['next_cursor']
+    return result
+
+
+def query_dogs(conn: Any, listing: Dict[str, Any]) -> Dict[str, Any]:
+    page = fetch_page(conn, 'dogs', listing, DOG_ORDER, descending=False)
+
+    dogs = []
+    for row in page['rows']:
+        dog = {field: row[field] for field in listing['fields']}
+        if 'titles' in dog:
+            dog['titles'] = dog['titles'] if dog['titles'] else []
+        dogs.append(dog)
+
+    return _page_result('dogs', dogs, listing, page)
+
+
+def query_litters(conn: Any, listing: Dict[str, Any]) -> Dict[str, Any]:
+    page = fetch_page(conn, 'litters', listing, LITTER_ORDER, descending=True)
+
+    litters = []
+    for row in page['rows']:
+        litter = {field: row[field] for field in listing['fields']}
+        if 'born_date' in litter:
+            litter['born_date'] = litter['born_date'].strftime('%d.%m.%Y') if litter['born_date'] else ''
+        litters.append(litter)
+
+    return _page_result('litters', litters, listing, page)
+
+
+def query_gallery(conn: Any, listing: Dict[str, Any]) -> Dict[str, Any]:
+    page = fetch_page(conn, 'gallery', listing, PHOTO_ORDER, descending=True)
+
+    photos = [{field: row[field] for field in listing['fields']} for row in page['rows']]
+
+    return _page_result('photos', photos, listing, page)
+
+
+def query_home(conn: Any, params: Dict[str, Any]) -> Dict[str, Any]:
+    # Only limit applies: a keyset cursor belongs to one list, never to all three
+    params = {'limit': params.get('limit')}
+    # One snapshot for the three lists, so the bundle never mixes commits
+    with consistent_reads(conn):
+        dogs = query_dogs(conn, parse_listing(params, DOG_FIELDS, len(DOG_ORDER)))
+        litters = query_litters(conn, parse_listing(params, LITTER_FIELDS, len(LITTER_ORDER)))
+        photos = query_gallery(conn, parse_listing(params, PHOTO_FIELDS, len(PHOTO_ORDER)))
+
+    bundle: Dict[str, Any] = {
+        'dogs': dogs['dogs'],
+        'litters': litters['litters'],
+        'photos': photos['photos']
+    }
+    if params.get('limit'):
+        bundle['next_cursors'] = {
+            'dogs': dogs['next_cursor'],
+            'litters': litters['next_cursor'],
+            'photos': photos['next_cursor']
+        }
+    return bundle
+
+
+# Default (unparameterized) GET bodies that are published as snapshot files.
+SNAPSHOT_SOURCES = {
+    'dogs': (DOGS_VERSION_SQL, lambda conn: query_dogs(conn, parse_listing({}, DOG_FIELDS, len(DOG_ORDER)))),
+    'litters': (LITTERS_VERSION_SQL, lambda conn: query_litters(conn, parse_listing({}, LITTER_FIELDS, len(LITTER_ORDER)))),
+    'gallery': (GALLERY_VERSION_SQL, lambda conn: query_gallery(conn, parse_listing({}, PHOTO_FIELDS, len(PHOTO_ORDER)))),
+    'home': (HOME_VERSION_SQL, lambda conn: query_home(conn, {})),
+}
@@ -0,0 +1,47 @@
+import json
+from typing import Any, Dict, List
+
+from shared.db import connection
+from shared.http import ClientError
+from shared.metrics import count
+
+# Tables whose rows carry image_url + image_variants; variants are reused across them
+IMAGE_TABLES = ['dogs', 'litters', 'gallery']
+
+
+def existing_variants(urls: List[str]) -> Dict[str, Any]:
+    sql = ' UNION ALL '.join(
+        ['SELECT image_url, image_variants FROM %s WHERE image_url = ANY(%%(urls)s) AND image_variants IS NOT NULL'
+         % table for table in IMAGE_TABLES]
+        + ['SELECT url, image_variants FROM media_files WHERE url = ANY(%(urls)s) AND image_variants IS NOT NULL']
+    )
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(sql, {'urls': urls})
+        found = {url: variants for url, variants in cur.fetchall()}
+        cur.close()
+    return found
+
+
+def attach_variants(items: List[Any]) -> None:
+    '''
+    Business: Ingest stage for POST/PUT bodies that carry image_url
+    Args: request items; each gets image_variants set to a JSON string or None
+    Returns: None. Variants already built for the same URL (any table or an
+             upload) are reused. A new URL is written without variants; the
+             row's trigger queues an image.ingest job and the notifier fills
+             image_variants in later (shared.image_ingest).
+    '''
+    for item in items:
+        if not isinstance(item, dict):
+            raise ClientError('Body must be a JSON object')
+        if item.get('image_url') is not None and not isinstance(item['image_url'], str):
+            raise ClientError('image_url must be a string')
+
+    urls = sorted({item['image_url'] for item in items if item.get('image_url')})
+    variants: Dict[str, Any] = existing_variants(urls) if urls else {}
+    count('image_reused', len(variants))
+
+    for item in items:
+        found = variants.get(item.get('image_url'))
+        item['image_variants'] = json.dumps(found) if found else None
@@ -0,0 +1,207 @@
+import os
+import sys
+from typing import Dict, Any, List, Optional, Set, Tuple
+
+FUNCTION_DIR = os.path.dirname(os.path.abspath(__file__))
+# Deployed copies carry shared/ beside index.py (scripts/vendor_shared.py); a checkout uses backend/shared
+sys.path.insert(0, FUNCTION_DIR if os.path.isdir(os.path.join(FUNCTION_DIR, 'shared'))
+                else os.path.dirname(FUNCTION_DIR))
+
+from shared.cache import create_cache
+from shared.catalog import DOGS_VERSION_SQL
+from shared.http import Api, ClientError, HttpError, Request, cached_response, dumps
+
+PEDIGREE_CACHE = create_cache(DOGS_VERSION_SQL)
+
+DEFAULT_GENERATIONS = 5
+MAX_GENERATIONS = 10
+
+# path is the route from the dog: 'S' = sire, 'D' = dam ('SD' = paternal granddam)
+ANCESTRY_SQL = """
+WITH RECURSIVE tree AS (
+    SELECT id, sire_id, dam_id, 0 AS generation, ''::text AS path
+    FROM dogs WHERE id = %(id)s
+    UNION ALL
+    SELECT p.id, p.sire_id, p.dam_id, t.generation + 1,
+           t.path || CASE WHEN p.id = t.sire_id THEN 'S' ELSE 'D' END
+    FROM tree t JOIN dogs p ON p.id IN (t.sire_id, t.dam_id)
+    WHERE t.generation < %(generations)s
+)
+SELECT t.path, t.generation, d.id, d.name, d.gender, d.breed, d.titles, d.image_url,
+       d.parents, d.sire_id, d.dam_id
+FROM tree t JOIN dogs d ON d.id = t.id
+ORDER BY t.generation, t.path
+"""
+
+# Every ancestor of both dogs, each once, in one round trip
+ANCESTOR_GRAPH_SQL = """
+WITH RECURSIVE anc AS (
+    SELECT id, sire_id, dam_id, 0 AS depth FROM dogs WHERE id = ANY(%(ids)s)
+    UNION
+    SELECT p.id, p.sire_id, p.dam_id, a.depth + 1
+    FROM anc a JOIN dogs p ON p.id IN (a.sire_id, a.dam_id)
+    WHERE a.depth < %(generations)s
+)
+SELECT DISTINCT a.id, a.sire_id, a.dam_id, d.name
+FROM anc a JOIN dogs d ON d.id = a.id
+"""
+
+ANCESTOR_FIELDS = ['path', 'generation', 'id', 'name', 'gender', 'breed', 'titles', 'image_url',
+                   'parents', 'sire_id', 'dam_id']
+
+api = Api('pedigree', 'Content-Type, If-None-Match')
+
+
+def int_param(params: Dict[str, Any], name: str, default: Optional[int] = None) -> int:
+    raw = params.get(name)
+    if not raw:
+        if default is None:
+            raise ClientError(name + ' is required')
+        return default
+    try:
+        return int(raw)
+    except ValueError:
+        raise ClientError(name + ' must be an integer')
+
+
+def parse_generations(params: Dict[str, Any]) -> int:
+    generations = int_param(params, 'generations', DEFAULT_GENERATIONS)
+    if generations < 1:
+        raise ClientError('generations must be positive')
+    return min(generations, MAX_GENERATIONS)
+
+
+class AncestorGraph:
+    '''
+    In-memory sire/dam graph for kinship calculations.
+    Parents outside the fetched generations count as unknown (founders).
+    '''
+
+    def __init__(self, rows: List[Tuple[int, Optional[int], Optional[int], str]]):
+        self.parents = {row[0]: (row[1], row[2]) for row in rows}
+        self.names = {row[0]: row[3] for row in rows}
+        self.rank: Dict[int, int] = {}
+        for node in self.parents:
+            self._visit(node, set())
+        self._kinship: Dict[Tuple[int, int], float] = {}
+
+    def _visit(self, node: Optional[int], path: Set[int]) -> int:
+        '''Generation rank: parents always rank below their offspring; cycles are cut.'''
+        if node is None or node not in self.parents or node in path:
+            return -1
+        if node in self.rank:
+            return self.rank[node]
+        path.add(node)
+        rank = 1 + max(self._visit(parent, path) for parent in self.parents[node])
+        path.discard(node)
+        self.rank[node] = rank
+        return rank
+
+    def parents_of(self, node: int) -> Tuple[Optional[int], Optional[int]]:
+        return tuple(
+            parent if parent in self.rank and self.rank[parent] < self.rank[node] else None
+            for parent in self.parents[node]
+        )
+
+    def kinship(self, a: Optional[int], b: Optional[int]) -> float:
+        '''Probability that random alleles from a and b are identical by descent.'''
+        if a is None or b is None or a not in self.rank or b not in self.rank:
+            return 0.0
+        key = (a, b) if a <= b else (b, a)
+        if key in self._kinship:
+            return self._kinship[key]
+
+        if a == b:
+            sire, dam = self.parents_of(a)
+            value = 0.5 * (1 + self.kinship(sire, dam))
+        else:
+            if self.rank[a] < self.rank[b]:
+                a, b = b, a
+            sire, dam = self.parents_of(a)
+            value = 0.5 * (self.kinship(sire, b) + self.kinship(dam, b))
+
+        self._kinship[key] = value
+        return value
+
+    def ancestors(self, node: int) -> Set[int]:
+        seen: Set[int] = set()
+        stack = [node]
+        while stack:
+            current = stack.pop()
+            if current is None or current in seen or current not in self.rank:
+                continue
+            seen.add(current)
+            stack.extend(self.parents_of(current))
+        return seen
+
+
+def load_ancestry(conn: Any, dog_id: int, generations: int) -> Dict[str, Any]:
+    cur = conn.cursor()
+    cur.execute(ANCESTRY_SQL, {'id': dog_id, 'generations': generations})
+    rows = cur.fetchall()
+    cur.close()
+
+    if not rows:
+        raise HttpError(404, 'Dog not found')
+
+    nodes = []
+    for row in rows:
+        node = dict(zip(ANCESTOR_FIELDS, row))
+        node['titles'] = node['titles'] if node['titles'] else []
+        nodes.append(node)
+
+    return {'dog': nodes[0], 'ancestors': nodes[1:], 'generations': generations}
+
+
+def load_inbreeding(conn: Any, sire_id: int, dam_id: int, generations: int) -> Dict[str, Any]:
+    cur = conn.cursor()
+    cur.execute(ANCESTOR_GRAPH_SQL, {'ids': [sire_id, dam_id], 'generations': generations})
+    graph = AncestorGraph(cur.fetchall())
+    cur.close()
+
+    missing = [dog_id for dog_id in (sire_id, dam_id) if dog_id not in graph.rank]
+    if missing:
+        raise HttpError(404, 'Dog not found', ids=missing)
+
+    common = sorted(graph.ancestors(sire_id) & graph.ancestors(dam_id))
+
+    return {
+        'sire_id': sire_id,
+        'dam_id': dam_id,
+        'generations': generations,
+        'coi': round(graph.kinship(sire_id, dam_id), 6),
+        'common_ancestors': [{'id': node, 'name': graph.names[node]} for node in common]
+    }
+
+
+@api.route('GET')
+def get_pedigree(request: Request) -> Dict[str, Any]:
+    params = request.query
+    generations = parse_generations(params)
+
+    if params.get('sire') or params.get('dam'):
+        sire_id = int_param(params, 'sire')
+        dam_id = int_param(params, 'dam')
+        if sire_id == dam_id:
+            raise ClientError('sire and dam must be different dogs')
+        key = 'coi?sire=%d&dam=%d&generations=%d' % (sire_id, dam_id, generations)
+        entry = PEDIGREE_CACHE.get_or_load(
+            key, lambda conn: dumps(load_inbreeding(conn, sire_id, dam_id, generations))
+        )
+    else:
+        dog_id = int_param(params, 'id')
+        key = 'ancestry?id=%d&generations=%d' % (dog_id, generations)
+        entry = PEDIGREE_CACHE.get_or_load(
+            key, lambda conn: dumps(load_ancestry(conn, dog_id, generations))
+        )
+
+    return cached_response(request.event, entry)
+
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    '''
+    Business: Pedigree tree for a dog and inbreeding coefficient for a planned pairing
+    Args: event with httpMethod, queryStringParameters (id or sire+dam, generations)
+    Returns: HTTP response with ancestors by generation, or coi and common ancestors
+    '''
+    return api.dispatch(event, context)
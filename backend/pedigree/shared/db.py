@@ -0,0 +1,210 @@
+import os
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, ContextManager, Dict, Iterator, List, Optional, Tuple
+
+from shared.metrics import timed_cursor, timer
+
+
+def driver() -> Any:
+    '''
+    psycopg2, imported on first use: handlers that never reach the database
+    (preflights, 401/403/405, snapshot hits) skip the driver import entirely.
+    '''
+    import psycopg2
+    import psycopg2.extensions
+    return psycopg2
+
+
+class ConnectionPool:
+    '''
+    Module-level PostgreSQL connection pool kept alive across warm invocations.
+    Connections are health-checked on checkout, dropped after idle_timeout
+    seconds and transparently replaced when broken.
+    '''
+
+    def __init__(self, dsn: str, max_size: int = 5, idle_timeout: float = 300.0,
+                 check_after: float = 30.0):
+        self.dsn = dsn
+        self.max_size = max_size
+        self.idle_timeout = idle_timeout
+        self.check_after = check_after
+        self._idle: List[Tuple[Any, float]] = []
+        self._size = 0
+        self._lock = threading.Lock()
+        self._available = threading.Condition(self._lock)
+        self.stats: Dict[str, int] = {
+            'hits': 0,
+            'misses': 0,
+            'reconnects': 0,
+            'expired': 0,
+            'waits': 0,
+        }
+
+    def _bump(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def _is_healthy(self, conn: Any, idle_for: float) -> bool:
+        if conn.closed:
+            return False
+        if idle_for < self.check_after:
+            return True
+        try:
+            cur = conn.cursor()
+            cur.execute('SELECT 1')
+            cur.fetchone()
+            cur.close()
+            conn.rollback()
+            return True
+        except driver().Error:
+            return False
+
+    def _discard(self, conn: Optional[Any]) -> None:
+        if conn is not None:
+            try:
+                conn.close()
+            except driver().Error:
+                pass
+        with self._lock:
+            self._size -= 1
+            self._available.notify()
+
+    def _acquire(self) -> Optional[Tuple[Any, float]]:
+        with self._lock:
+            while True:
+                if self._idle:
+                    return self._idle.pop()
+                if self._size < self.max_size:
+                    self._size += 1
+                    return None
+                self.stats['waits'] += 1
+                self._available.wait()
+
+    def getconn(self) -> Any:
+        while True:
+            item = self._acquire()
+            if item is None:
+                self._bump('misses')
+                try:
+                    return driver().connect(self.dsn, cursor_factory=timed_cursor())
+                except Exception:
+                    self._discard(None)
+                    raise
+
+            conn, released_at = item
+            idle_for = time.monotonic() - released_at
+            if idle_for > self.idle_timeout:
+                self._bump('expired')
+                self._discard(conn)
+            elif self._is_healthy(conn, idle_for):
+                self._bump('hits')
+                return conn
+            else:
+                self._bump('reconnects')
+                self._discard(conn)
+
+    def putconn(self, conn: Any, broken: bool = False) -> None:
+        if not broken and not conn.closed:
+            try:
+                if conn.get_transaction_status() != driver().extensions.TRANSACTION_STATUS_IDLE:
+                    conn.rollback()
+            except driver().Error:
+                broken = True
+        if broken or conn.closed:
+            self._discard(conn)
+            return
+
+        now = time.monotonic()
+        expired = []
+        with self._lock:
+            while self._idle and now - self._idle[0][1] > self.idle_timeout:
+                expired.append(self._idle.pop(0)[0])
+            self._idle.append((conn, now))
+            self._available.notify()
+        for stale in expired:
+            self._bump('expired')
+            self._discard(stale)
+
+    @contextmanager
+    def connection(self) -> Iterator[Any]:
+        with timer('connect'):
+            conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+        except (driver().OperationalError, driver().InterfaceError):
+            broken = True
+            raise
+        finally:
+            self.putconn(conn, broken=broken)
+
+    def prewarm(self, count: int) -> int:
+        '''
+        Returns: connections left idle in the pool, opening new ones as needed up to count
+        '''
+        conns = []
+        try:
+            for _ in range(min(count, self.max_size)):
+                conns.append(self.getconn())
+        finally:
+            for conn in conns:
+                self.putconn(conn)
+        return len(conns)
+
+    def closeall(self) -> None:
+        with self._lock:
+            idle = self._idle
+            self._idle = []
+        for conn, _ in idle:
+            self._discard(conn)
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats, idle=len(self._idle), size=self._size)
+
+
+_pool: Optional[ConnectionPool] = None
+_pool_lock = threading.Lock()
+
+
+def get_pool() -> ConnectionPool:
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(
+                    os.environ.get('DATABASE_URL', ''),
+                    max_size=int(os.environ.get('DB_POOL_MAX_SIZE', '5')),
+                    idle_timeout=float(os.environ.get('DB_POOL_IDLE_TIMEOUT', '300')),
+                    check_after=float(os.environ.get('DB_POOL_CHECK_AFTER', '30')),
+                )
+    return _pool
+
+
+def connection() -> ContextManager[Any]:
+    '''Borrow a pooled connection for the duration of a with-block.'''
+    return get_pool().connection()
+
+
+@contextmanager
+def consistent_reads(conn: Any) -> Iterator[None]:
+    '''
+    Run the block in one REPEATABLE READ, READ ONLY transaction so every
+    SELECT in it sees the same committed state. Ends the connection's open
+    transaction first, so only use it where nothing is left uncommitted.
+    '''
+    conn.rollback()
+    cur = conn.cursor()
+    cur.execute('SET TRANSACTION ISOLATION LEVEL REPEATABLE READ, READ ONLY')
+    cur.close()
+    try:
+        yield
+    finally:
+        conn.rollback()
+
+
+def pool_stats() -> Dict[str, int]:
+    '''Hit/miss/reconnect counters for the container-wide pool.'''
+    return get_pool().snapshot()
@@ -0,0 +1,307 @@
+import os
+import re
+import sys
+import uuid
+from typing import Dict, Any, Optional
+
+FUNCTION_DIR = os.path.dirname(os.path.abspath(__file__))
+# Deployed copies carry shared/ beside index.py (scripts/vendor_shared.py); a checkout uses backend/shared
+sys.path.insert(0, FUNCTION_DIR if os.path.isdir(os.path.join(FUNCTION_DIR, 'shared'))
+                else os.path.dirname(FUNCTION_DIR))
+
+from shared.db import connection
+from shared.http import (DEFAULT_ALLOW_HEADERS, Api, ClientError, HttpError, Request, is_warmup, json_response,
+                         too_many_requests)
+from shared.patch import NEXT_VERSION_SQL
+from shared.ratelimit import limiter_from_env
+from shared.snapshots import publish_snapshots
+
+HOLD_MINUTES = float(os.environ.get('RESERVATION_HOLD_MINUTES', '30'))
+# make_interval's mins is an integer; secs takes a double, so fractional minutes work too
+HOLD_SECONDS = HOLD_MINUTES * 60
+MAX_QUANTITY = int(os.environ.get('RESERVATION_MAX_QUANTITY', '3'))
+SWEEP_BATCH = int(os.environ.get('RESERVATION_SWEEP_BATCH', '500'))
+# Claims queue on one litter row; give up quickly instead of piling up behind it
+LOCK_TIMEOUT_MS = int(os.environ.get('RESERVATION_LOCK_TIMEOUT_MS', '2000'))
+
+CONTACT_LIMITS = {'name': 200, 'email': 200, 'phone': 50}
+IDEMPOTENCY_KEY_RE = re.compile(r'^[A-Za-z0-9_-]{8,64}$')
+RESERVATION_COLUMNS = ['id', 'litter_id', 'quantity', 'name', 'email', 'phone', 'status', 'hold_until',
+                       'created_at', 'updated_at']
+
+IP_LIMITER = limiter_from_env('RESERVATION_IP_RATE', burst=5, per_minute=10)
+
+api = Api('reservations', DEFAULT_ALLOW_HEADERS + ', Idempotency-Key')
+
+# One statement: the decrement only matches while enough puppies are left, and
+# the hold row is inserted from its RETURNING, so both happen or neither does
+CLAIM_SQL = """
+    WITH claimed AS (
+        UPDATE litters SET available = available - %(quantity)s, updated_at = """ + NEXT_VERSION_SQL + """
+        WHERE id = %(litter_id)s AND available >= %(quantity)s
+        RETURNING id, available
+    )
+    INSERT INTO reservations (litter_id, quantity, name, email, phone, hold_until, idempotency_key)
+    SELECT id, %(quantity)s, %(name)s, %(email)s, %(phone)s,
+           CURRENT_TIMESTAMP + make_interval(secs => %(hold_seconds)s), %(key)s
+    FROM claimed
+    RETURNING id, hold_until, (SELECT available FROM claimed)
+"""
+
+# Releases holds whose time is up, SWEEP_BATCH at a time. Rows another
+# sweeper or an admin is touching are skipped, not waited for.
+SWEEP_SQL = """
+    WITH due AS (
+        SELECT id FROM reservations
+        WHERE status = 'held' AND hold_until < CURRENT_TIMESTAMP {litter_filter}
+        ORDER BY hold_until
+        LIMIT %(batch)s
+        FOR UPDATE SKIP LOCKED
+    ), expired AS (
+        UPDATE reservations r SET status = 'expired', updated_at = CURRENT_TIMESTAMP
+        FROM due WHERE r.id = due.id
+        RETURNING r.litter_id, r.quantity
+    ), restored AS (
+        UPDATE litters l SET available = l.available + t.quantity, updated_at = """ + NEXT_VERSION_SQL + """
+        FROM (SELECT litter_id, sum(quantity) AS quantity FROM expired GROUP BY litter_id) t
+        WHERE l.id = t.litter_id
+        RETURNING l.id
+    )
+    SELECT (SELECT count(*) FROM expired), (SELECT count(*) FROM restored)
+"""
+
+# Only one full sweep at a time: concurrent sweepers could lock litter rows in different orders
+SWEEP_LOCK_SQL = "SELECT pg_try_advisory_xact_lock(hashtext('reservations_sweeper'))"
+
+
+def refresh_snapshots() -> None:
+    # Every change to available republishes: snapshot reads are never
+    # revalidated, so a skipped publish would stay stale until the next one
+    publish_snapshots(['litters', 'home'])
+
+
+def validate_claim(body_data: Any) -> Dict[str, Any]:
+    if not isinstance(body_data, dict):
+        raise ClientError('Reservation body must be an object')
+
+    claim: Dict[str, Any] = {}
+    for field, limit in CONTACT_LIMITS.items():
+        value = body_data.get(field)
+        if value is None or value == '':
+            if field != 'phone':
+                raise ClientError(field + ' is required')
+            claim[field] = None
+            continue
+        if not isinstance(value, str) or not value.strip() or len(value.strip()) > limit:
+            raise ClientError('%s must be 1-%d characters' % (field, limit))
+        claim[field] = value.strip()
+
+    try:
+        claim['litter_id'] = int(body_data.get('litter_id'))
+        claim['quantity'] = int(body_data.get('quantity', 1))
+    except (TypeError, ValueError):
+        raise ClientError('litter_id and quantity must be integers')
+    if not 1 <= claim['quantity'] <= MAX_QUANTITY:
+        raise ClientError('quantity must be 1-%d' % MAX_QUANTITY)
+    return claim
+
+
+def idempotency_key(request: Request, body_data: Dict[str, Any]) -> str:
+    key = request.header('Idempotency-Key') or body_data.get('idempotency_key')
+    if key is None:
+        return uuid.uuid4().hex
+    if not isinstance(key, str) or not IDEMPOTENCY_KEY_RE.match(key):
+        raise ClientError('Idempotency-Key must be 8-64 letters, digits, "-" or "_"')
+    return key
+
+
+def sweep(conn: Any, litter_id: Optional[int] = None) -> int:
+    '''
+    Business: Return expired holds to their litters
+    Args: connection, optionally a single litter to sweep
+    Returns: number of holds expired; commits each batch
+    '''
+    sql = SWEEP_SQL.format(litter_filter='AND litter_id = %(litter_id)s' if litter_id is not None else '')
+    total = 0
+    cur = conn.cursor()
+    while True:
+        if litter_id is None:
+            cur.execute(SWEEP_LOCK_SQL)
+            if not cur.fetchone()[0]:
+                conn.rollback()
+                break
+        cur.execute(sql, {'batch': SWEEP_BATCH, 'litter_id': litter_id})
+        expired = cur.fetchone()[0]
+        conn.commit()
+        total += expired
+        if expired < SWEEP_BATCH:
+            break
+    cur.close()
+    return total
+
+
+def find_by_key(conn: Any, key: str) -> Optional[Dict[str, Any]]:
+    cur = conn.cursor()
+    cur.execute(
+        "SELECT " + ', '.join(RESERVATION_COLUMNS) + " FROM reservations WHERE idempotency_key = %s", (key,)
+    )
+    row = cur.fetchone()
+    cur.close()
+    return dict(zip(RESERVATION_COLUMNS, row)) if row else None
+
+
+def try_claim(conn: Any, claim: Dict[str, Any], key: str) -> Optional[tuple]:
+    cur = conn.cursor()
+    cur.execute("SET LOCAL lock_timeout = %s", ('%dms' % LOCK_TIMEOUT_MS,))
+    cur.execute(CLAIM_SQL, dict(claim, key=key, hold_seconds=HOLD_SECONDS))
+    row = cur.fetchone()
+    conn.commit()
+    cur.close()
+    return row
+
+
+@api.route('POST')
+def create_reservation(request: Request) -> Dict[str, Any]:
+    retry_after = IP_LIMITER.acquire(request.source_ip)
+    if retry_after > 0:
+        return too_many_requests(retry_after, 'Too many reservations')
+
+    body_data = request.json()
+    claim = validate_claim(body_data)
+    key = idempotency_key(request, body_data)
+
+    with connection() as conn:
+        existing = find_by_key(conn, key)
+        if existing is not None:
+            return json_response(200, {'success': True, 'duplicate': True, 'reservation': existing})
+
+        try:
+            row = try_claim(conn, claim, key)
+            if row is None and sweep(conn, claim['litter_id']):
+                # expired holds on this litter were just returned; try once more
+                row = try_claim(conn, claim, key)
+        except Exception as e:
+            conn.rollback()
+            pgcode = getattr(e, 'pgcode', None)
+            if pgcode == '23505':
+                # the same key won a concurrent race; report the stored hold
+                return json_response(200, {'success': True, 'duplicate': True,
+                                           'reservation': find_by_key(conn, key)})
+            if pgcode == '55P03':
+                return too_many_requests(1, 'Litter is busy, retry')
+            raise
+
+        if row is None:
+            cur = conn.cursor()
+            cur.execute("SELECT available FROM litters WHERE id = %s", (claim['litter_id'],))
+            litter = cur.fetchone()
+            cur.close()
+            if litter is None:
+                raise HttpError(404, 'Litter not found')
+            raise HttpError(409, 'Not enough puppies available', available=litter[0])
+
+    refresh_snapshots()
+    return json_response(201, {'success': True, 'id': row[0], 'hold_until': row[1], 'available': row[2]})
+
+
+@api.route('GET', admin=True)
+def list_reservations(request: Request) -> Dict[str, Any]:
+    params = request.query
+    conditions = []
+    values = []
+    if params.get('litter_id'):
+        conditions.append('litter_id = %s')
+        values.append(params['litter_id'])
+    if params.get('status'):
+        conditions.append('status = %s')
+        values.append(params['status'])
+
+    sql = "SELECT " + ', '.join(RESERVATION_COLUMNS) + " FROM reservations"
+    if conditions:
+        sql += " WHERE " + " AND ".join(conditions)
+    sql += " ORDER BY created_at DESC, id DESC LIMIT 500"
+
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(sql, values)
+        rows = [dict(zip(RESERVATION_COLUMNS, row)) for row in cur.fetchall()]
+        cur.close()
+
+    return json_response(200, {'reservations': rows})
+
+
+@api.route('PUT', admin=True)
+def update_reservation(request: Request) -> Dict[str, Any]:
+    '''
+    Business: Confirm a hold (puppies stay taken) or release it (puppies go back)
+    Args: body with id and action confirm|release
+    Returns: HTTP response with the new status and litter availability
+    '''
+    body_data = request.json()
+    action = body_data.get('action')
+    if action not in ('confirm', 'release'):
+        raise ClientError('action must be confirm or release')
+    try:
+        reservation_id = int(body_data.get('id'))
+    except (TypeError, ValueError):
+        raise ClientError('id is required')
+
+    with connection() as conn:
+        cur = conn.cursor()
+        if action == 'confirm':
+            cur.execute(
+                """UPDATE reservations SET status = 'confirmed', updated_at = CURRENT_TIMESTAMP
+                   WHERE id = %s AND status = 'held'
+                   RETURNING (SELECT available FROM litters WHERE litters.id = reservations.litter_id)""",
+                (reservation_id,)
+            )
+        else:
+            cur.execute(
+                """WITH released AS (
+                       UPDATE reservations SET status = 'released', updated_at = CURRENT_TIMESTAMP
+                       WHERE id = %s AND status IN ('held', 'confirmed')
+                       RETURNING litter_id, quantity
+                   )
+                   UPDATE litters l SET available = l.available + r.quantity, updated_at = """ + NEXT_VERSION_SQL + """
+                   FROM released r WHERE l.id = r.litter_id
+                   RETURNING l.available""",
+                (reservation_id,)
+            )
+        row = cur.fetchone()
+        if row is None:
+            cur.execute("SELECT status FROM reservations WHERE id = %s", (reservation_id,))
+            current = cur.fetchone()
+            cur.close()
+            if current is None:
+                raise HttpError(404, 'Reservation not found')
+            raise HttpError(409, 'Reservation is already ' + current[0], current_status=current[0])
+        conn.commit()
+        cur.close()
+
+    if action == 'release':
+        refresh_snapshots()
+    return json_response(200, {
+        'success': True,
+        'id': reservation_id,
+        'status': 'confirmed' if action == 'confirm' else 'released',
+        'available': row[0]
+    })
+
+
+def run_sweeper() -> Dict[str, Any]:
+    with connection() as conn:
+        expired = sweep(conn)
+    if expired:
+        refresh_snapshots()
+    return {'expired': expired}
+
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    '''
+    Business: Reserve puppies from a litter with an expiring hold; admins confirm or release holds
+    Args: timer trigger event (no httpMethod) runs the sweeper; HTTP POST claims, GET lists, PUT confirms/releases
+    Returns: HTTP response with reservation data, or sweeper counters for a timer run
+    '''
+    if 'httpMethod' not in event and not is_warmup(event):
+        return run_sweeper()
+    return api.dispatch(event, context)
@@ -0,0 +1,159 @@
+import hashlib
+import os
+import re
+import threading
+import weakref
+from typing import Any, Dict, Optional, Sequence, Union
+
+from shared.metrics import count, execute_phase
+
+PLACEHOLDER_RE = re.compile(r'%%|%s')
+NAME_RE = re.compile(r'^[a-z_][a-z0-9_]{0,62}$')
+# PostgreSQL error raised by EXECUTE when the session lost its statements
+# (DISCARD ALL from a proxy, server-side reset)
+INVALID_STATEMENT_NAME = '26000'
+
+
+class Statement:
+    '''
+    One named query. sql keeps the psycopg2 %s form, used when prepared
+    statements are off; prepare/execute are the PREPARE and EXECUTE texts.
+    '''
+
+    def __init__(self, name: str, sql: str):
+        if not NAME_RE.match(name):
+            raise ValueError('Invalid statement name: ' + name)
+        if '%(' in sql:
+            raise ValueError('Named placeholders are not supported in prepared statements: ' + name)
+        self.name = name
+        self.sql = sql
+        self.params = 0
+
+        def number(match: Any) -> str:
+            if match.group() == '%%':
+                return '%'
+            self.params += 1
+            return '$%d' % self.params
+
+        self.prepare = 'PREPARE ' + name + ' AS ' + PLACEHOLDER_RE.sub(number, sql)
+        self.execute = 'EXECUTE ' + name + (' (' + ', '.join(['%s'] * self.params) + ')' if self.params else '')
+
+
+class StatementRegistry:
+    '''
+    Container-wide catalogue of named statements. Each pooled connection
+    PREPAREs a statement the first time it runs it and afterwards sends only
+    EXECUTE, so PostgreSQL skips parsing and planning on the hot paths. The
+    PREPARE is timed as its own 'prepare' phase and is not counted as a query.
+    Which names a connection has prepared is tracked per connection object;
+    a replaced connection starts empty. Dynamic query shapes are registered
+    on first use up to max_statements, past that they run unprepared.
+    '''
+
+    def __init__(self, enabled: bool = True, max_statements: int = 256):
+        self.enabled = enabled
+        self.max_statements = max_statements
+        self._statements: Dict[str, Statement] = {}
+        self._prepared: 'weakref.WeakKeyDictionary[Any, set]' = weakref.WeakKeyDictionary()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            'prepares': 0,
+            'hits': 0,
+            'unprepared': 0,
+            'invalidated': 0,
+        }
+
+    def _bump(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+
+    def register(self, name: str, sql: str) -> Statement:
+        with self._lock:
+            existing = self._statements.get(name)
+            if existing is not None:
+                if existing.sql != sql:
+                    raise ValueError('Statement %s is already registered with different SQL' % name)
+                return existing
+            statement = Statement(name, sql)
+            self._statements[name] = statement
+            return statement
+
+    def shape(self, prefix: str, sql: str) -> Optional[Statement]:
+        '''
+        Returns: the statement for a generated query, named prefix + SQL digest,
+                 or None once the registry is full
+        '''
+        name = prefix + '_' + hashlib.sha1(sql.encode()).hexdigest()[:12]
+        statement = self._statements.get(name)
+        if statement is not None:
+            return statement
+        if len(self._statements) >= self.max_statements:
+            return None
+        return self.register(name, sql)
+
+    def execute(self, cur: Any, statement: Union[Statement, str, None], params: Optional[Sequence[Any]] = None,
+                sql: Optional[str] = None) -> None:
+        '''
+        Business: Run a registered statement on the cursor, preparing it on this connection first if needed
+        Args: cursor, Statement or registered name (None runs sql as-is), parameters,
+              plain SQL to fall back to when there is no statement
+        '''
+        if isinstance(statement, str):
+            statement = self._statements[statement]
+        if statement is None or not self.enabled:
+            self._bump('unprepared')
+            cur.execute(statement.sql if statement is not None else sql, params)
+            return
+
+        conn = cur.connection
+        with self._lock:
+            prepared = self._prepared.get(conn)
+            if prepared is None:
+                prepared = self._prepared[conn] = set()
+
+        if statement.name in prepared:
+            self._bump('hits')
+            count('plan_cache_hits')
+        else:
+            execute_phase(cur, 'prepare', statement.prepare)
+            prepared.add(statement.name)
+            self._bump('prepares')
+            count('statements_prepared')
+
+        try:
+            cur.execute(statement.execute, params)
+        except Exception as e:
+            if getattr(e, 'pgcode', None) == INVALID_STATEMENT_NAME:
+                # the session was reset under us; prepare again on next use
+                prepared.clear()
+                self._bump('invalidated')
+            raise
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            return dict(self.stats, registered=len(self._statements))
+
+
+REGISTRY = StatementRegistry(
+    enabled=os.environ.get('DB_PREPARED_STATEMENTS', '1') not in ('0', 'false', 'no'),
+    max_statements=int(os.environ.get('DB_PREPARED_MAX', '256')),
+)
+
+
+def register(name: str, sql: str) -> Statement:
+    '''Declare a fixed query under a name; safe to call again with the same SQL.'''
+    return REGISTRY.register(name, sql)
+
+
+def execute(cur: Any, statement: Union[Statement, str], params: Optional[Sequence[Any]] = None) -> None:
+    REGISTRY.execute(cur, statement, params)
+
+
+def execute_shape(cur: Any, prefix: str, sql: str, params: Optional[Sequence[Any]] = None) -> None:
+    '''Run a generated query as a prepared statement named after its table/purpose and SQL text.'''
+    REGISTRY.execute(cur, REGISTRY.shape(prefix, sql), params, sql=sql)
+
+
+def statement_stats() -> Dict[str, int]:
+    '''Prepare/hit counters for the container-wide registry; hits are plan-cache reuses.'''
+    return REGISTRY.snapshot()
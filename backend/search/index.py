@@ -0,0 +1,128 @@
+import os
+import re
+import sys
+from typing import Dict, Any, Optional
+
+FUNCTION_DIR = os.path.dirname(os.path.abspath(__file__))
+# Deployed copies carry shared/ beside index.py (scripts/vendor_shared.py); a checkout uses backend/shared
+sys.path.insert(0, FUNCTION_DIR if os.path.isdir(os.path.join(FUNCTION_DIR, 'shared'))
+                else os.path.dirname(FUNCTION_DIR))
+
+from shared.cache import create_cache
+from shared.catalog import HOME_VERSION_SQL
+from shared.http import Api, Request, cached_response, dumps
+from shared.listing import ListingError, decode_cursor, encode_cursor
+
+SEARCH_CACHE = create_cache(HOME_VERSION_SQL)
+
+DEFAULT_LIMIT = 20
+MAX_LIMIT = 50
+MAX_TERMS = 8
+MAX_QUERY_LENGTH = 200
+
+# Letters and digits only, so user input can never inject tsquery operators
+TERM_RE = re.compile(r'[^\W_]+')
+
+SEARCH_SQL = """
+WITH q AS (SELECT to_tsquery('russian', %(query)s) AS query)
+SELECT kind, id, title, image_url, rank FROM (
+    SELECT 'dog' AS kind, d.id, d.name AS title, d.image_url,
+           ts_rank(d.search_vector, q.query)::float8 AS rank
+    FROM dogs d, q WHERE d.search_vector @@ q.query
+    UNION ALL
+    SELECT 'litter', l.id, l.name, l.image_url,
+           ts_rank(l.search_vector, q.query)::float8
+    FROM litters l, q WHERE l.search_vector @@ q.query
+    UNION ALL
+    SELECT 'photo', g.id, coalesce(g.title, ''), g.image_url,
+           ts_rank(g.search_vector, q.query)::float8
+    FROM gallery g, q WHERE g.search_vector @@ q.query
+) hits
+{keyset}
+ORDER BY rank DESC, kind DESC, id DESC
+LIMIT %(limit)s
+"""
+
+api = Api('search', 'Content-Type, If-None-Match')
+
+
+def build_tsquery(raw: str) -> Optional[str]:
+    '''
+    Business: Turn free text into a prefix-matching tsquery ("бар фон" -> "бар:* & фон:*")
+    Args: raw search string from the q parameter
+    Returns: tsquery text, or None when the input has no searchable terms
+    '''
+    terms = TERM_RE.findall(raw[:MAX_QUERY_LENGTH].lower())[:MAX_TERMS]
+    if not terms:
+        return None
+    return ' & '.join(term + ':*' for term in terms)
+
+
+def parse_limit(raw: Optional[str]) -> int:
+    if not raw:
+        return DEFAULT_LIMIT
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise ListingError('limit must be an integer')
+    if limit < 1:
+        raise ListingError('limit must be positive')
+    return min(limit, MAX_LIMIT)
+
+
+def run_search(conn: Any, query: str, limit: int, after: Optional[list]) -> Dict[str, Any]:
+    params = {'query': query, 'limit': limit + 1}
+    keyset = ''
+    if after is not None:
+        keyset = 'WHERE (rank, kind, id) < (%(rank)s, %(kind)s, %(id)s)'
+        params.update(rank=after[0], kind=after[1], id=after[2])
+
+    cur = conn.cursor()
+    cur.execute(SEARCH_SQL.format(keyset=keyset), params)
+    rows = cur.fetchall()
+    cur.close()
+
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        next_cursor = encode_cursor([last[4], last[0], last[1]])
+
+    results = [
+        {'type': kind, 'id': item_id, 'title': title, 'image_url': image_url, 'rank': rank}
+        for kind, item_id, title, image_url, rank in rows
+    ]
+    return {'results': results, 'next_cursor': next_cursor}
+
+
+@api.route('GET')
+def search(request: Request) -> Dict[str, Any]:
+    params = request.query
+    query = build_tsquery(params.get('q') or '')
+    if query is None:
+        raise ListingError('q must contain at least one letter or digit')
+
+    limit = parse_limit(params.get('limit'))
+    after = None
+    if params.get('after'):
+        rank, kind, item_id = decode_cursor(params['after'], 3)
+        try:
+            after = [float(rank), str(kind), int(item_id)]
+        except (TypeError, ValueError):
+            raise ListingError('Invalid cursor')
+
+    key = 'search?q=%s&limit=%d' % (query, limit)
+    if params.get('after'):
+        key += '&after=' + params['after']
+
+    entry = SEARCH_CACHE.get_or_load(key, lambda conn: dumps(run_search(conn, query, limit, after)))
+    return cached_response(request.event, entry)
+
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    '''
+    Business: Ranked full-text search across dogs, litters and gallery
+    Args: event with httpMethod, queryStringParameters (q, limit, after)
+    Returns: HTTP response with ranked results and next_cursor
+    '''
+    return api.dispatch(event, context)
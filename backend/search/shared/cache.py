@@ -0,0 +1,115 @@
+import hashlib
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from shared.db import connection
+from shared.metrics import count
+from shared.statements import execute_shape
+
+
+def make_entry(body: str, version: Tuple[Any, ...]) -> Dict[str, Any]:
+    return {
+        'body': body,
+        'etag': '"%s"' % hashlib.sha256(body.encode()).hexdigest()[:32],
+        'version': version,
+    }
+
+
+class ResponseCache:
+    '''
+    Read-through cache of serialized GET bodies for one table.
+    Entries live for ttl seconds and are capped at max_entries (LRU).
+    After revalidate_after seconds an entry is confirmed against a cheap
+    version query, so writes made by other warm instances become visible
+    within that window. Writes handled by this instance call invalidate().
+    '''
+
+    def __init__(self, version_sql: str, ttl: float = 300.0, max_entries: int = 128,
+                 revalidate_after: float = 5.0):
+        self.version_sql = version_sql
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.revalidate_after = revalidate_after
+        self._entries: 'OrderedDict[str, Dict[str, Any]]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.stats: Dict[str, int] = {
+            'hits': 0,
+            'misses': 0,
+            'revalidated': 0,
+            'stale': 0,
+            'invalidations': 0,
+        }
+
+    def _bump(self, name: str) -> None:
+        with self._lock:
+            self.stats[name] += 1
+        count('cache_' + name)
+
+    def _version(self, conn: Any) -> Tuple[Any, ...]:
+        cur = conn.cursor()
+        execute_shape(cur, 'cache_version', self.version_sql)
+        row = cur.fetchone()
+        cur.close()
+        return tuple(row)
+
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if time.monotonic() - entry['stored_at'] > self.ttl:
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry
+
+    def _store(self, key: str, body: str, version: Tuple[Any, ...]) -> Dict[str, Any]:
+        now = time.monotonic()
+        entry = make_entry(body, version)
+        entry['stored_at'] = now
+        entry['checked_at'] = now
+        with self._lock:
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return entry
+
+    def get_or_load(self, key: str, loader: Callable[[Any], str]) -> Dict[str, Any]:
+        '''
+        Returns: cache entry with serialized body and strong etag
+        '''
+        entry = self._lookup(key)
+        if entry is not None and time.monotonic() - entry['checked_at'] <= self.revalidate_after:
+            self._bump('hits')
+            return entry
+
+        with connection() as conn:
+            version = self._version(conn)
+            if entry is not None and entry['version'] == version:
+                entry['checked_at'] = time.monotonic()
+                self._bump('revalidated')
+                return entry
+            if entry is not None:
+                self._bump('stale')
+            self._bump('misses')
+            body = loader(conn)
+
+        return self._store(key, body, version)
+
+    def invalidate(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self.stats['invalidations'] += 1
+
+
+def create_cache(version_sql: str) -> ResponseCache:
+    return ResponseCache(
+        version_sql,
+        ttl=float(os.environ.get('CACHE_TTL', '300')),
+        max_entries=int(os.environ.get('CACHE_MAX_ENTRIES', '128')),
+        revalidate_after=float(os.environ.get('CACHE_REVALIDATE_AFTER', '5')),
+    )
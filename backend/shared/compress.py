@@ -0,0 +1,112 @@
+import base64
+import gzip
+import importlib.util
+import os
+from typing import Any, Dict, Optional
+
+from shared.metrics import count, timer
+
+# Below this many bytes the header overhead and CPU are not worth it
+COMPRESS_MIN_BYTES = int(os.environ.get('COMPRESS_MIN_BYTES', '1024'))
+GZIP_LEVEL = int(os.environ.get('COMPRESS_GZIP_LEVEL', '6'))
+BROTLI_QUALITY = int(os.environ.get('COMPRESS_BROTLI_QUALITY', '5'))
+
+_has_brotli: Optional[bool] = None
+
+
+def brotli_installed() -> bool:
+    '''Looked up once without importing brotli; the module itself loads on the first br response.'''
+    global _has_brotli
+    if _has_brotli is None:
+        _has_brotli = importlib.util.find_spec('brotli') is not None
+    return _has_brotli
+
+
+def supported_encodings() -> tuple:
+    '''Server preference order; br only when the brotli package is installed.'''
+    return ('br', 'gzip') if brotli_installed() else ('gzip',)
+
+
+def negotiate(accept_encoding: Optional[str]) -> Optional[str]:
+    '''
+    Business: Pick a content coding from an Accept-Encoding header (RFC 9110, 12.5.3)
+    Args: raw header value or None
+    Returns: 'br', 'gzip' or None for identity; highest q wins, ties go to server preference
+    '''
+    if not accept_encoding:
+        return None
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(','):
+        name, _, params = part.strip().partition(';')
+        name = name.strip().lower()
+        if not name:
+            continue
+        q = 1.0
+        params = params.strip()
+        if params.startswith('q='):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        weights[name] = q
+
+    best, best_q = None, 0.0
+    for encoding in supported_encodings():
+        q = weights.get(encoding, weights.get('*', 0.0))
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def encode(body: str, encoding: str) -> str:
+    '''Compressed body, base64-encoded for an isBase64Encoded response.'''
+    raw = body.encode('utf-8')
+    with timer('compress'):
+        if encoding == 'br':
+            import brotli
+
+            data = brotli.compress(raw, quality=BROTLI_QUALITY)
+        else:
+            # mtime=0 keeps the output identical for identical bodies
+            data = gzip.compress(raw, compresslevel=GZIP_LEVEL, mtime=0)
+        return base64.b64encode(data).decode('ascii')
+
+
+def compress_response(accept_encoding: Optional[str], response: Dict[str, Any],
+                      memo: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    '''
+    Business: Apply negotiated compression to a text response
+    Args: Accept-Encoding value, response dict (not modified), optional cache
+          entry to memoize encoded bodies in under 'encoded'
+    Returns: the same response when it is small, binary, already encoded or
+             the client accepts no coding; otherwise a compressed copy
+    '''
+    body = response.get('body')
+    if response.get('isBase64Encoded') or not isinstance(body, str) or len(body) < COMPRESS_MIN_BYTES:
+        return response
+    headers = response.get('headers') or {}
+    if 'Content-Encoding' in headers:
+        return response
+    encoding = negotiate(accept_encoding)
+    if encoding is None:
+        return response
+
+    encoded = None
+    if memo is not None:
+        encoded = memo.setdefault('encoded', {}).get(encoding)
+    if encoded is None:
+        encoded = encode(body, encoding)
+        count('compressed')
+        if memo is not None:
+            memo['encoded'][encoding] = encoded
+    else:
+        count('compress_memo_hits')
+
+    headers = dict(headers)
+    headers['Content-Encoding'] = encoding
+    headers['Vary'] = 'Accept-Encoding'
+    # The coded representation is byte-different; keep validators comparable but weak (as nginx does)
+    etag = headers.get('ETag')
+    if etag and not etag.startswith('W/'):
+        headers['ETag'] = 'W/' + etag
+    return dict(response, headers=headers, body=encoded, isBase64Encoded=True)
@@ -0,0 +1,359 @@
+'''
+Self-hosted gateway: serves every backend/<function>/index.py handler from
+one asyncio HTTP/1.1 server, outside the cloud function platform.
+
+    cd backend && python -m shared.gateway --port 8000 --workers 4 --threads 16 \
+        --timers notifier=60,reservations=60
+
+/<function>[/...] is turned into the same event dict the platform builds
+(httpMethod, headers, queryStringParameters, body, isBase64Encoded,
+requestContext.identity.sourceIp) and handler(event, context) runs in a
+bounded thread pool, so blocking database work never stalls the event
+loop. --workers forks processes that accept on one shared socket; each
+loads the handlers once and keeps them warm. /media/... is served from
+MEDIA_ROOT so the local storage backend works end to end. --timers sends
+the trigger event (no httpMethod) to a function every N seconds, as the
+platform's timer triggers do for the notifier and reservation sweeper.
+'''
+import argparse
+import asyncio
+import base64
+import importlib.util
+import json
+import mimetypes
+import os
+import signal
+import socket
+import sys
+import time
+import traceback
+import urllib.parse
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, List, Optional, Tuple
+
+BACKEND = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MAX_HEADER_BYTES = 64 * 1024
+MAX_BODY_BYTES = int(os.environ.get('GATEWAY_MAX_BODY_BYTES', str(16 * 1024 * 1024)))
+KEEPALIVE_TIMEOUT = 30.0
+
+REASONS = {
+    200: 'OK', 201: 'Created', 202: 'Accepted', 204: 'No Content', 304: 'Not Modified',
+    400: 'Bad Request', 401: 'Unauthorized', 403: 'Forbidden', 404: 'Not Found',
+    405: 'Method Not Allowed', 409: 'Conflict', 413: 'Payload Too Large', 429: 'Too Many Requests',
+    431: 'Request Header Fields Too Large', 500: 'Internal Server Error', 502: 'Bad Gateway',
+    503: 'Service Unavailable',
+}
+
+
+class BadRequest(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class Context:
+    '''Minimal stand-in for the platform's invocation context.'''
+
+    def __init__(self, function_name: str):
+        self.function_name = function_name
+        self.request_id = uuid.uuid4().hex
+        self.started = time.monotonic()
+
+
+def discover_functions() -> List[str]:
+    return sorted(
+        name for name in os.listdir(BACKEND)
+        if name != 'shared' and os.path.isfile(os.path.join(BACKEND, name, 'index.py'))
+    )
+
+
+def load_handler(function: str) -> Any:
+    path = os.path.join(BACKEND, function, 'index.py')
+    spec = importlib.util.spec_from_file_location('gateway_%s_index' % function, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module.handler
+
+
+def build_event(method: str, target: str, headers: Dict[str, str], body: bytes,
+                source_ip: str) -> Tuple[str, Dict[str, Any]]:
+    '''
+    Returns: (function name, platform-style event) for a request target like /dogs?limit=50
+    '''
+    url = urllib.parse.urlsplit(target)
+    parts = [part for part in url.path.split('/') if part]
+    function = parts[0] if parts else ''
+    query = dict(urllib.parse.parse_qsl(url.query, keep_blank_values=True))
+
+    try:
+        text, is_base64 = body.decode('utf-8'), False
+    except UnicodeDecodeError:
+        text, is_base64 = base64.b64encode(body).decode('ascii'), True
+
+    return function, {
+        'httpMethod': method,
+        'path': url.path,
+        'headers': headers,
+        'queryStringParameters': query or None,
+        'body': text if body else None,
+        'isBase64Encoded': is_base64,
+        'requestContext': {'identity': {'sourceIp': source_ip}},
+    }
+
+
+async def read_request(reader: asyncio.StreamReader) -> Optional[Tuple[str, str, Dict[str, str], bytes, bool]]:
+    '''
+    Returns: (method, target, headers, body, keep_alive), or None when the client closed the connection
+    '''
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b'\r\n\r\n'), KEEPALIVE_TIMEOUT)
+    except (asyncio.IncompleteReadError, asyncio.TimeoutError, ConnectionError):
+        return None
+    except asyncio.LimitOverrunError:
+        raise BadRequest(431, 'Request header too large')
+
+    lines = head.decode('latin-1').split('\r\n')
+    try:
+        method, target, version = lines[0].split(' ', 2)
+    except ValueError:
+        raise BadRequest(400, 'Malformed request line')
+
+    headers: Dict[str, str] = {}
+    for line in lines[1:]:
+        if not line:
+            continue
+        name, _, value = line.partition(':')
+        name, value = name.strip(), value.strip()
+        headers[name] = headers[name] + ', ' + value if name in headers else value
+    lowered = {name.lower(): value for name, value in headers.items()}
+
+    if 'chunked' in lowered.get('transfer-encoding', '').lower():
+        body = bytearray()
+        while True:
+            try:
+                size = int((await reader.readuntil(b'\r\n')).split(b';')[0], 16)
+            except ValueError:
+                raise BadRequest(400, 'Malformed chunk size')
+            if size == 0:
+                await reader.readuntil(b'\r\n')
+                break
+            body += await reader.readexactly(size)
+            await reader.readexactly(2)
+            if len(body) > MAX_BODY_BYTES:
+                raise BadRequest(413, 'Request body too large')
+        body = bytes(body)
+    else:
+        try:
+            length = int(lowered.get('content-length', '0'))
+        except ValueError:
+            raise BadRequest(400, 'Invalid Content-Length')
+        if length > MAX_BODY_BYTES:
+            raise BadRequest(413, 'Request body too large')
+        body = await reader.readexactly(length) if length else b''
+
+    connection = lowered.get('connection', '').lower()
+    keep_alive = connection != 'close' if version == 'HTTP/1.1' else connection == 'keep-alive'
+    return method.upper(), target, headers, body, keep_alive
+
+
+def encode_response(result: Dict[str, Any], keep_alive: bool, head_only: bool = False) -> bytes:
+    status = int(result.get('statusCode', 200))
+    body = result.get('body') or ''
+    if isinstance(body, str):
+        body = base64.b64decode(body) if result.get('isBase64Encoded') else body.encode('utf-8')
+
+    lines = ['HTTP/1.1 %d %s' % (status, REASONS.get(status, 'Unknown'))]
+    for name, value in (result.get('headers') or {}).items():
+        if name.lower() not in ('content-length', 'connection', 'transfer-encoding'):
+            lines.append('%s: %s' % (name, value))
+    lines.append('Content-Length: %d' % len(body))
+    lines.append('Connection: ' + ('keep-alive' if keep_alive else 'close'))
+    head = ('\r\n'.join(lines) + '\r\n\r\n').encode('latin-1', 'replace')
+    return head if head_only or status in (204, 304) else head + body
+
+
+def error_result(status: int, message: str) -> Dict[str, Any]:
+    return {
+        'statusCode': status,
+        'headers': {'Content-Type': 'application/json; charset=utf-8', 'Access-Control-Allow-Origin': '*'},
+        'body': json.dumps({'error': message}, ensure_ascii=False),
+    }
+
+
+class Gateway:
+    def __init__(self, handlers: Dict[str, Any], threads: int, media_root: Optional[str]):
+        self.handlers = handlers
+        self.executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix='handler')
+        # Bound in-flight handler calls; further requests wait on the event loop, not in the pool queue
+        self.slots = asyncio.Semaphore(threads * 2)
+        self.media_root = os.path.realpath(media_root) if media_root else None
+
+    async def invoke(self, function: str, event: Dict[str, Any]) -> Dict[str, Any]:
+        handler = self.handlers.get(function)
+        if handler is None:
+            return error_result(404, 'Unknown function: ' + function)
+        loop = asyncio.get_running_loop()
+        async with self.slots:
+            try:
+                return await loop.run_in_executor(self.executor, handler, event, Context(function))
+            except Exception:
+                traceback.print_exc()
+                return error_result(502, 'Function failed')
+
+    def media(self, path: str) -> Dict[str, Any]:
+        relative = urllib.parse.unquote(path[len('/media/'):])
+        full = os.path.realpath(os.path.join(self.media_root, relative))
+        if not full.startswith(self.media_root + os.sep) or not os.path.isfile(full):
+            return error_result(404, 'Not found')
+        with open(full, 'rb') as f:
+            data = f.read()
+        return {
+            'statusCode': 200,
+            'headers': {
+                'Content-Type': mimetypes.guess_type(full)[0] or 'application/octet-stream',
+                'Cache-Control': 'public, max-age=31536000, immutable',
+                'Access-Control-Allow-Origin': '*',
+            },
+            'body': base64.b64encode(data).decode('ascii'),
+            'isBase64Encoded': True,
+        }
+
+    async def serve(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter) -> None:
+        peer = writer.get_extra_info('peername')
+        source_ip = peer[0] if isinstance(peer, tuple) else 'unknown'
+        try:
+            while True:
+                try:
+                    request = await read_request(reader)
+                except BadRequest as e:
+                    writer.write(encode_response(error_result(e.status, str(e)), keep_alive=False))
+                    break
+                if request is None:
+                    break
+                method, target, headers, body, keep_alive = request
+
+                if self.media_root and method in ('GET', 'HEAD') and target.startswith('/media/'):
+                    result = await asyncio.get_running_loop().run_in_executor(
+                        self.executor, self.media, urllib.parse.urlsplit(target).path
+                    )
+                else:
+                    function, event = build_event(
+                        'GET' if method == 'HEAD' else method, target, headers, body, source_ip
+                    )
+                    result = await self.invoke(function, event)
+
+                writer.write(encode_response(result, keep_alive, head_only=method == 'HEAD'))
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def timer(self, function: str, interval: float) -> None:
+        while True:
+            await asyncio.sleep(interval)
+            result = await self.invoke(function, {})
+            if isinstance(result, dict) and result.get('statusCode', 200) >= 500:
+                print('[gateway] timer %s failed: %s' % (function, result.get('body')), file=sys.stderr)
+
+
+def parse_timers(raw: str) -> Dict[str, float]:
+    timers = {}
+    for part in raw.split(','):
+        if part.strip():
+            name, _, seconds = part.partition('=')
+            timers[name.strip()] = float(seconds or '60')
+    return timers
+
+
+async def run_worker(sock: socket.socket, args: argparse.Namespace, timers: Dict[str, float]) -> None:
+    functions = [f for f in args.functions.split(',') if f] if args.functions else discover_functions()
+    handlers = {function: load_handler(function) for function in functions}
+    gateway = Gateway(handlers, args.threads, args.media_root)
+    if not args.no_warmup:
+        # Open pooled connections and fill default caches before taking traffic
+        await asyncio.gather(*(gateway.invoke(function, {'warmup': True}) for function in handlers))
+    server = await asyncio.start_server(gateway.serve, sock=sock, limit=MAX_HEADER_BYTES)
+    tasks = [asyncio.ensure_future(gateway.timer(name, interval))
+             for name, interval in timers.items() if name in handlers]
+    print('[gateway] pid %d serving %s' % (os.getpid(), ', '.join(functions)), file=sys.stderr)
+    try:
+        async with server:
+            await server.serve_forever()
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Serve all backend functions from one process')
+    parser.add_argument('--host', default='0.0.0.0')
+    parser.add_argument('--port', type=int, default=8000)
+    parser.add_argument('--workers', type=int, default=1, help='forked worker processes sharing the socket')
+    parser.add_argument('--threads', type=int, default=16, help='handler threads per worker')
+    parser.add_argument('--functions', help='comma-separated subset (default: every backend/*/index.py)')
+    parser.add_argument('--media-root', default=os.environ.get('MEDIA_ROOT'),
+                        help='serve /media/... from this directory (default: $MEDIA_ROOT)')
+    parser.add_argument('--no-warmup', action='store_true', help='skip the warm-up invocation at worker start')
+    parser.add_argument('--timers', default='', help='function=seconds pairs, e.g. notifier=60')
+    args = parser.parse_args(argv)
+
+    # One pooled connection per handler thread, unless configured otherwise
+    os.environ.setdefault('DB_POOL_MAX_SIZE', str(args.threads))
+    sys.path.insert(0, BACKEND)
+
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((args.host, args.port))
+    sock.listen(1024)
+    sock.set_inheritable(True)
+
+    timers = parse_timers(args.timers)
+    if args.workers <= 1:
+        asyncio.run(run_worker(sock, args, timers))
+        return 0
+
+    children: Dict[int, int] = {}
+
+    def spawn(index: int) -> None:
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            # Timers run in the first worker only, so each fires once per interval
+            code = 0
+            try:
+                asyncio.run(run_worker(sock, args, timers if index == 0 else {}))
+            except BaseException:
+                traceback.print_exc()
+                code = 1
+            os._exit(code)
+        children[pid] = index
+
+    def stop(signum: int, frame: Any) -> None:
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+        raise SystemExit(0)
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+    for index in range(args.workers):
+        spawn(index)
+    # Replace workers that die, e.g. after a crash in native code
+    while True:
+        pid, status = os.wait()
+        index = children.pop(pid, None)
+        if index is not None:
+            print('[gateway] worker %d exited (%d), restarting' % (pid, status), file=sys.stderr)
+            time.sleep(1)
+            spawn(index)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
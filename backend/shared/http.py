@@ -0,0 +1,317 @@
+import base64
+import json
+import math
+import os
+import time
+import traceback
+from datetime import date, datetime
+from typing import Any, Callable, Dict, List, Optional
+
+from shared import metrics
+from shared.compress import compress_response
+from shared.db import get_pool, pool_stats
+from shared.statements import statement_stats
+from shared.tokens import verify_token
+
+CACHE_CONTROL = 'public, max-age=%s, must-revalidate' % os.environ.get('HTTP_CACHE_MAX_AGE', '0')
+
+JSON_HEADERS = {
+    'Content-Type': 'application/json; charset=utf-8',
+    'Access-Control-Allow-Origin': '*'
+}
+
+DEFAULT_ALLOW_HEADERS = 'Content-Type, X-Session-Token, X-User-Role'
+
+WARMUP_CONNECTIONS = int(os.environ.get('WARMUP_CONNECTIONS', '1'))
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError('%r is not JSON serializable' % type(value).__name__)
+
+
+_encode = json.JSONEncoder(ensure_ascii=False, separators=(',', ':'), default=_json_default).encode
+
+
+def dumps(payload: Any) -> str:
+    with metrics.timer('serialize'):
+        return _encode(payload)
+
+
+class ClientError(ValueError):
+    '''Invalid client input; the dispatcher answers it with 400.'''
+
+
+class HttpError(Exception):
+    '''Raised from a route to short-circuit with a JSON error response.'''
+
+    def __init__(self, status: int, message: str, **extra: Any):
+        super().__init__(message)
+        self.status = status
+        self.payload = dict(extra, error=message)
+
+
+def get_header(event: Dict[str, Any], name: str) -> Optional[str]:
+    '''Case-insensitive lookup in event headers.'''
+    headers = event.get('headers') or {}
+    value = headers.get(name)
+    if value is not None:
+        return value
+    lowered = name.lower()
+    for key, candidate in headers.items():
+        if key.lower() == lowered:
+            return candidate
+    return None
+
+
+def _etag_matches(if_none_match: str, etag: str) -> bool:
+    if if_none_match.strip() == '*':
+        return True
+    opaque = etag[2:] if etag.startswith('W/') else etag
+    for candidate in if_none_match.split(','):
+        candidate = candidate.strip()
+        if candidate.startswith('W/'):
+            candidate = candidate[2:]
+        if candidate == opaque:
+            return True
+    return False
+
+
+def is_not_modified(event: Dict[str, Any], etag: str) -> bool:
+    '''
+    Only entity tags are compared. Listings carry no Last-Modified: the
+    newest row timestamp does not move when a row is deleted, so
+    If-Modified-Since would keep deleted rows alive in client caches.
+    '''
+    if_none_match = get_header(event, 'If-None-Match')
+    return if_none_match is not None and _etag_matches(if_none_match, etag)
+
+
+def cached_response(event: Dict[str, Any], entry: Dict[str, Any],
+                    headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    '''
+    Business: Build a 200 or 304 response for a cached GET body
+    Args: event with request headers, cache entry with body and etag
+    Returns: HTTP response with validators and Cache-Control set
+    '''
+    response_headers = dict(headers or JSON_HEADERS)
+    response_headers['ETag'] = entry['etag']
+    response_headers['Cache-Control'] = CACHE_CONTROL
+    response_headers['Access-Control-Expose-Headers'] = 'ETag'
+    response_headers['Vary'] = 'Accept-Encoding'
+
+    if is_not_modified(event, entry['etag']):
+        return {
+            'statusCode': 304,
+            'headers': response_headers,
+            'body': '',
+            'isBase64Encoded': False
+        }
+
+    # Encoded bodies are memoized on the entry, so each coding is computed once per cached version
+    return compress_response(get_header(event, 'Accept-Encoding'), {
+        'statusCode': 200,
+        'headers': response_headers,
+        'body': entry['body'],
+        'isBase64Encoded': False
+    }, memo=entry)
+
+
+def response(status: int, body: str, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    return {
+        'statusCode': status,
+        'headers': headers or JSON_HEADERS,
+        'body': body,
+        'isBase64Encoded': False
+    }
+
+
+def json_response(status: int, payload: Any, headers: Optional[Dict[str, str]] = None) -> Dict[str, Any]:
+    return response(status, dumps(payload), headers)
+
+
+def error_response(status: int, message: str) -> Dict[str, Any]:
+    return json_response(status, {'error': message})
+
+
+def too_many_requests(retry_after: float, message: str) -> Dict[str, Any]:
+    headers = dict(JSON_HEADERS)
+    headers['Retry-After'] = str(max(1, math.ceil(retry_after)))
+    return json_response(429, {'error': message}, headers)
+
+
+_UNSET = object()
+
+
+class Request:
+    '''
+    Thin view over a cloud function event with lazily parsed JSON body.
+    '''
+
+    def __init__(self, event: Dict[str, Any], context: Any):
+        self.event = event
+        self.context = context
+        self.method: str = event.get('httpMethod', 'GET')
+        self.query: Dict[str, Any] = event.get('queryStringParameters') or {}
+        self._body: Any = None
+        self._parsed = False
+        self._session: Any = _UNSET
+
+    def header(self, name: str, default: Optional[str] = None) -> Optional[str]:
+        value = get_header(self.event, name)
+        return default if value is None else value
+
+    def json(self) -> Any:
+        if not self._parsed:
+            raw = self.event.get('body') or '{}'
+            if self.event.get('isBase64Encoded'):
+                raw = base64.b64decode(raw).decode('utf-8')
+            try:
+                self._body = json.loads(raw)
+            except ValueError:
+                raise HttpError(400, 'Invalid JSON body')
+            self._parsed = True
+        return self._body
+
+    def body_bytes(self) -> bytes:
+        raw = self.event.get('body') or ''
+        if self.event.get('isBase64Encoded'):
+            return base64.b64decode(raw)
+        return raw.encode('utf-8')
+
+    @property
+    def source_ip(self) -> str:
+        identity = (self.event.get('requestContext') or {}).get('identity') or {}
+        forwarded = (self.header('X-Forwarded-For') or '').split(',')[0].strip()
+        return identity.get('sourceIp') or forwarded or 'unknown'
+
+    @property
+    def session(self) -> Optional[Dict[str, Any]]:
+        if self._session is _UNSET:
+            self._session = verify_token(self.header('X-Session-Token'))
+        return self._session
+
+    @property
+    def role(self) -> str:
+        session = self.session
+        return session.get('role', 'guest') if session else 'guest'
+
+
+def require_admin(request: Request) -> None:
+    if request.session is None:
+        raise HttpError(401, 'Valid session token required')
+    if request.role != 'admin':
+        raise HttpError(403, 'Admin access required')
+
+
+def is_warmup(event: Dict[str, Any]) -> bool:
+    '''Warm-up invocations ({"warmup": true}, e.g. from a timer trigger) carry no HTTP request.'''
+    return bool(event.get('warmup'))
+
+
+def _database_error_status(error: Exception) -> Optional[int]:
+    pgcode = getattr(error, 'pgcode', None)
+    if not pgcode:
+        return None
+    if pgcode.startswith('23'):
+        return 409
+    if pgcode.startswith('22'):
+        return 400
+    return None
+
+
+class Api:
+    '''
+    Method dispatch for one cloud function. Routes return a response dict
+    (see json_response / cached_response) or raise HttpError; ClientError
+    maps to 400 and constraint/data errors from PostgreSQL to 409/400.
+    Text bodies of COMPRESS_MIN_BYTES and more go out gzip/br-encoded when
+    the client's Accept-Encoding allows it.
+    '''
+
+    def __init__(self, name: str, allow_headers: str = DEFAULT_ALLOW_HEADERS):
+        self.name = name
+        self.routes: Dict[str, Callable[[Request], Dict[str, Any]]] = {}
+        self.public: set = set()
+        self.allow_headers = allow_headers
+        self._preflight: Optional[Dict[str, Any]] = None
+        self._not_allowed = error_response(405, 'Method not allowed')
+
+    def route(self, method: str, admin: bool = False) -> Callable:
+        def decorator(func: Callable[[Request], Dict[str, Any]]) -> Callable[[Request], Dict[str, Any]]:
+            if admin:
+                def guarded(request: Request) -> Dict[str, Any]:
+                    require_admin(request)
+                    return func(request)
+                self.routes[method] = guarded
+            else:
+                self.routes[method] = func
+                self.public.add(method)
+            self._preflight = None
+            return func
+        return decorator
+
+    def preflight(self) -> Dict[str, Any]:
+        if self._preflight is None:
+            methods: List[str] = list(self.routes) + ['OPTIONS']
+            self._preflight = response(200, '', {
+                'Access-Control-Allow-Origin': '*',
+                'Access-Control-Allow-Methods': ', '.join(methods),
+                'Access-Control-Allow-Headers': self.allow_headers,
+                'Access-Control-Max-Age': '86400'
+            })
+        return self._preflight
+
+    def warmup(self, context: Any) -> Dict[str, Any]:
+        '''
+        Business: Warm-up invocation for a fresh container
+        Args: invocation context
+        Returns: HTTP-style response with the number of pooled connections opened
+                 and the status of the public GET run with default parameters
+                 (which fills the response cache / loads the snapshot)
+        '''
+        started = time.perf_counter()
+        result: Dict[str, Any] = {'warmed': self.name}
+        try:
+            result['connections'] = get_pool().prewarm(WARMUP_CONNECTIONS)
+            if 'GET' in self.public:
+                event = {'httpMethod': 'GET', 'headers': {}, 'queryStringParameters': None}
+                result['primed'] = self._route('GET', event, context)['statusCode']
+        except Exception as e:
+            traceback.print_exc()
+            result['error'] = str(e)
+        result['ms'] = round((time.perf_counter() - started) * 1000, 3)
+        return json_response(200, result)
+
+    def dispatch(self, event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+        if is_warmup(event):
+            return self.warmup(context)
+        method = event.get('httpMethod', 'GET')
+        token = metrics.start()
+        if token is None:
+            return self._dispatch(method, event, context)
+        result = self._dispatch(method, event, context)
+        return metrics.finish(token, self.name, method, result, {'pool': pool_stats(), 'statements': statement_stats()})
+
+    def _dispatch(self, method: str, event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+        return compress_response(get_header(event, 'Accept-Encoding'), self._route(method, event, context))
+
+    def _route(self, method: str, event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+        if method == 'OPTIONS':
+            return self.preflight()
+        route = self.routes.get(method)
+        if route is None:
+            return self._not_allowed
+        try:
+            return route(Request(event, context))
+        except HttpError as e:
+            return json_response(e.status, e.payload)
+        except ClientError as e:
+            return error_response(400, str(e))
+        except Exception as e:
+            status = _database_error_status(e)
+            if status is not None:
+                return error_response(status, getattr(getattr(e, 'diag', None), 'message_primary', None) or 'Database error')
+            traceback.print_exc()
+            return error_response(500, 'Internal server error')
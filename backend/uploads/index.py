@@ -0,0 +1,364 @@
+import base64
+import binascii
+import hashlib
+import json
+import os
+import re
+import sys
+import traceback
+import uuid
+from email import policy
+from email.parser import BytesParser
+from typing import Dict, Any, Optional
+
+FUNCTION_DIR = os.path.dirname(os.path.abspath(__file__))
+# Deployed copies carry shared/ beside index.py (scripts/vendor_shared.py); a checkout uses backend/shared
+sys.path.insert(0, FUNCTION_DIR if os.path.isdir(os.path.join(FUNCTION_DIR, 'shared'))
+                else os.path.dirname(FUNCTION_DIR))
+
+from shared.db import connection
+from shared.http import Api, ClientError, HttpError, Request, json_response
+from shared.storage import get_storage
+
+ALLOWED_TYPES = {
+    'image/jpeg': '.jpg',
+    'image/png': '.png',
+    'image/webp': '.webp',
+    'image/avif': '.avif',
+    'image/heic': '.heic',
+}
+CHUNK_SIZE = int(os.environ.get('UPLOAD_CHUNK_SIZE', str(5 * 1024 * 1024)))
+MAX_UPLOAD_BYTES = int(os.environ.get('UPLOAD_MAX_BYTES', str(100 * 1024 * 1024)))
+UPLOAD_EXPIRY_HOURS = int(os.environ.get('UPLOAD_EXPIRY_HOURS', '24'))
+
+SHA256_RE = re.compile(r'^[0-9a-f]{64}$')
+
+UPLOAD_COLUMNS = ['id', 'filename', 'content_type', 'size', 'chunk_size', 'received', 'parts',
+                  'storage_key', 'storage_token', 'expected_sha256', 'sha256', 'status']
+
+api = Api('uploads', 'Content-Type, X-Session-Token, X-User-Role')
+
+
+def check_content_type(raw: Optional[str]) -> str:
+    content_type = (raw or '').split(';')[0].strip().lower()
+    if content_type not in ALLOWED_TYPES:
+        raise ClientError('Unsupported content type: ' + (content_type or 'none'))
+    return content_type
+
+
+def media_key(digest: str, content_type: str) -> str:
+    return 'media/%s/%s%s' % (digest[:2], digest, ALLOWED_TYPES[content_type])
+
+
+def media_result(digest: str, url: str, size: int, deduplicated: bool) -> Dict[str, Any]:
+    return {'complete': True, 'sha256': digest, 'url': url, 'size': size, 'deduplicated': deduplicated}
+
+
+def find_media(conn: Any, digest: str) -> Optional[Dict[str, Any]]:
+    cur = conn.cursor()
+    cur.execute("SELECT url, size FROM media_files WHERE sha256 = %s", (digest,))
+    row = cur.fetchone()
+    cur.close()
+    return {'url': row[0], 'size': row[1]} if row else None
+
+
+def register_media(digest: str, key: str, url: str, size: int, content_type: str) -> None:
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """INSERT INTO media_files (sha256, storage_key, url, size, content_type)
+               VALUES (%s, %s, %s, %s, %s) ON CONFLICT (sha256) DO NOTHING""",
+            (digest, key, url, size, content_type)
+        )
+        conn.commit()
+        cur.close()
+
+
+def load_upload(conn: Any, upload_id: Optional[str]) -> Dict[str, Any]:
+    if not upload_id:
+        raise ClientError('id is required')
+    cur = conn.cursor()
+    cur.execute("SELECT " + ', '.join(UPLOAD_COLUMNS) + " FROM uploads WHERE id = %s", (upload_id,))
+    row = cur.fetchone()
+    cur.close()
+    if row is None:
+        raise HttpError(404, 'Upload not found')
+    return dict(zip(UPLOAD_COLUMNS, row))
+
+
+def set_status(upload_id: str, status: str, sha256: Optional[str] = None) -> None:
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """UPDATE uploads SET status = %s, sha256 = coalesce(%s, sha256),
+               updated_at = CURRENT_TIMESTAMP WHERE id = %s""",
+            (status, sha256, upload_id)
+        )
+        conn.commit()
+        cur.close()
+
+
+def expire_uploads(conn: Any) -> None:
+    '''Abort a handful of abandoned uploads so their parts do not pile up in storage.'''
+    cur = conn.cursor()
+    cur.execute(
+        """UPDATE uploads SET status = 'expired', updated_at = CURRENT_TIMESTAMP
+           WHERE id IN (SELECT id FROM uploads WHERE status = 'open'
+                        AND updated_at < CURRENT_TIMESTAMP - make_interval(hours => %s)
+                        LIMIT 20)
+           RETURNING storage_key, storage_token""",
+        (UPLOAD_EXPIRY_HOURS,)
+    )
+    expired = cur.fetchall()
+    conn.commit()
+    cur.close()
+
+    storage = get_storage()
+    for key, token in expired:
+        try:
+            storage.abort(key, token)
+        except Exception:
+            traceback.print_exc()
+
+
+def upload_single(request: Request) -> Dict[str, Any]:
+    '''Whole file in one multipart/form-data request (up to one chunk in size).'''
+    content_type_header = request.header('Content-Type', '')
+    body = request.body_bytes()
+    if len(body) > CHUNK_SIZE + 64 * 1024:
+        raise HttpError(413, 'File too large for a single request, use chunked upload',
+                        chunk_size=CHUNK_SIZE)
+
+    try:
+        header_bytes = content_type_header.encode('latin-1')
+    except UnicodeEncodeError:
+        raise ClientError('Content-Type header must be Latin-1')
+    if b'\r' in header_bytes or b'\n' in header_bytes:
+        raise ClientError('Invalid Content-Type header')
+    message = BytesParser(policy=policy.default).parsebytes(
+        b'Content-Type: ' + header_bytes + b'\r\n\r\n' + body
+    )
+    file_part = next((part for part in message.iter_parts() if part.get_filename()), None)
+    if file_part is None:
+        raise ClientError('multipart body must contain a file field')
+
+    content_type = check_content_type(file_part.get_content_type())
+    data = file_part.get_payload(decode=True) or b''
+    if not data:
+        raise ClientError('File is empty')
+    digest = hashlib.sha256(data).hexdigest()
+
+    with connection() as conn:
+        existing = find_media(conn, digest)
+    if existing is not None:
+        return json_response(200, media_result(digest, existing['url'], existing['size'], True))
+
+    key = media_key(digest, content_type)
+    url = get_storage().put(key, data, content_type)
+    register_media(digest, key, url, len(data), content_type)
+    return json_response(201, media_result(digest, url, len(data), False))
+
+
+def start_upload(body_data: Dict[str, Any]) -> Dict[str, Any]:
+    content_type = check_content_type(body_data.get('content_type'))
+    try:
+        size = int(body_data.get('size'))
+    except (TypeError, ValueError):
+        raise ClientError('size must be an integer')
+    if size < 1 or size > MAX_UPLOAD_BYTES:
+        raise ClientError('size must be between 1 and %d bytes' % MAX_UPLOAD_BYTES)
+
+    expected = (body_data.get('sha256') or '').lower() or None
+    if expected is not None and not SHA256_RE.match(expected):
+        raise ClientError('sha256 must be 64 hex characters')
+
+    with connection() as conn:
+        expire_uploads(conn)
+        existing = find_media(conn, expected) if expected else None
+    if existing is not None:
+        return json_response(200, media_result(expected, existing['url'], existing['size'], True))
+
+    upload_id = uuid.uuid4().hex
+    key = 'staging/' + upload_id
+    token = get_storage().begin(key, content_type)
+
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """INSERT INTO uploads (id, filename, content_type, size, chunk_size, storage_key,
+               storage_token, expected_sha256)
+               VALUES (%s, %s, %s, %s, %s, %s, %s, %s)""",
+            (upload_id, (body_data.get('filename') or '')[:255], content_type, size, CHUNK_SIZE,
+             key, token, expected)
+        )
+        conn.commit()
+        cur.close()
+
+    return json_response(201, {
+        'id': upload_id,
+        'complete': False,
+        'size': size,
+        'chunk_size': CHUNK_SIZE,
+        'received': 0
+    })
+
+
+def complete_upload(body_data: Dict[str, Any]) -> Dict[str, Any]:
+    upload_id = body_data.get('id')
+
+    with connection() as conn:
+        upload = load_upload(conn, upload_id)
+        if upload['status'] == 'complete':
+            existing = find_media(conn, upload['sha256'])
+            return json_response(200, media_result(upload['sha256'], existing['url'], existing['size'], True))
+
+        cur = conn.cursor()
+        cur.execute(
+            """UPDATE uploads SET status = 'completing', updated_at = CURRENT_TIMESTAMP
+               WHERE id = %s AND status = 'open' AND received = size RETURNING id""",
+            (upload_id,)
+        )
+        claimed = cur.fetchone()
+        conn.commit()
+        cur.close()
+
+    if claimed is None:
+        raise HttpError(409, 'Upload is not ready to complete',
+                        upload_status=upload['status'], received=upload['received'], size=upload['size'])
+
+    storage = get_storage()
+    key = upload['storage_key']
+    try:
+        storage.finish(key, upload['storage_token'], upload['parts'])
+
+        digest = hashlib.sha256()
+        for chunk in storage.stream(key):
+            digest.update(chunk)
+        digest = digest.hexdigest()
+
+        if upload['expected_sha256'] and upload['expected_sha256'] != digest:
+            storage.delete(key)
+            set_status(upload_id, 'failed', digest)
+            raise HttpError(400, 'Checksum mismatch', sha256=digest)
+
+        with connection() as conn:
+            existing = find_media(conn, digest)
+        if existing is not None:
+            storage.delete(key)
+            set_status(upload_id, 'complete', digest)
+            return json_response(200, media_result(digest, existing['url'], existing['size'], True))
+
+        final_key = media_key(digest, upload['content_type'])
+        url = storage.move(key, final_key, upload['content_type'])
+        register_media(digest, final_key, url, upload['size'], upload['content_type'])
+        set_status(upload_id, 'complete', digest)
+    except HttpError:
+        raise
+    except Exception:
+        set_status(upload_id, 'failed')
+        raise
+
+    return json_response(201, media_result(digest, url, upload['size'], False))
+
+
+def chunk_data(request: Request) -> bytes:
+    '''Raw bytes for application/octet-stream, otherwise the body is base64 text.'''
+    if (request.header('Content-Type') or '').startswith('application/octet-stream'):
+        return request.body_bytes()
+    try:
+        return base64.b64decode(request.body_bytes(), validate=True)
+    except binascii.Error:
+        raise ClientError('Chunk body must be base64')
+
+
+@api.route('GET', admin=True)
+def get_upload(request: Request) -> Dict[str, Any]:
+    with connection() as conn:
+        upload = load_upload(conn, request.query.get('id'))
+        media = find_media(conn, upload['sha256']) if upload['sha256'] else None
+
+    result = {field: upload[field] for field in ('id', 'filename', 'content_type', 'size',
+                                                   'chunk_size', 'received', 'status', 'sha256')}
+    result['url'] = media['url'] if media else None
+    return json_response(200, result)
+
+
+@api.route('POST', admin=True)
+def post_upload(request: Request) -> Dict[str, Any]:
+    if (request.header('Content-Type') or '').startswith('multipart/form-data'):
+        return upload_single(request)
+
+    body_data = request.json()
+    action = body_data.get('action', 'start')
+    if action == 'start':
+        return start_upload(body_data)
+    if action == 'complete':
+        return complete_upload(body_data)
+    raise HttpError(400, 'Invalid action')
+
+
+@api.route('PUT', admin=True)
+def put_chunk(request: Request) -> Dict[str, Any]:
+    upload_id = request.query.get('id')
+    try:
+        offset = int(request.query.get('offset', ''))
+    except ValueError:
+        raise ClientError('offset must be an integer')
+
+    with connection() as conn:
+        upload = load_upload(conn, upload_id)
+
+    if upload['status'] != 'open':
+        raise HttpError(409, 'Upload is not open', upload_status=upload['status'])
+    if offset != upload['received']:
+        raise HttpError(409, 'Unexpected offset', received=upload['received'])
+
+    data = chunk_data(request)
+    end = offset + len(data)
+    if not data or end > upload['size']:
+        raise ClientError('Chunk is empty or runs past the declared size')
+    if len(data) != upload['chunk_size'] and end != upload['size']:
+        raise ClientError('Chunks must be chunk_size bytes except the last one')
+
+    number = offset // upload['chunk_size'] + 1
+    etag = get_storage().put_part(upload['storage_key'], upload['storage_token'], number, data)
+
+    with connection() as conn:
+        cur = conn.cursor()
+        cur.execute(
+            """UPDATE uploads SET received = %s, parts = parts || %s::jsonb,
+               updated_at = CURRENT_TIMESTAMP
+               WHERE id = %s AND received = %s AND status = 'open' RETURNING received""",
+            (end, json.dumps([etag]), upload_id, offset)
+        )
+        updated = cur.fetchone()
+        conn.commit()
+        cur.close()
+
+    if updated is None:
+        with connection() as conn:
+            upload = load_upload(conn, upload_id)
+        raise HttpError(409, 'Unexpected offset', received=upload['received'])
+
+    return json_response(200, {'id': upload_id, 'complete': False, 'size': upload['size'], 'received': end})
+
+
+@api.route('DELETE', admin=True)
+def abort_upload(request: Request) -> Dict[str, Any]:
+    with connection() as conn:
+        upload = load_upload(conn, request.query.get('id'))
+
+    if upload['status'] == 'open':
+        get_storage().abort(upload['storage_key'], upload['storage_token'])
+        set_status(upload['id'], 'aborted')
+
+    return json_response(200, {'success': True})
+
+
+def handler(event: Dict[str, Any], context: Any) -> Dict[str, Any]:
+    '''
+    Business: Resumable photo uploads with content-hash deduplication
+    Args: event with httpMethod, headers, body (multipart file, JSON start/complete, or base64 chunk), queryStringParameters (id, offset)
+    Returns: HTTP response with upload progress or the stored file URL
+    '''
+    return api.dispatch(event, context)
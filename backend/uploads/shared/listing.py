@@ -0,0 +1,118 @@
+import base64
+import json
+from typing import Any, Dict, List, Optional, Tuple
+
+from shared.http import ClientError
+from shared.metrics import timer
+from shared.statements import execute_shape
+
+DEFAULT_MAX_LIMIT = 100
+
+
+class ListingError(ClientError):
+    pass
+
+
+def encode_cursor(values: List[Any]) -> str:
+    raw = json.dumps([v.isoformat() if hasattr(v, 'isoformat') else v for v in values])
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor: str, size: int) -> List[Any]:
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise ListingError('Invalid cursor')
+    if not isinstance(values, list) or len(values) != size:
+        raise ListingError('Invalid cursor')
+    return values
+
+
+def parse_listing(params: Optional[Dict[str, Any]], all_fields: List[str],
+                  cursor_size: int, max_limit: int = DEFAULT_MAX_LIMIT) -> Dict[str, Any]:
+    '''
+    Business: Parse limit/after/fields query parameters for a list endpoint
+    Args: queryStringParameters, selectable fields, number of keyset columns
+    Returns: dict with limit (None = unpaginated), after (decoded cursor) and fields
+    '''
+    params = params or {}
+
+    limit = None
+    if params.get('limit'):
+        try:
+            limit = int(params['limit'])
+        except ValueError:
+            raise ListingError('limit must be an integer')
+        if limit < 1:
+            raise ListingError('limit must be positive')
+        limit = min(limit, max_limit)
+
+    after = None
+    if params.get('after'):
+        after = decode_cursor(params['after'], cursor_size)
+
+    fields = list(all_fields)
+    if params.get('fields'):
+        requested = [f.strip() for f in params['fields'].split(',') if f.strip()]
+        unknown = [f for f in requested if f not in all_fields]
+        if unknown:
+            raise ListingError('Unknown fields: ' + ', '.join(unknown))
+        fields = ['id'] + [f for f in all_fields if f in requested and f != 'id']
+
+    return {'limit': limit, 'after': after, 'fields': fields}
+
+
+def cache_key(name: str, listing: Dict[str, Any], all_fields: List[str]) -> str:
+    query = []
+    if listing['limit'] is not None:
+        query.append('limit=%d' % listing['limit'])
+    if listing['after'] is not None:
+        query.append('after=' + encode_cursor(listing['after']))
+    if listing['fields'] != all_fields:
+        query.append('fields=' + ','.join(listing['fields']))
+    return name + ('?' + '&'.join(query) if query else '')
+
+
+def fetch_page(conn: Any, table: str, listing: Dict[str, Any], order: List[str],
+               descending: bool, conditions: Optional[List[Tuple[str, Any]]] = None) -> Dict[str, Any]:
+    '''
+    Business: Run a keyset-paginated SELECT over whitelisted columns
+    Args: connection, table name, parsed listing, keyset columns, sort direction,
+          extra (sql predicate with one %s, value) filters
+    Returns: dict with rows (list of column dicts) and next_cursor
+    '''
+    fields = listing['fields']
+    columns = fields + [c for c in order if c not in fields]
+    direction = 'DESC' if descending else 'ASC'
+    sql = 'SELECT ' + ', '.join(columns) + ' FROM ' + table
+    predicates = [predicate for predicate, _ in conditions or []]
+    args: List[Any] = [value for _, value in conditions or []]
+
+    if listing['after'] is not None:
+        comparison = '<' if descending else '>'
+        predicates.append('(' + ', '.join(order) + ') ' + comparison + ' (' + ', '.join(['%s'] * len(order)) + ')')
+        args.extend(listing['after'])
+
+    if predicates:
+        sql += ' WHERE ' + ' AND '.join(predicates)
+
+    sql += ' ORDER BY ' + ', '.join(c + ' ' + direction for c in order)
+
+    if listing['limit'] is not None:
+        sql += ' LIMIT %s'
+        args.append(listing['limit'] + 1)
+
+    cur = conn.cursor()
+    execute_shape(cur, table + '_list', sql, args)
+    raw_rows = cur.fetchall()
+    cur.close()
+    with timer('build'):
+        rows = [dict(zip(columns, row)) for row in raw_rows]
+
+    next_cursor = None
+    if listing['limit'] is not None and len(rows) > listing['limit']:
+        rows = rows[:listing['limit']]
+        next_cursor = encode_cursor([rows[-1][c] for c in order])
+
+    return {'rows': rows, 'next_cursor': next_cursor}
@@ -0,0 +1,195 @@
+import contextvars
+import json
+import os
+import sys
+import time
+from contextlib import contextmanager, nullcontext
+from typing import Any, ContextManager, Dict, Iterator, Optional
+
+ENABLED = os.environ.get('METRICS_ENABLED', '') in ('1', 'true', 'yes')
+
+PHASES = ('connect', 'prepare', 'execute', 'fetch', 'build', 'serialize', 'compress')
+
+_current: contextvars.ContextVar = contextvars.ContextVar('request_metrics', default=None)
+_invocations = 0
+_noop = nullcontext()
+
+
+class RequestMetrics:
+    '''
+    Phase timings and counters for one invocation.
+    Durations are accumulated in milliseconds.
+    '''
+
+    def __init__(self) -> None:
+        self.started = time.perf_counter()
+        self.phases: Dict[str, float] = {}
+        self.counters: Dict[str, int] = {}
+
+    def add(self, phase: str, elapsed_ms: float) -> None:
+        self.phases[phase] = self.phases.get(phase, 0.0) + elapsed_ms
+
+    def count(self, name: str, amount: int = 1) -> None:
+        self.counters[name] = self.counters.get(name, 0) + amount
+
+    def total_ms(self) -> float:
+        return (time.perf_counter() - self.started) * 1000
+
+    def server_timing(self, total_ms: float) -> str:
+        parts = ['%s;dur=%.2f' % (phase, self.phases[phase]) for phase in PHASES if phase in self.phases]
+        parts.append('total;dur=%.2f' % total_ms)
+        return ', '.join(parts)
+
+
+def current() -> Optional[RequestMetrics]:
+    return _current.get()
+
+
+@contextmanager
+def _timed(metrics: RequestMetrics, phase: str) -> Iterator[None]:
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.add(phase, (time.perf_counter() - started) * 1000)
+
+
+def timer(phase: str) -> ContextManager[None]:
+    '''Time a block into the active request, or do nothing when metrics are off.'''
+    metrics = _current.get()
+    if metrics is None:
+        return _noop
+    return _timed(metrics, phase)
+
+
+def count(name: str, amount: int = 1) -> None:
+    metrics = _current.get()
+    if metrics is not None:
+        metrics.count(name, amount)
+
+
+_timed_cursor: Optional[type] = None
+
+
+def timed_cursor() -> type:
+    '''Cursor factory for psycopg2.connect; built on first use so importing metrics stays driver-free.'''
+    global _timed_cursor
+    if _timed_cursor is None:
+        import psycopg2.extensions
+
+        class TimedCursor(psycopg2.extensions.cursor):
+            '''
+            Cursor that reports execute/fetch time and row counts to the active
+            request. Without an active request it behaves like the stock cursor.
+            '''
+
+            def execute(self, query: Any, vars: Any = None) -> Any:
+                metrics = _current.get()
+                if metrics is None:
+                    return super().execute(query, vars)
+                metrics.count('queries')
+                with _timed(metrics, 'execute'):
+                    return super().execute(query, vars)
+
+            def fetchone(self) -> Any:
+                metrics = _current.get()
+                if metrics is None:
+                    return super().fetchone()
+                with _timed(metrics, 'fetch'):
+                    row = super().fetchone()
+                if row is not None:
+                    metrics.count('rows')
+                return row
+
+            def fetchmany(self, size: Any = None) -> Any:
+                metrics = _current.get()
+                if metrics is None:
+                    return super().fetchmany(size) if size is not None else super().fetchmany()
+                with _timed(metrics, 'fetch'):
+                    rows = super().fetchmany(size) if size is not None else super().fetchmany()
+                metrics.count('rows', len(rows))
+                return rows
+
+            def fetchall(self) -> Any:
+                metrics = _current.get()
+                if metrics is None:
+                    return super().fetchall()
+                with _timed(metrics, 'fetch'):
+                    rows = super().fetchall()
+                metrics.count('rows', len(rows))
+                return rows
+
+        _timed_cursor = TimedCursor
+    return _timed_cursor
+
+
+def execute_phase(cur: Any, phase: str, query: Any, vars: Any = None) -> Any:
+    '''
+    Business: Run a bookkeeping statement (e.g. PREPARE) timed under its own phase
+    Args: cursor, phase name from PHASES, query and parameters
+    Returns: the cursor's execute result; the statement is left out of execute time and the queries count
+    '''
+    with timer(phase):
+        if _timed_cursor is not None and isinstance(cur, _timed_cursor):
+            return super(_timed_cursor, cur).execute(query, vars)
+        return cur.execute(query, vars)
+
+
+def log_event(kind: str, **fields: Any) -> None:
+    '''One structured JSON log line, in the same shape as the request_metrics records.'''
+    record = dict(fields, type=kind)
+    sys.stdout.write(json.dumps(record, ensure_ascii=False, default=str, separators=(',', ':')) + '\n')
+    sys.stdout.flush()
+
+
+def start() -> Optional[Any]:
+    '''
+    Business: Begin collecting metrics for one invocation when METRICS_ENABLED is set
+    Returns: token for finish(), or None when metrics are off
+    '''
+    if not ENABLED:
+        return None
+    return _current.set(RequestMetrics())
+
+
+def finish(token: Any, function: str, method: str, response: Dict[str, Any],
+           extra: Optional[Dict[str, Any]] = None) -> Dict[str, Any]:
+    '''
+    Business: Emit one structured log line and attach Server-Timing to the response
+    Args: token from start(), function and method names, the response dict,
+          extra fields for the log line (e.g. pool stats)
+    Returns: response with a copied headers dict including Server-Timing
+    '''
+    global _invocations
+    metrics = _current.get()
+    _current.reset(token)
+    if metrics is None:
+        return response
+
+    _invocations += 1
+    total_ms = metrics.total_ms()
+    body = response.get('body') or ''
+    record = {
+        'type': 'request_metrics',
+        'function': function,
+        'method': method,
+        'status': response.get('statusCode'),
+        'cold': _invocations == 1,
+        'total_ms': round(total_ms, 3),
+        'phases_ms': {phase: round(value, 3) for phase, value in metrics.phases.items()},
+        'rows': metrics.counters.get('rows', 0),
+        'queries': metrics.counters.get('queries', 0),
+        'payload_bytes': len(body.encode('utf-8')) if isinstance(body, str) else len(body),
+    }
+    for name, value in metrics.counters.items():
+        if name not in ('rows', 'queries'):
+            record[name] = value
+    if extra:
+        record.update(extra)
+    sys.stdout.write(json.dumps(record, separators=(',', ':')) + '\n')
+    sys.stdout.flush()
+
+    headers = dict(response.get('headers') or {})
+    headers['Server-Timing'] = metrics.server_timing(total_ms)
+    headers['Timing-Allow-Origin'] = '*'
+    return dict(response, headers=headers)
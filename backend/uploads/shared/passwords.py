@@ -0,0 +1,124 @@
+import base64
+import hashlib
+import hmac
+import os
+import secrets
+import threading
+from contextlib import contextmanager
+from typing import Iterator, Optional
+
+PASSWORD_KDF = os.environ.get('PASSWORD_KDF', 'scrypt')
+SCRYPT_N = int(os.environ.get('SCRYPT_N', str(2 ** 14)))
+SCRYPT_R = int(os.environ.get('SCRYPT_R', '8'))
+SCRYPT_P = int(os.environ.get('SCRYPT_P', '1'))
+PBKDF2_ITERATIONS = int(os.environ.get('PBKDF2_ITERATIONS', '600000'))
+PASSWORD_WORKERS = int(os.environ.get('PASSWORD_WORKERS', '2'))
+
+_kdf_slots = threading.BoundedSemaphore(PASSWORD_WORKERS)
+
+
+class PasswordBusy(Exception):
+    '''No KDF slot freed up within the caller's timeout.'''
+
+
+def _b64(raw: bytes) -> str:
+    return base64.b64encode(raw).decode().rstrip('=')
+
+
+def _unb64(text: str) -> bytes:
+    return base64.b64decode(text + '=' * (-len(text) % 4))
+
+
+def _scrypt(password: str, salt: bytes, n: int, r: int, p: int) -> bytes:
+    return hashlib.scrypt(password.encode(), salt=salt, n=n, r=r, p=p,
+                          maxmem=128 * n * r * p + 1024 * 1024, dklen=32)
+
+
+def _pbkdf2(password: str, salt: bytes, iterations: int) -> bytes:
+    return hashlib.pbkdf2_hmac('sha256', password.encode(), salt, iterations)
+
+
+def hash_password(password: str, kdf: Optional[str] = None) -> str:
+    '''
+    Business: Hash a password with the configured KDF
+    Returns: self-describing hash, e.g. "scrypt$16384$8$1$<salt>$<hash>"
+    '''
+    kdf = kdf or PASSWORD_KDF
+    salt = secrets.token_bytes(16)
+    if kdf == 'scrypt':
+        digest = _scrypt(password, salt, SCRYPT_N, SCRYPT_R, SCRYPT_P)
+        return 'scrypt$%d$%d$%d$%s$%s' % (SCRYPT_N, SCRYPT_R, SCRYPT_P, _b64(salt), _b64(digest))
+    if kdf == 'pbkdf2_sha256':
+        digest = _pbkdf2(password, salt, PBKDF2_ITERATIONS)
+        return 'pbkdf2_sha256$%d$%s$%s' % (PBKDF2_ITERATIONS, _b64(salt), _b64(digest))
+    raise ValueError('Unknown PASSWORD_KDF: %s' % kdf)
+
+
+def verify_password(password: str, stored: str) -> bool:
+    '''
+    Business: Check a password against any supported hash format,
+              including legacy unsalted SHA-256 hex digests
+    '''
+    if not stored:
+        return False
+    parts = stored.split('$')
+    try:
+        if parts[0] == 'scrypt' and len(parts) == 6:
+            n, r, p = int(parts[1]), int(parts[2]), int(parts[3])
+            digest = _scrypt(password, _unb64(parts[4]), n, r, p)
+            return hmac.compare_digest(digest, _unb64(parts[5]))
+        if parts[0] == 'pbkdf2_sha256' and len(parts) == 4:
+            digest = _pbkdf2(password, _unb64(parts[2]), int(parts[1]))
+            return hmac.compare_digest(digest, _unb64(parts[3]))
+    except (ValueError, TypeError):
+        return False
+    if len(stored) == 64:
+        legacy = hashlib.sha256(password.encode()).hexdigest()
+        return hmac.compare_digest(legacy, stored)
+    return False
+
+
+def needs_rehash(stored: str) -> bool:
+    '''True for legacy hashes and hashes made with other KDF settings than the current ones.'''
+    parts = stored.split('$')
+    if PASSWORD_KDF == 'scrypt':
+        return parts[:4] != ['scrypt', str(SCRYPT_N), str(SCRYPT_R), str(SCRYPT_P)]
+    if PASSWORD_KDF == 'pbkdf2_sha256':
+        return parts[:2] != ['pbkdf2_sha256', str(PBKDF2_ITERATIONS)]
+    return True
+
+
+@contextmanager
+def kdf_slot(timeout: float) -> Iterator[None]:
+    '''
+    Concurrency limit, not an offload: the KDF still runs in the calling
+    thread, but at most PASSWORD_WORKERS hashes run at once in this
+    container. Raises PasswordBusy when no slot frees up within timeout.
+    '''
+    if not _kdf_slots.acquire(timeout=timeout):
+        raise PasswordBusy()
+    try:
+        yield
+    finally:
+        _kdf_slots.release()
+
+
+def verify_password_limited(password: str, stored: str, timeout: float) -> bool:
+    with kdf_slot(timeout):
+        return verify_password(password, stored)
+
+
+def hash_password_limited(password: str, timeout: float) -> str:
+    with kdf_slot(timeout):
+        return hash_password(password)
+
+
+def _dummy_hash() -> str:
+    # Same KDF and cost as a real hash, so unknown usernames take as long as known ones
+    salt, digest = _b64(b'\0' * 16), _b64(b'\0' * 32)
+    if PASSWORD_KDF == 'pbkdf2_sha256':
+        return 'pbkdf2_sha256$%d$%s$%s' % (PBKDF2_ITERATIONS, salt, digest)
+    return 'scrypt$%d$%d$%d$%s$%s' % (SCRYPT_N, SCRYPT_R, SCRYPT_P, salt, digest)
+
+
+DUMMY_HASH = _dummy_hash()
@@ -0,0 +1,94 @@
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Sequence
+
+from shared.http import JSON_HEADERS, ClientError, HttpError, Request, json_response
+from shared.statements import execute_shape
+
+# Strictly increasing per row, so two writes can never leave the same version behind
+NEXT_VERSION_SQL = "greatest(clock_timestamp()::timestamp, updated_at + interval '1 microsecond')"
+
+
+def version_token(updated_at: Optional[datetime]) -> Optional[str]:
+    '''Entity tag for a row version; the value is the row's updated_at as returned by GET.'''
+    return '"%s"' % updated_at.isoformat() if updated_at else None
+
+
+def expected_version(request: Request, body_data: Dict[str, Any]) -> Optional[datetime]:
+    '''
+    Business: Read the version a write was based on
+    Args: request with an optional If-Match header, body with an optional updated_at
+    Returns: updated_at the client last saw, or None for an unconditional write
+    '''
+    raw = request.header('If-Match') or body_data.get('updated_at')
+    if raw is None or raw == '*':
+        return None
+    if not isinstance(raw, str):
+        raise ClientError('If-Match must be the updated_at of the edited row')
+    raw = raw.strip()
+    if raw.startswith('W/'):
+        raw = raw[2:]
+    try:
+        return datetime.fromisoformat(raw.strip('"'))
+    except ValueError:
+        raise ClientError('If-Match must be the updated_at of the edited row')
+
+
+def parse_changes(body_data: Any, columns: Sequence[str]) -> Dict[str, Any]:
+    '''Supplied columns only; id and updated_at are addressing, not changes.'''
+    if not isinstance(body_data, dict):
+        raise ClientError('PATCH body must be a JSON object')
+    unknown = [key for key in body_data if key not in columns and key not in ('id', 'updated_at')]
+    if unknown:
+        raise ClientError('Unknown fields: ' + ', '.join(sorted(unknown)))
+    changes = {column: body_data[column] for column in columns if column in body_data}
+    if not changes:
+        raise ClientError('Nothing to update')
+    return changes
+
+
+def update_row(conn: Any, table: str, row_id: int, changes: Dict[str, Any],
+               casts: Dict[str, str], version: Optional[datetime]) -> datetime:
+    '''
+    Business: UPDATE only the given columns of one row, optionally guarded by its version
+    Args: connection, table, id, {column: value}, column casts, expected updated_at
+    Returns: the new updated_at. Raises 404 when the row is gone and 409 (with the
+             current updated_at) when it changed since the client's version.
+    '''
+    columns: List[str] = list(changes)
+    assignments = ', '.join(
+        column + ' = %s' + ('::' + casts[column] if column in casts else '') for column in columns
+    )
+    sql = 'UPDATE ' + table + ' SET ' + assignments + ', updated_at = ' + NEXT_VERSION_SQL + ' WHERE id = %s'
+    params: List[Any] = [changes[column] for column in columns] + [row_id]
+    if version is not None:
+        sql += ' AND updated_at = %s'
+        params.append(version)
+
+    cur = conn.cursor()
+    execute_shape(cur, table + '_update', sql + ' RETURNING updated_at', params)
+    row = cur.fetchone()
+    if row is None:
+        execute_shape(cur, table + '_version', 'SELECT updated_at FROM ' + table + ' WHERE id = %s', (row_id,))
+        current = cur.fetchone()
+        cur.close()
+        if current is None:
+            raise HttpError(404, 'Not found')
+        raise HttpError(409, 'Row was modified by another request', updated_at=current[0])
+    cur.close()
+    return row[0]
+
+
+def parse_row_id(request: Request, body_data: Dict[str, Any]) -> int:
+    raw = body_data.get('id', request.query.get('id'))
+    try:
+        return int(raw)
+    except (TypeError, ValueError):
+        raise ClientError('id is required')
+
+
+def written_response(status: int, row_id: int, updated_at: datetime) -> Dict[str, Any]:
+    '''Write result carrying the new version both in the body and as ETag for the next If-Match.'''
+    headers = dict(JSON_HEADERS)
+    headers['ETag'] = version_token(updated_at)
+    headers['Access-Control-Expose-Headers'] = 'ETag'
+    return json_response(status, {'id': row_id, 'success': True, 'updated_at': updated_at}, headers)
@@ -0,0 +1,172 @@
+import fcntl
+import json
+import os
+import tempfile
+import threading
+import traceback
+from typing import Any, Dict, Iterable, Optional
+
+from shared.cache import make_entry
+from shared.catalog import SNAPSHOT_SOURCES
+from shared.db import connection
+from shared.http import dumps
+from shared.metrics import count
+
+
+class SnapshotStore:
+    '''
+    Prebuilt GET bodies kept as files in one directory, one file per snapshot.
+    Each file is a JSON header line (stamp, etag) followed by
+    the serialized body. Files are swapped in with os.replace, so readers
+    see either the previous snapshot or the new one, never a partial write.
+    The stamp is the database clock at the time the body was read; a writer
+    holding an older stamp never replaces a newer snapshot.
+    '''
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        self._loaded: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, name: str) -> str:
+        return os.path.join(self.directory, name + '.json')
+
+    def _read_file(self, path: str) -> Dict[str, Any]:
+        with open(path, encoding='utf-8') as f:
+            header = json.loads(f.readline())
+            header['body'] = f.read()
+        return header
+
+    def read(self, name: str) -> Optional[Dict[str, Any]]:
+        '''
+        Returns: entry with body and etag, or None if there is no snapshot
+        '''
+        path = self._path(name)
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            count('snapshot_misses')
+            return None
+        marker = (stat.st_mtime_ns, stat.st_size, stat.st_ino)
+
+        with self._lock:
+            loaded = self._loaded.get(name)
+        if loaded is not None and loaded[0] == marker:
+            count('snapshot_hits')
+            return loaded[1]
+
+        try:
+            entry = self._read_file(path)
+        except (FileNotFoundError, ValueError):
+            count('snapshot_misses')
+            return None
+        with self._lock:
+            self._loaded[name] = (marker, entry)
+        count('snapshot_loads')
+        return entry
+
+    def write(self, name: str, body: str, version: tuple, stamp: float) -> bool:
+        '''
+        Returns: True if the snapshot was replaced, False if a newer one is already in place
+        '''
+        path = self._path(name)
+        entry = make_entry(body, version)
+        header = {'stamp': stamp, 'etag': entry['etag']}
+
+        with open(path + '.lock', 'a') as lock:
+            fcntl.flock(lock, fcntl.LOCK_EX)
+            try:
+                current = self._read_file(path)
+            except (FileNotFoundError, ValueError):
+                current = None
+            if current is not None and current['stamp'] > stamp:
+                return False
+
+            fd, tmp_path = tempfile.mkstemp(dir=self.directory, prefix='.' + name + '.')
+            try:
+                with os.fdopen(fd, 'w', encoding='utf-8') as f:
+                    f.write(json.dumps(header) + '\n')
+                    f.write(body)
+                    f.flush()
+                    os.fsync(f.fileno())
+                os.replace(tmp_path, path)
+            except BaseException:
+                if os.path.exists(tmp_path):
+                    os.unlink(tmp_path)
+                raise
+        count('snapshot_writes')
+        return True
+
+    def remove(self, name: str) -> None:
+        try:
+            os.unlink(self._path(name))
+        except FileNotFoundError:
+            pass
+
+
+_store: Optional[SnapshotStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> Optional[SnapshotStore]:
+    '''
+    Snapshot mode is on when SNAPSHOT_DIR is set. Every instance serving
+    reads must see the same directory (shared volume or mounted bucket).
+    '''
+    global _store
+    directory = os.environ.get('SNAPSHOT_DIR')
+    if not directory:
+        return None
+    if _store is None:
+        with _store_lock:
+            if _store is None:
+                _store = SnapshotStore(directory)
+    return _store
+
+
+def publish(conn: Any, store: SnapshotStore, name: str) -> bool:
+    version_sql, query = SNAPSHOT_SOURCES[name]
+    cur = conn.cursor()
+    cur.execute("SELECT extract(epoch FROM clock_timestamp())")
+    stamp = float(cur.fetchone()[0])
+    cur.execute(version_sql)
+    version = tuple(cur.fetchone())
+    cur.close()
+    return store.write(name, dumps(query(conn)), version, stamp)
+
+
+def publish_snapshots(names: Iterable[str]) -> None:
+    '''
+    Business: Rebuild snapshot files after an admin write
+    Args: snapshot names from catalog.SNAPSHOT_SOURCES
+    Returns: None; a snapshot that cannot be rebuilt is removed so reads fall back to the database
+    '''
+    store = get_store()
+    if store is None:
+        return
+
+    names = list(names)
+    try:
+        with connection() as conn:
+            for name in names:
+                publish(conn, store, name)
+    except Exception:
+        traceback.print_exc()
+        for name in names:
+            store.remove(name)
+
+
+def read_snapshot(name: str) -> Optional[Dict[str, Any]]:
+    '''
+    Prebuilt entry for a default GET. A missing snapshot is rebuilt once
+    from the database; None means the caller should serve the live query.
+    '''
+    store = get_store()
+    if store is None:
+        return None
+    entry = store.read(name)
+    if entry is None:
+        publish_snapshots([name])
+        entry = store.read(name)
+    return entry
@@ -0,0 +1,210 @@
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from typing import Any, Iterator, List, Optional
+
+STREAM_CHUNK = 1024 * 1024
+IMMUTABLE = 'public, max-age=31536000, immutable'
+
+
+class StorageError(Exception):
+    pass
+
+
+class LocalStorage:
+    '''
+    Files under MEDIA_ROOT, served from MEDIA_BASE_URL. Meant for local
+    development and tests; production uses S3Storage. Multipart uploads
+    keep numbered part files under .parts/<token> until finish().
+    '''
+
+    def __init__(self, root: str, base_url: str):
+        self.root = root
+        self.base_url = base_url.rstrip('/')
+        os.makedirs(root, exist_ok=True)
+
+    def _path(self, key: str) -> str:
+        path = os.path.normpath(os.path.join(self.root, key))
+        if not path.startswith(os.path.normpath(self.root) + os.sep):
+            raise StorageError('Invalid storage key: ' + key)
+        return path
+
+    def url(self, key: str) -> str:
+        return self.base_url + '/' + key
+
+    def exists(self, key: str) -> bool:
+        return os.path.exists(self._path(key))
+
+    def put(self, key: str, data: bytes, content_type: str) -> str:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.upload.')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return self.url(key)
+
+    def _parts_dir(self, token: str) -> str:
+        return self._path(os.path.join('.parts', token))
+
+    def begin(self, key: str, content_type: str) -> str:
+        token = uuid.uuid4().hex
+        os.makedirs(self._parts_dir(token))
+        return token
+
+    def put_part(self, key: str, token: str, number: int, data: bytes) -> str:
+        path = os.path.join(self._parts_dir(token), '%05d' % number)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.part.')
+        with os.fdopen(fd, 'wb') as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        return str(number)
+
+    def finish(self, key: str, token: str, parts: List[str]) -> None:
+        parts_dir = self._parts_dir(token)
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.upload.')
+        with os.fdopen(fd, 'wb') as out:
+            for number in range(1, len(parts) + 1):
+                with open(os.path.join(parts_dir, '%05d' % number), 'rb') as part:
+                    shutil.copyfileobj(part, out, STREAM_CHUNK)
+        os.replace(tmp_path, path)
+        shutil.rmtree(parts_dir, ignore_errors=True)
+
+    def abort(self, key: str, token: str) -> None:
+        shutil.rmtree(self._parts_dir(token), ignore_errors=True)
+
+    def stream(self, key: str) -> Iterator[bytes]:
+        with open(self._path(key), 'rb') as f:
+            yield from iter(lambda: f.read(STREAM_CHUNK), b'')
+
+    def move(self, source: str, key: str, content_type: str) -> str:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        os.replace(self._path(source), path)
+        return self.url(key)
+
+    def delete(self, key: str) -> None:
+        try:
+            os.unlink(self._path(key))
+        except FileNotFoundError:
+            pass
+
+
+class S3Storage:
+    '''
+    S3-compatible bucket; boto3 is imported only when this backend is used.
+    Multipart uploads map onto S3 multipart (parts of at least 5 MiB except the last).
+    '''
+
+    def __init__(self, bucket: str, base_url: str, endpoint_url: Optional[str] = None):
+        import boto3
+
+        self.bucket = bucket
+        self.base_url = base_url.rstrip('/')
+        self.client: Any = boto3.client(
+            's3',
+            endpoint_url=endpoint_url,
+            aws_access_key_id=os.environ.get('AWS_ACCESS_KEY_ID'),
+            aws_secret_access_key=os.environ.get('AWS_SECRET_ACCESS_KEY'),
+        )
+
+    def url(self, key: str) -> str:
+        return self.base_url + '/' + key
+
+    def exists(self, key: str) -> bool:
+        from botocore.exceptions import ClientError
+
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=key)
+        except ClientError as e:
+            if e.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+        return True
+
+    def put(self, key: str, data: bytes, content_type: str) -> str:
+        self.client.put_object(
+            Bucket=self.bucket, Key=key, Body=data, ContentType=content_type,
+            CacheControl=IMMUTABLE
+        )
+        return self.url(key)
+
+    def begin(self, key: str, content_type: str) -> str:
+        upload = self.client.create_multipart_upload(Bucket=self.bucket, Key=key, ContentType=content_type)
+        return upload['UploadId']
+
+    def put_part(self, key: str, token: str, number: int, data: bytes) -> str:
+        part = self.client.upload_part(
+            Bucket=self.bucket, Key=key, UploadId=token, PartNumber=number, Body=data
+        )
+        return part['ETag']
+
+    def finish(self, key: str, token: str, parts: List[str]) -> None:
+        self.client.complete_multipart_upload(
+            Bucket=self.bucket, Key=key, UploadId=token,
+            MultipartUpload={'Parts': [{'ETag': etag, 'PartNumber': i + 1} for i, etag in enumerate(parts)]}
+        )
+
+    def abort(self, key: str, token: str) -> None:
+        self.client.abort_multipart_upload(Bucket=self.bucket, Key=key, UploadId=token)
+
+    def stream(self, key: str) -> Iterator[bytes]:
+        body = self.client.get_object(Bucket=self.bucket, Key=key)['Body']
+        try:
+            yield from body.iter_chunks(STREAM_CHUNK)
+        finally:
+            body.close()
+
+    def move(self, source: str, key: str, content_type: str) -> str:
+        self.client.copy_object(
+            Bucket=self.bucket, Key=key, CopySource={'Bucket': self.bucket, 'Key': source},
+            MetadataDirective='REPLACE', ContentType=content_type, CacheControl=IMMUTABLE
+        )
+        self.delete(source)
+        return self.url(key)
+
+    def delete(self, key: str) -> None:
+        self.client.delete_object(Bucket=self.bucket, Key=key)
+
+
+_storage: Optional[Any] = None
+_storage_lock = threading.Lock()
+
+
+def key_for_url(url: str) -> Optional[str]:
+    '''Storage key behind a URL served from MEDIA_BASE_URL, or None for any other URL.'''
+    base_url = os.environ.get('MEDIA_BASE_URL', '/media').rstrip('/') + '/'
+    if not url.startswith(base_url):
+        return None
+    key = url[len(base_url):].split('?')[0]
+    if not key or key.startswith('/') or '..' in key.split('/'):
+        return None
+    return key
+
+
+def get_storage() -> Any:
+    '''
+    STORAGE_BACKEND=local (MEDIA_ROOT, MEDIA_BASE_URL) or
+    s3 (S3_BUCKET, S3_ENDPOINT, MEDIA_BASE_URL, AWS_* credentials).
+    '''
+    global _storage
+    if _storage is None:
+        with _storage_lock:
+            if _storage is None:
+                backend = os.environ.get('STORAGE_BACKEND', 'local')
+                base_url = os.environ.get('MEDIA_BASE_URL', '/media')
+                if backend == 's3':
+                    _storage = S3Storage(
+                        os.environ.get('S3_BUCKET', 'files'),
+                        base_url,
+                        os.environ.get('S3_ENDPOINT'),
+                    )
+                elif backend == 'local':
+                    _storage = LocalStorage(os.environ.get('MEDIA_ROOT', '/tmp/media'), base_url)
+                else:
+                    raise StorageError('Unknown STORAGE_BACKEND: ' + backend)
+    return _storage
@@ -0,0 +1,317 @@
+'''
+Benchmark harness for the cloud functions in backend/.
+
+Replays each function's tests.json scenarios (plus paginated list reads)
+by calling handler(event, context) in-process against a local PostgreSQL.
+The database is seeded from db_migrations/ into a dedicated schema at
+each requested size, so the target database is never modified outside it.
+
+Usage:
+    python bench/backend_bench.py --dsn postgresql://localhost/kennel_bench \
+        --sizes 10,10000,1000000 --iterations 200 --save bench/results/latest.json
+    python bench/backend_bench.py --dsn ... --baseline bench/results/latest.json
+
+Reports p50/p95/p99 latency, allocated bytes per call (tracemalloc) and
+rows/s per endpoint. With --baseline, exits non-zero when any scenario's
+p95 regressed by more than --tolerance.
+'''
+import argparse
+import importlib.util
+import json
+import os
+import re
+import statistics
+import sys
+import time
+import tracemalloc
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, 'backend')
+MIGRATIONS = os.path.join(ROOT, 'db_migrations')
+FUNCTIONS = ['dogs', 'litters', 'gallery', 'messages', 'auth', 'home', 'search', 'pedigree']
+SCHEMA = 'kennel_bench'
+
+sys.path.insert(0, BACKEND)
+
+import psycopg2
+import psycopg2.extensions
+
+SEED_SQL = {
+    'dogs': """
+        INSERT INTO dogs (name, gender, breed, titles, achievements, parents, image_url)
+        SELECT 'Собака ' || g,
+               CASE WHEN g %% 2 = 0 THEN 'Кобель' ELSE 'Сука' END,
+               'Немецкая овчарка',
+               ARRAY['Чемпион России', 'Юный Чемпион РКФ'],
+               'Отличные рабочие качества, идеальный экстерьер',
+               'Отец: Производитель ' || (g %% 97) || ' / Мать: Сука ' || (g %% 89),
+               'https://cdn.poehali.dev/projects/bench/files/dog-' || g || '.jpg'
+        FROM generate_series(1, %(size)s) AS g
+    """,
+    'litters': """
+        INSERT INTO litters (name, born_date, available, parents, description, image_url)
+        SELECT 'Помет ' || g,
+               DATE '2024-08-15' - (g %% 3650),
+               g %% 7,
+               'Производитель ' || (g %% 97) || ' × Сука ' || (g %% 89),
+               'Высокопородные щенки с отличными данными. Документы РКФ, клеймо, ветпаспорт.',
+               'https://cdn.poehali.dev/projects/bench/files/litter-' || g || '.jpg'
+        FROM generate_series(1, %(size)s) AS g
+    """,
+    'gallery': """
+        INSERT INTO gallery (image_url, title, description, created_at)
+        SELECT 'https://cdn.poehali.dev/projects/bench/files/photo-' || g || '.jpg',
+               'Выставка ' || g,
+               'Фото с выставки',
+               TIMESTAMP '2024-01-01' + g * INTERVAL '1 minute'
+        FROM generate_series(1, %(size)s) AS g
+    """,
+    'messages': """
+        INSERT INTO messages (name, email, phone, message, status, created_at)
+        SELECT 'Иван ' || g,
+               'user' || g || '@example.com',
+               '+7 999 123 45 67',
+               'Интересует щенок из помета ' || (g %% 50),
+               CASE WHEN g %% 3 = 0 THEN 'read' ELSE 'new' END,
+               TIMESTAMP '2024-01-01' + g * INTERVAL '1 minute'
+        FROM generate_series(1, %(size)s) AS g
+    """,
+}
+
+
+def admin_headers() -> Dict[str, str]:
+    from shared.tokens import issue_token
+    return {'X-Session-Token': issue_token(1, 'admin', 'admin')}
+
+
+def schema_dsn(dsn: str) -> str:
+    return psycopg2.extensions.make_dsn(dsn, options='-c search_path=%s' % SCHEMA)
+
+
+def migration_files() -> List[str]:
+    def version(name: str) -> int:
+        match = re.match(r'V(\d+)__', name)
+        return int(match.group(1)) if match else 0
+    names = [n for n in os.listdir(MIGRATIONS) if n.endswith('.sql')]
+    return [os.path.join(MIGRATIONS, n) for n in sorted(names, key=version)]
+
+
+def prepare_database(dsn: str, size: int) -> None:
+    conn = psycopg2.connect(dsn)
+    try:
+        cur = conn.cursor()
+        cur.execute('DROP SCHEMA IF EXISTS %s CASCADE' % SCHEMA)
+        cur.execute('CREATE SCHEMA %s' % SCHEMA)
+        cur.execute('SET search_path TO %s' % SCHEMA)
+        for path in migration_files():
+            with open(path, encoding='utf-8') as f:
+                cur.execute(f.read())
+        for table, sql in SEED_SQL.items():
+            cur.execute(sql, {'size': size})
+        cur.execute('ANALYZE')
+        conn.commit()
+        cur.close()
+    finally:
+        conn.close()
+
+
+def load_handler(function: str) -> Any:
+    path = os.path.join(BACKEND, function, 'index.py')
+    spec = importlib.util.spec_from_file_location('bench_%s_index' % function, path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def scenarios(function: str) -> List[Dict[str, Any]]:
+    with open(os.path.join(BACKEND, function, 'tests.json'), encoding='utf-8') as f:
+        tests = json.load(f)['tests']
+    result = []
+    for test in tests:
+        event = {
+            'httpMethod': test['method'],
+            'headers': dict(test.get('headers') or {}),
+            'queryStringParameters': test.get('queryStringParameters'),
+            'body': json.dumps(test['body']) if 'body' in test else None,
+            'isBase64Encoded': False,
+        }
+        if test.get('session') == 'admin':
+            event['headers'].update(admin_headers())
+        result.append({'name': test['name'], 'event': event, 'expected': test.get('expectedStatus')})
+
+    if function in ('dogs', 'litters', 'gallery'):
+        result.append({
+            'name': 'First page of 50',
+            'event': {'httpMethod': 'GET', 'headers': {}, 'queryStringParameters': {'limit': '50'}},
+            'expected': 200,
+        })
+    if function == 'messages':
+        result.append({
+            'name': 'Admin inbox, new, first page of 50',
+            'event': {'httpMethod': 'GET', 'headers': admin_headers(),
+                      'queryStringParameters': {'status': 'new', 'limit': '50'}},
+            'expected': 200,
+        })
+    return result
+
+
+def count_rows(response: Dict[str, Any]) -> int:
+    body = response.get('body')
+    if not body or response.get('isBase64Encoded'):
+        return 0
+    try:
+        payload = json.loads(body)
+    except ValueError:
+        return 0
+    if isinstance(payload, dict):
+        for value in payload.values():
+            if isinstance(value, list):
+                return len(value)
+    return 0
+
+
+def percentile(samples: List[float], pct: float) -> float:
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, max(0, int(round(pct / 100.0 * len(ordered))) - 1))
+    return ordered[index]
+
+
+def invalidate_caches(module: Any) -> None:
+    from shared.cache import ResponseCache
+    for value in vars(module).values():
+        if isinstance(value, ResponseCache):
+            value.invalidate()
+
+
+def run_scenario(module: Any, scenario: Dict[str, Any], iterations: int, warmup: int,
+                 cold_cache: bool) -> Dict[str, Any]:
+    event = scenario['event']
+    status_errors = 0
+
+    for _ in range(warmup):
+        module.handler(dict(event), None)
+
+    latencies: List[float] = []
+    rows = 0
+    started = time.perf_counter()
+    for _ in range(iterations):
+        if cold_cache:
+            invalidate_caches(module)
+        t0 = time.perf_counter()
+        response = module.handler(dict(event), None)
+        latencies.append((time.perf_counter() - t0) * 1000)
+        rows += count_rows(response)
+        if scenario['expected'] is not None and response.get('statusCode') != scenario['expected']:
+            status_errors += 1
+    elapsed = time.perf_counter() - started
+
+    alloc_samples = max(1, min(20, iterations))
+    tracemalloc.start()
+    before = tracemalloc.take_snapshot()
+    for _ in range(alloc_samples):
+        if cold_cache:
+            invalidate_caches(module)
+        module.handler(dict(event), None)
+    after = tracemalloc.take_snapshot()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    allocated = sum(stat.size_diff for stat in after.compare_to(before, 'filename') if stat.size_diff > 0)
+
+    return {
+        'iterations': iterations,
+        'p50_ms': round(percentile(latencies, 50), 3),
+        'p95_ms': round(percentile(latencies, 95), 3),
+        'p99_ms': round(percentile(latencies, 99), 3),
+        'mean_ms': round(statistics.mean(latencies), 3),
+        'rows_per_s': round(rows / elapsed, 1) if elapsed > 0 else 0.0,
+        'alloc_bytes_per_call': int(allocated / alloc_samples),
+        'peak_bytes': peak,
+        'status_errors': status_errors,
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    for key, current in results['scenarios'].items():
+        previous = baseline.get('scenarios', {}).get(key)
+        if not previous or previous['p95_ms'] <= 0:
+            continue
+        change = (current['p95_ms'] - previous['p95_ms']) / previous['p95_ms']
+        if change > tolerance:
+            regressions.append('%s: p95 %.3f ms -> %.3f ms (+%.0f%%)' % (
+                key, previous['p95_ms'], current['p95_ms'], change * 100))
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Benchmark backend handlers against a local PostgreSQL')
+    parser.add_argument('--dsn', default=os.environ.get('BENCH_DATABASE_URL'),
+                        help='scratch database DSN (default: $BENCH_DATABASE_URL)')
+    parser.add_argument('--sizes', default='10,10000', help='comma-separated row counts per table')
+    parser.add_argument('--functions', default=','.join(FUNCTIONS))
+    parser.add_argument('--iterations', type=int, default=200)
+    parser.add_argument('--warmup', type=int, default=20)
+    parser.add_argument('--cold-cache', action='store_true',
+                        help='invalidate response caches before every call')
+    parser.add_argument('--save', help='write results JSON to this path')
+    parser.add_argument('--baseline', help='compare against a saved results JSON')
+    parser.add_argument('--tolerance', type=float, default=0.2,
+                        help='allowed p95 regression vs baseline (0.2 = 20%%)')
+    args = parser.parse_args(argv)
+
+    if not args.dsn:
+        parser.error('--dsn or BENCH_DATABASE_URL is required')
+
+    os.environ['DATABASE_URL'] = schema_dsn(args.dsn)
+    os.environ.setdefault('SESSION_SECRET', 'bench-only-secret')
+    # Replayed scenarios all come from one client; keep the per-IP/user throttles out of the way
+    for limiter in ('LOGIN_USER_RATE', 'LOGIN_IP_RATE', 'MESSAGE_IP_RATE'):
+        os.environ.setdefault(limiter + '_BURST', '1000000')
+    functions = [f for f in args.functions.split(',') if f]
+    modules = {function: load_handler(function) for function in functions}
+
+    results: Dict[str, Any] = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'cold_cache': args.cold_cache,
+        'scenarios': {},
+    }
+
+    print('%-52s %9s %9s %9s %12s %12s %6s' % ('scenario', 'p50 ms', 'p95 ms', 'p99 ms', 'rows/s', 'alloc B', 'errors'))
+    for size in [int(s) for s in args.sizes.split(',') if s]:
+        prepare_database(args.dsn, size)
+        for module in modules.values():
+            invalidate_caches(module)
+        for function, module in modules.items():
+            for scenario in scenarios(function):
+                key = '%s/%s/%d' % (function, scenario['name'], size)
+                stats = run_scenario(module, scenario, args.iterations, args.warmup, args.cold_cache)
+                results['scenarios'][key] = stats
+                print('%-52s %9.3f %9.3f %9.3f %12.1f %12d %6d' % (
+                    key[:52], stats['p50_ms'], stats['p95_ms'], stats['p99_ms'],
+                    stats['rows_per_s'], stats['alloc_bytes_per_call'], stats['status_errors']))
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    exit_code = 0
+    if any(s['status_errors'] for s in results['scenarios'].values()):
+        print('Some scenarios returned an unexpected status code')
+        exit_code = 1
+
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print('REGRESSION ' + line)
+        if regressions:
+            exit_code = 1
+
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
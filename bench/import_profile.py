@@ -0,0 +1,151 @@
+'''
+Cold-start import profile for the cloud functions in backend/.
+
+Each function is imported in a fresh interpreter (python -X importtime),
+the way a new container does it, and its first OPTIONS preflight is
+invoked. Reports wall-clock import time, the first-call latency, the
+slowest modules by self time, and which heavy dependencies were loaded
+before any request touched the database.
+
+Usage:
+    python bench/import_profile.py --repeat 5 --save bench/results/imports.json
+    python bench/import_profile.py --baseline bench/results/imports.json
+
+With --baseline, exits non-zero when a function's median import time
+regressed by more than --tolerance.
+'''
+import argparse
+import json
+import os
+import re
+import statistics
+import subprocess
+import sys
+import time
+from typing import Any, Dict, List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, 'backend')
+HEAVY_MODULES = ['psycopg2', 'psycopg2.extras', 'PIL.Image', 'boto3', 'brotli']
+
+CHILD = '''
+import importlib.util, json, sys, time
+sys.path.insert(0, %(backend)r)
+started = time.perf_counter()
+spec = importlib.util.spec_from_file_location('index', %(path)r)
+module = importlib.util.module_from_spec(spec)
+spec.loader.exec_module(module)
+imported = time.perf_counter()
+module.handler({'httpMethod': 'OPTIONS', 'headers': {}}, None)
+called = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'first_call_ms': (called - imported) * 1000,
+    'loaded': [name for name in %(heavy)r if name in sys.modules],
+}))
+'''
+
+IMPORTTIME_RE = re.compile(r'^import time:\s+(\d+) \|\s+(\d+) \|(\s*)(\S+)')
+
+
+def functions() -> List[str]:
+    return sorted(
+        name for name in os.listdir(BACKEND)
+        if name != 'shared' and os.path.isfile(os.path.join(BACKEND, name, 'index.py'))
+    )
+
+
+def profile_once(function: str) -> Dict[str, Any]:
+    code = CHILD % {
+        'backend': BACKEND,
+        'path': os.path.join(BACKEND, function, 'index.py'),
+        'heavy': HEAVY_MODULES,
+    }
+    env = dict(os.environ, SESSION_SECRET=os.environ.get('SESSION_SECRET', 'profile-only-secret'))
+    proc = subprocess.run([sys.executable, '-X', 'importtime', '-c', code], cwd=BACKEND, env=env,
+                          capture_output=True, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError('%s failed to import:\n%s' % (function, proc.stderr[-2000:]))
+
+    modules = []
+    for line in proc.stderr.splitlines():
+        match = IMPORTTIME_RE.match(line)
+        if match:
+            modules.append({'module': match.group(4), 'self_us': int(match.group(1)),
+                            'cumulative_us': int(match.group(2))})
+    result = json.loads(proc.stdout.strip().splitlines()[-1])
+    result['modules'] = modules
+    return result
+
+
+def profile(function: str, repeat: int, top: int) -> Dict[str, Any]:
+    runs = [profile_once(function) for _ in range(repeat)]
+    # module breakdown from the median run
+    median_run = sorted(runs, key=lambda run: run['import_ms'])[len(runs) // 2]
+    slowest = sorted(median_run['modules'], key=lambda m: m['self_us'], reverse=True)[:top]
+    return {
+        'import_ms': round(statistics.median(run['import_ms'] for run in runs), 3),
+        'first_call_ms': round(statistics.median(run['first_call_ms'] for run in runs), 3),
+        'modules': len(median_run['modules']),
+        'heavy_loaded': median_run['loaded'],
+        'slowest': [{'module': m['module'], 'self_ms': round(m['self_us'] / 1000, 3)} for m in slowest],
+    }
+
+
+def compare(results: Dict[str, Any], baseline: Dict[str, Any], tolerance: float) -> List[str]:
+    regressions = []
+    for function, current in results['functions'].items():
+        previous = baseline.get('functions', {}).get(function)
+        if not previous or previous['import_ms'] <= 0:
+            continue
+        change = (current['import_ms'] - previous['import_ms']) / previous['import_ms']
+        if change > tolerance:
+            regressions.append('%s: import %.1f ms -> %.1f ms (+%.0f%%)' % (
+                function, previous['import_ms'], current['import_ms'], change * 100))
+    return regressions
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Measure cold-start import time of backend functions')
+    parser.add_argument('--functions', default=','.join(functions()))
+    parser.add_argument('--repeat', type=int, default=5)
+    parser.add_argument('--top', type=int, default=8, help='slowest modules to list per function')
+    parser.add_argument('--save', help='write results JSON to this path')
+    parser.add_argument('--baseline', help='compare against a saved results JSON')
+    parser.add_argument('--tolerance', type=float, default=0.25,
+                        help='allowed import-time regression vs baseline (0.25 = 25%%)')
+    args = parser.parse_args(argv)
+
+    results: Dict[str, Any] = {
+        'created_at': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'python': sys.version.split()[0],
+        'functions': {},
+    }
+    print('%-14s %10s %12s %8s  %s' % ('function', 'import ms', 'OPTIONS ms', 'modules', 'heavy modules loaded'))
+    for function in [f for f in args.functions.split(',') if f]:
+        stats = profile(function, args.repeat, args.top)
+        results['functions'][function] = stats
+        print('%-14s %10.1f %12.2f %8d  %s' % (
+            function, stats['import_ms'], stats['first_call_ms'], stats['modules'],
+            ', '.join(stats['heavy_loaded']) or '-'))
+        for module in stats['slowest']:
+            print('%16s%-40s %8.2f ms' % ('', module['module'], module['self_ms']))
+
+    if args.save:
+        os.makedirs(os.path.dirname(os.path.abspath(args.save)), exist_ok=True)
+        with open(args.save, 'w', encoding='utf-8') as f:
+            json.dump(results, f, ensure_ascii=False, indent=2)
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline, encoding='utf-8') as f:
+            regressions = compare(results, json.load(f), args.tolerance)
+        for line in regressions:
+            print('REGRESSION ' + line)
+        if regressions:
+            exit_code = 1
+    return exit_code
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,172 @@
+'''
+Concurrency stress test for backend/reservations.
+
+Fires --clients simultaneous claims at one litter with --available puppies
+through the in-process handler (one thread per client, released together
+by a barrier), replays a share of the idempotency keys, then expires every
+hold and runs several sweepers at once. Uses the scratch schema from
+backend_bench.py, so the target database is never modified outside it.
+
+Usage:
+    python bench/reservation_stress.py --dsn postgresql://localhost/kennel_bench \
+        --clients 300 --available 40
+
+Checks, exiting non-zero on any violation:
+  - exactly --available claims succeed (no oversell, no lost updates)
+  - litters.available ends at 0 and never goes negative
+  - a replayed idempotency key never creates a second hold
+  - after expiry the sweepers return every puppy exactly once
+'''
+import argparse
+import json
+import os
+import sys
+import threading
+import time
+import uuid
+from collections import Counter
+from typing import Any, Dict, List, Optional
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from backend_bench import load_handler, percentile, prepare_database, schema_dsn
+
+import psycopg2
+
+
+def claim_event(litter_id: int, key: str) -> Dict[str, Any]:
+    return {
+        'httpMethod': 'POST',
+        'headers': {'Idempotency-Key': key},
+        'queryStringParameters': None,
+        'body': json.dumps({'litter_id': litter_id, 'name': 'Покупатель', 'email': 'buyer@example.com'}),
+        'isBase64Encoded': False,
+    }
+
+
+def run_concurrently(count: int, work: Any) -> List[Any]:
+    barrier = threading.Barrier(count)
+    results: List[Any] = [None] * count
+
+    def worker(index: int) -> None:
+        barrier.wait()
+        results[index] = work(index)
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(count)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def scalar(dsn: str, sql: str, params: Optional[tuple] = None) -> Any:
+    conn = psycopg2.connect(dsn)
+    try:
+        cur = conn.cursor()
+        cur.execute(sql, params)
+        row = cur.fetchone()
+        conn.commit()
+        cur.close()
+        return row[0] if row else None
+    finally:
+        conn.close()
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Stress concurrent puppy reservations against a local PostgreSQL')
+    parser.add_argument('--dsn', default=os.environ.get('BENCH_DATABASE_URL'),
+                        help='scratch database DSN (default: $BENCH_DATABASE_URL)')
+    parser.add_argument('--clients', type=int, default=300)
+    parser.add_argument('--available', type=int, default=40)
+    parser.add_argument('--replay-every', type=int, default=10,
+                        help='every Nth client reuses the previous client\'s idempotency key')
+    parser.add_argument('--sweepers', type=int, default=4)
+    parser.add_argument('--pool-size', type=int, default=50, help='DB_POOL_MAX_SIZE for the handler')
+    args = parser.parse_args(argv)
+
+    if not args.dsn:
+        parser.error('--dsn or BENCH_DATABASE_URL is required')
+
+    dsn = schema_dsn(args.dsn)
+    os.environ['DATABASE_URL'] = dsn
+    os.environ['DB_POOL_MAX_SIZE'] = str(args.pool_size)
+    os.environ.setdefault('SESSION_SECRET', 'bench-only-secret')
+    os.environ.setdefault('RESERVATION_IP_RATE_BURST', '1000000')
+
+    prepare_database(args.dsn, 0)
+    litter_id = scalar(dsn, """INSERT INTO litters (name, born_date, available)
+                               VALUES ('Стресс-помёт', CURRENT_DATE, %s) RETURNING id""", (args.available,))
+    module = load_handler('reservations')
+
+    keys = []
+    for index in range(args.clients):
+        if args.replay_every and index % args.replay_every == args.replay_every - 1 and keys:
+            keys.append(keys[-1])
+        else:
+            keys.append(uuid.uuid4().hex)
+
+    def claim(index: int) -> Dict[str, Any]:
+        started = time.perf_counter()
+        attempts = 0
+        while True:
+            attempts += 1
+            response = module.handler(claim_event(litter_id, keys[index]), None)
+            if response['statusCode'] != 429:
+                break
+            time.sleep(0.05)
+        return {'status': response['statusCode'], 'body': json.loads(response['body']),
+                'ms': (time.perf_counter() - started) * 1000, 'attempts': attempts}
+
+    started = time.perf_counter()
+    claims = run_concurrently(args.clients, claim)
+    elapsed = time.perf_counter() - started
+
+    statuses = Counter(result['status'] for result in claims)
+    created = [result for result in claims if result['status'] == 201]
+    latencies = [result['ms'] for result in claims]
+    distinct_keys = len(set(keys))
+    print('claims: %d clients, %d distinct keys, %.2f s' % (args.clients, distinct_keys, elapsed))
+    print('  statuses %s, busy retries %d' % (dict(statuses), sum(r['attempts'] - 1 for r in claims)))
+    print('  latency p50 %.1f ms, p95 %.1f ms, p99 %.1f ms' % (
+        percentile(latencies, 50), percentile(latencies, 95), percentile(latencies, 99)))
+
+    failures = []
+    available = scalar(dsn, "SELECT available FROM litters WHERE id = %s", (litter_id,))
+    held = scalar(dsn, "SELECT coalesce(sum(quantity), 0) FROM reservations WHERE status = 'held'")
+    holds_per_key = scalar(dsn, "SELECT coalesce(max(n), 0) FROM (SELECT count(*) AS n FROM reservations "
+                                "GROUP BY idempotency_key) AS t")
+    if len(created) != min(args.available, distinct_keys):
+        failures.append('%d claims succeeded, expected %d' % (len(created), min(args.available, distinct_keys)))
+    if available != args.available - held or available < 0:
+        failures.append('available=%s but %s puppies are held of %d' % (available, held, args.available))
+    if holds_per_key > 1:
+        failures.append('an idempotency key produced %d holds' % holds_per_key)
+    unexpected = set(statuses) - {200, 201, 409}
+    if unexpected:
+        failures.append('unexpected statuses %s' % sorted(unexpected))
+
+    scalar(dsn, "UPDATE reservations SET hold_until = CURRENT_TIMESTAMP - interval '1 second' "
+                "WHERE status = 'held' RETURNING 1")
+    started = time.perf_counter()
+    sweeps = run_concurrently(args.sweepers, lambda index: module.handler({}, None))
+    print('sweep: %d sweepers, %.2f s, expired %s' % (
+        args.sweepers, time.perf_counter() - started, [s['expired'] for s in sweeps]))
+
+    # A sweeper that lost the advisory lock returns 0; finish whatever it left
+    module.handler({}, None)
+    available = scalar(dsn, "SELECT available FROM litters WHERE id = %s", (litter_id,))
+    still_held = scalar(dsn, "SELECT count(*) FROM reservations WHERE status = 'held'")
+    if available != args.available or still_held:
+        failures.append('after sweeping available=%s (expected %d), %s holds left' % (
+            available, args.available, still_held))
+
+    for failure in failures:
+        print('FAIL ' + failure)
+    if not failures:
+        print('OK')
+    return 1 if failures else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,12 @@
+-- Keyset pagination for public list endpoints
+
+-- Gallery pages are ordered by (created_at DESC, id DESC); NULL timestamps would break the cursor
+UPDATE gallery SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL;
+ALTER TABLE gallery ALTER COLUMN created_at SET NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_gallery_created_at_id ON gallery (created_at DESC, id DESC);
+
+-- Litters pages are ordered by (born_date DESC, id DESC)
+CREATE INDEX IF NOT EXISTS idx_litters_born_date_id ON litters (born_date DESC, id DESC);
+
+-- Dogs pages are ordered by id and use the primary key
@@ -0,0 +1,9 @@
+-- Admin inbox: filter by status, page by (created_at DESC, id DESC)
+
+UPDATE messages SET created_at = CURRENT_TIMESTAMP WHERE created_at IS NULL;
+ALTER TABLE messages ALTER COLUMN created_at SET NOT NULL;
+
+CREATE INDEX IF NOT EXISTS idx_messages_status_created_at ON messages (status, created_at DESC, id DESC);
+
+-- Unfiltered inbox pages and date-range counts
+CREATE INDEX IF NOT EXISTS idx_messages_created_at_id ON messages (created_at DESC, id DESC);
@@ -0,0 +1,58 @@
+-- Full-text search over dogs, litters and gallery (Russian configuration).
+-- Vectors are kept in sync by triggers because array_to_string is not
+-- immutable and cannot be used in a generated column.
+
+ALTER TABLE dogs ADD COLUMN IF NOT EXISTS search_vector tsvector;
+ALTER TABLE litters ADD COLUMN IF NOT EXISTS search_vector tsvector;
+ALTER TABLE gallery ADD COLUMN IF NOT EXISTS search_vector tsvector;
+
+CREATE OR REPLACE FUNCTION dogs_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(array_to_string(NEW.titles, ' '), '')), 'B') ||
+        setweight(to_tsvector('russian', coalesce(NEW.parents, '')), 'B') ||
+        setweight(to_tsvector('russian', coalesce(NEW.achievements, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION litters_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('russian', coalesce(NEW.name, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(NEW.parents, '')), 'B') ||
+        setweight(to_tsvector('russian', coalesce(NEW.description, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+CREATE OR REPLACE FUNCTION gallery_search_vector_update() RETURNS trigger AS $$
+BEGIN
+    NEW.search_vector :=
+        setweight(to_tsvector('russian', coalesce(NEW.title, '')), 'A') ||
+        setweight(to_tsvector('russian', coalesce(NEW.description, '')), 'C');
+    RETURN NEW;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS dogs_search_vector ON dogs;
+CREATE TRIGGER dogs_search_vector BEFORE INSERT OR UPDATE ON dogs
+    FOR EACH ROW EXECUTE FUNCTION dogs_search_vector_update();
+
+DROP TRIGGER IF EXISTS litters_search_vector ON litters;
+CREATE TRIGGER litters_search_vector BEFORE INSERT OR UPDATE ON litters
+    FOR EACH ROW EXECUTE FUNCTION litters_search_vector_update();
+
+DROP TRIGGER IF EXISTS gallery_search_vector ON gallery;
+CREATE TRIGGER gallery_search_vector BEFORE INSERT OR UPDATE ON gallery
+    FOR EACH ROW EXECUTE FUNCTION gallery_search_vector_update();
+
+-- Backfill existing rows through the triggers
+UPDATE dogs SET name = name;
+UPDATE litters SET name = name;
+UPDATE gallery SET image_url = image_url;
+
+CREATE INDEX IF NOT EXISTS idx_dogs_search_vector ON dogs USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_litters_search_vector ON litters USING GIN (search_vector);
+CREATE INDEX IF NOT EXISTS idx_gallery_search_vector ON gallery USING GIN (search_vector);
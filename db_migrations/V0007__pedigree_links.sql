@@ -0,0 +1,41 @@
+-- Structured pedigree: sire/dam references instead of parsing free-text parents.
+-- The parents text is kept for display and for ancestors not in the kennel.
+
+ALTER TABLE dogs ADD COLUMN IF NOT EXISTS sire_id INTEGER REFERENCES dogs(id) ON DELETE SET NULL;
+ALTER TABLE dogs ADD COLUMN IF NOT EXISTS dam_id INTEGER REFERENCES dogs(id) ON DELETE SET NULL;
+ALTER TABLE dogs DROP CONSTRAINT IF EXISTS dogs_not_own_parent;
+ALTER TABLE dogs ADD CONSTRAINT dogs_not_own_parent CHECK (sire_id <> id AND dam_id <> id);
+
+ALTER TABLE litters ADD COLUMN IF NOT EXISTS sire_id INTEGER REFERENCES dogs(id) ON DELETE SET NULL;
+ALTER TABLE litters ADD COLUMN IF NOT EXISTS dam_id INTEGER REFERENCES dogs(id) ON DELETE SET NULL;
+
+CREATE INDEX IF NOT EXISTS idx_dogs_sire_id ON dogs (sire_id);
+CREATE INDEX IF NOT EXISTS idx_dogs_dam_id ON dogs (dam_id);
+CREATE INDEX IF NOT EXISTS idx_litters_sire_dam ON litters (sire_id, dam_id);
+
+-- Back-parse dogs.parents: "Отец: <name> / Мать: <name>"
+-- Only names that identify exactly one dog are linked.
+UPDATE dogs d SET sire_id = p.id
+FROM dogs p
+WHERE d.sire_id IS NULL AND p.id <> d.id
+  AND lower(p.name) = lower(trim(substring(d.parents FROM 'Отец:\s*([^/]+)')))
+  AND NOT EXISTS (SELECT 1 FROM dogs o WHERE o.id <> p.id AND lower(o.name) = lower(p.name));
+
+UPDATE dogs d SET dam_id = p.id
+FROM dogs p
+WHERE d.dam_id IS NULL AND p.id <> d.id
+  AND lower(p.name) = lower(trim(substring(d.parents FROM 'Мать:\s*([^/]+)')))
+  AND NOT EXISTS (SELECT 1 FROM dogs o WHERE o.id <> p.id AND lower(o.name) = lower(p.name));
+
+-- Back-parse litters.parents: "<sire name> × <dam name>"
+UPDATE litters l SET sire_id = p.id
+FROM dogs p
+WHERE l.sire_id IS NULL AND position('×' IN l.parents) > 0
+  AND lower(p.name) = lower(trim(split_part(l.parents, '×', 1)))
+  AND NOT EXISTS (SELECT 1 FROM dogs o WHERE o.id <> p.id AND lower(o.name) = lower(p.name));
+
+UPDATE litters l SET dam_id = p.id
+FROM dogs p
+WHERE l.dam_id IS NULL AND position('×' IN l.parents) > 0
+  AND lower(p.name) = lower(trim(split_part(l.parents, '×', 2)))
+  AND NOT EXISTS (SELECT 1 FROM dogs o WHERE o.id <> p.id AND lower(o.name) = lower(p.name));
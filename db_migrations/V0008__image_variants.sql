@@ -0,0 +1,11 @@
+-- Resized WebP/AVIF derivatives, dimensions and blur placeholder per image:
+-- {"width", "height", "placeholder", "sources": [{"format", "width", "height", "url"}]}
+
+ALTER TABLE dogs ADD COLUMN IF NOT EXISTS image_variants JSONB;
+ALTER TABLE litters ADD COLUMN IF NOT EXISTS image_variants JSONB;
+ALTER TABLE gallery ADD COLUMN IF NOT EXISTS image_variants JSONB;
+
+-- Ingest reuses variants already built for the same original
+CREATE INDEX IF NOT EXISTS idx_dogs_image_url ON dogs (image_url);
+CREATE INDEX IF NOT EXISTS idx_litters_image_url ON litters (image_url);
+CREATE INDEX IF NOT EXISTS idx_gallery_image_url ON gallery (image_url);
@@ -0,0 +1,30 @@
+-- Content-addressed media: one stored object per distinct file (sha256)
+CREATE TABLE IF NOT EXISTS media_files (
+    sha256 CHAR(64) PRIMARY KEY,
+    storage_key TEXT NOT NULL,
+    url TEXT NOT NULL,
+    size BIGINT NOT NULL,
+    content_type VARCHAR(100) NOT NULL,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Resumable chunked uploads; parts holds the storage ETag of each received chunk
+CREATE TABLE IF NOT EXISTS uploads (
+    id VARCHAR(32) PRIMARY KEY,
+    filename VARCHAR(255),
+    content_type VARCHAR(100) NOT NULL,
+    size BIGINT NOT NULL,
+    chunk_size INTEGER NOT NULL,
+    received BIGINT NOT NULL DEFAULT 0,
+    parts JSONB NOT NULL DEFAULT '[]',
+    storage_key TEXT NOT NULL,
+    storage_token TEXT NOT NULL,
+    expected_sha256 CHAR(64),
+    sha256 CHAR(64),
+    status VARCHAR(20) NOT NULL DEFAULT 'open',
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+);
+
+-- Abandoned uploads are aborted by age
+CREATE INDEX IF NOT EXISTS idx_uploads_status_updated_at ON uploads (status, updated_at);
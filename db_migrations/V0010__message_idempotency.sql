@@ -0,0 +1,3 @@
+-- Client-supplied or generated key per contact-form submission; replays insert nothing
+ALTER TABLE messages ADD COLUMN IF NOT EXISTS idempotency_key VARCHAR(64);
+CREATE UNIQUE INDEX IF NOT EXISTS idx_messages_idempotency_key ON messages (idempotency_key);
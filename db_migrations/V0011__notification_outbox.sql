@@ -0,0 +1,51 @@
+-- Transactional outbox for notifications about new contact-form messages.
+-- Rows are written by a trigger in the same transaction as the message, so
+-- a committed message always has its notification and a rolled-back one
+-- never does. The dispatcher (backend/shared/notify.py) delivers rows to
+-- every configured transport and records per-transport progress in
+-- delivered, so a retry never repeats a transport that already succeeded.
+CREATE TABLE IF NOT EXISTS notification_outbox (
+    id BIGSERIAL PRIMARY KEY,
+    topic VARCHAR(50) NOT NULL,
+    payload JSONB NOT NULL,
+    delivered JSONB NOT NULL DEFAULT '{}',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    next_attempt_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    last_error TEXT,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    done_at TIMESTAMP
+);
+
+CREATE INDEX IF NOT EXISTS idx_notification_outbox_pending
+    ON notification_outbox (next_attempt_at, id) WHERE done_at IS NULL;
+CREATE INDEX IF NOT EXISTS idx_notification_outbox_done_at
+    ON notification_outbox (done_at) WHERE done_at IS NOT NULL;
+
+-- Statement-level so a multi-row INSERT (the write-behind spool) costs one
+-- outbox INSERT and one NOTIFY; rows skipped by ON CONFLICT are not in the
+-- transition table.
+CREATE OR REPLACE FUNCTION messages_enqueue_notification() RETURNS trigger AS $$
+BEGIN
+    INSERT INTO notification_outbox (topic, payload)
+    SELECT 'message.created', jsonb_build_object(
+        'id', id,
+        'name', name,
+        'email', email,
+        'phone', phone,
+        'message', left(message, 1000),
+        'created_at', created_at
+    )
+    FROM inserted
+    ORDER BY id;
+    IF FOUND THEN
+        PERFORM pg_notify('notification_outbox', 'message.created');
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS messages_enqueue_notification ON messages;
+CREATE TRIGGER messages_enqueue_notification
+    AFTER INSERT ON messages
+    REFERENCING NEW TABLE AS inserted
+    FOR EACH STATEMENT EXECUTE FUNCTION messages_enqueue_notification();
@@ -0,0 +1,6 @@
+-- updated_at doubles as the optimistic-concurrency version (If-Match) for
+-- dogs and litters, so every row needs one
+UPDATE dogs SET updated_at = coalesce(created_at, CURRENT_TIMESTAMP) WHERE updated_at IS NULL;
+UPDATE litters SET updated_at = coalesce(created_at, CURRENT_TIMESTAMP) WHERE updated_at IS NULL;
+ALTER TABLE dogs ALTER COLUMN updated_at SET NOT NULL;
+ALTER TABLE litters ALTER COLUMN updated_at SET NOT NULL;
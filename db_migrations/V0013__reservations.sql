@@ -0,0 +1,28 @@
+-- Puppy reservations. A hold takes quantity puppies out of litters.available
+-- in the same statement that records it; confirming keeps them out, and
+-- releasing or expiring (hold_until passed) gives them back.
+CREATE TABLE IF NOT EXISTS reservations (
+    id BIGSERIAL PRIMARY KEY,
+    litter_id INTEGER NOT NULL REFERENCES litters (id) ON DELETE CASCADE,
+    quantity INTEGER NOT NULL DEFAULT 1 CHECK (quantity > 0),
+    name VARCHAR(200) NOT NULL,
+    email VARCHAR(200) NOT NULL,
+    phone VARCHAR(50),
+    status VARCHAR(20) NOT NULL DEFAULT 'held',
+    hold_until TIMESTAMP NOT NULL,
+    idempotency_key VARCHAR(64) NOT NULL UNIQUE,
+    created_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    updated_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+    CONSTRAINT reservations_status CHECK (status IN ('held', 'confirmed', 'released', 'expired'))
+);
+
+-- The sweeper scans only live holds, oldest expiry first
+CREATE INDEX IF NOT EXISTS idx_reservations_held_until
+    ON reservations (hold_until) WHERE status = 'held';
+CREATE INDEX IF NOT EXISTS idx_reservations_litter_id ON reservations (litter_id, created_at);
+
+-- The conditional decrement never goes below zero; the constraint makes that hold for admin writes too
+UPDATE litters SET available = 0 WHERE available IS NULL OR available < 0;
+ALTER TABLE litters ALTER COLUMN available SET NOT NULL;
+ALTER TABLE litters DROP CONSTRAINT IF EXISTS litters_available_not_negative;
+ALTER TABLE litters ADD CONSTRAINT litters_available_not_negative CHECK (available >= 0);
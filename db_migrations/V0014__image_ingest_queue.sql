@@ -0,0 +1,54 @@
+-- Image derivatives are built in the background by the notifier, not inside
+-- admin writes. A row that gets an image_url without variants queues an
+-- 'image.ingest' job in notification_outbox in the same transaction, so the
+-- job can never run before the row it fills in is committed.
+
+-- Uploaded originals keep their variants too, so a later write that points
+-- at the upload reuses them
+ALTER TABLE media_files ADD COLUMN IF NOT EXISTS image_variants JSONB;
+CREATE INDEX IF NOT EXISTS idx_media_files_url ON media_files (url);
+
+-- TG_ARGV[0] names the column holding the source URL. Jobs already waiting
+-- for the same URL are reused; a job that is being processed (its lease
+-- pushed next_attempt_at ahead) is not, so a row written meanwhile still
+-- gets its own job.
+CREATE OR REPLACE FUNCTION enqueue_image_ingest() RETURNS trigger AS $$
+DECLARE
+    source_url TEXT := to_jsonb(NEW) ->> TG_ARGV[0];
+BEGIN
+    IF source_url IS NOT NULL AND source_url <> '' AND NOT EXISTS (
+        SELECT 1 FROM notification_outbox
+        WHERE topic = 'image.ingest' AND done_at IS NULL AND next_attempt_at <= CURRENT_TIMESTAMP
+          AND payload ->> 'url' = source_url
+    ) THEN
+        INSERT INTO notification_outbox (topic, payload)
+        VALUES ('image.ingest', jsonb_build_object('url', source_url));
+        PERFORM pg_notify('notification_outbox', 'image.ingest');
+    END IF;
+    RETURN NULL;
+END
+$$ LANGUAGE plpgsql;
+
+DROP TRIGGER IF EXISTS dogs_enqueue_image_ingest ON dogs;
+CREATE TRIGGER dogs_enqueue_image_ingest
+    AFTER INSERT OR UPDATE OF image_url ON dogs
+    FOR EACH ROW WHEN (NEW.image_url IS NOT NULL AND NEW.image_variants IS NULL)
+    EXECUTE FUNCTION enqueue_image_ingest('image_url');
+
+DROP TRIGGER IF EXISTS litters_enqueue_image_ingest ON litters;
+CREATE TRIGGER litters_enqueue_image_ingest
+    AFTER INSERT OR UPDATE OF image_url ON litters
+    FOR EACH ROW WHEN (NEW.image_url IS NOT NULL AND NEW.image_variants IS NULL)
+    EXECUTE FUNCTION enqueue_image_ingest('image_url');
+
+DROP TRIGGER IF EXISTS gallery_enqueue_image_ingest ON gallery;
+CREATE TRIGGER gallery_enqueue_image_ingest
+    AFTER INSERT OR UPDATE OF image_url ON gallery
+    FOR EACH ROW WHEN (NEW.image_url IS NOT NULL AND NEW.image_variants IS NULL)
+    EXECUTE FUNCTION enqueue_image_ingest('image_url');
+
+DROP TRIGGER IF EXISTS media_files_enqueue_image_ingest ON media_files;
+CREATE TRIGGER media_files_enqueue_image_ingest
+    AFTER INSERT ON media_files
+    FOR EACH ROW WHEN (NEW.content_type LIKE 'image/%')
+    EXECUTE FUNCTION enqueue_image_ingest('url');
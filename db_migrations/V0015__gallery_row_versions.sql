@@ -0,0 +1,7 @@
+-- gallery had only created_at, so its listing version did not move when a
+-- row was changed in place (image variants filled in by the notifier).
+-- updated_at is bumped by every UPDATE, like dogs and litters.
+ALTER TABLE gallery ADD COLUMN IF NOT EXISTS updated_at TIMESTAMP;
+UPDATE gallery SET updated_at = created_at WHERE updated_at IS NULL;
+ALTER TABLE gallery ALTER COLUMN updated_at SET DEFAULT CURRENT_TIMESTAMP;
+ALTER TABLE gallery ALTER COLUMN updated_at SET NOT NULL;
@@ -0,0 +1,87 @@
+'''
+Build step: copy backend/shared into every function directory.
+
+The platform deploys each backend/<function>/ directory on its own, so the
+repo-level backend/shared package is not importable there. Run this before
+deploying; each index.py puts its own directory on sys.path when a vendored
+shared/ sits next to it and falls back to backend/ in a plain checkout.
+
+Usage:
+    python scripts/vendor_shared.py              # copy into every function
+    python scripts/vendor_shared.py dogs auth    # only these functions
+    python scripts/vendor_shared.py --check      # exit 1 if a copy is stale
+    python scripts/vendor_shared.py --clean      # remove the copies
+
+The copies are committed; CI runs --check so a change to backend/shared
+cannot ship without refreshed copies.
+'''
+import argparse
+import filecmp
+import os
+import shutil
+import sys
+from typing import List, Optional
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+BACKEND = os.path.join(ROOT, 'backend')
+SHARED = os.path.join(BACKEND, 'shared')
+# Local-only tooling that no deployed function imports
+EXCLUDE = ['__pycache__', '*.pyc', 'gateway.py']
+
+
+def functions() -> List[str]:
+    return sorted(
+        name for name in os.listdir(BACKEND)
+        if name != 'shared' and os.path.isfile(os.path.join(BACKEND, name, 'index.py'))
+    )
+
+
+def shared_files() -> List[str]:
+    ignore = shutil.ignore_patterns(*EXCLUDE)
+    names = os.listdir(SHARED)
+    return sorted(name for name in names if name not in ignore(SHARED, names))
+
+
+def is_stale(target: str) -> bool:
+    if not os.path.isdir(target):
+        return True
+    expected = shared_files()
+    present = [name for name in os.listdir(target) if name != '__pycache__']
+    if sorted(present) != expected:
+        return True
+    _, mismatch, errors = filecmp.cmpfiles(SHARED, target, expected, shallow=False)
+    return bool(mismatch or errors)
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description='Vendor backend/shared into each function for deployment')
+    parser.add_argument('functions', nargs='*', help='function directories (default: all)')
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument('--check', action='store_true', help='report stale copies instead of writing')
+    mode.add_argument('--clean', action='store_true', help='remove vendored copies')
+    args = parser.parse_args(argv)
+
+    unknown = set(args.functions) - set(functions())
+    if unknown:
+        parser.error('unknown functions: ' + ', '.join(sorted(unknown)))
+
+    stale = []
+    for function in args.functions or functions():
+        target = os.path.join(BACKEND, function, 'shared')
+        if args.check:
+            if is_stale(target):
+                stale.append(function)
+            continue
+        if os.path.isdir(target):
+            shutil.rmtree(target)
+        if not args.clean:
+            shutil.copytree(SHARED, target, ignore=shutil.ignore_patterns(*EXCLUDE))
+            print('vendored shared/ into ' + function)
+
+    for function in stale:
+        print('STALE ' + function + '/shared')
+    return 1 if stale else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
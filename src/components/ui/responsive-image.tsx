@@ -0,0 +1,55 @@
+import React from 'react';
+
+export interface ImageSource {
+  format: string;
+  width: number;
+  height: number;
+  url: string;
+}
+
+export interface ImageVariants {
+  width: number;
+  height: number;
+  placeholder: string;
+  sources: ImageSource[];
+}
+
+interface ResponsiveImageProps extends React.ImgHTMLAttributes<HTMLImageElement> {
+  src: string;
+  variants?: ImageVariants | null;
+  sizes?: string;
+}
+
+const srcSet = (sources: ImageSource[], format: string) =>
+  sources
+    .filter((source) => source.format === format)
+    .map((source) => `${source.url} ${source.width}w`)
+    .join(', ');
+
+const ResponsiveImage: React.FC<ResponsiveImageProps> = ({ src, variants, sizes = '100vw', style, ...props }) => {
+  if (!variants || !variants.sources.length) {
+    return <img src={src} loading="lazy" decoding="async" style={style} {...props} />;
+  }
+
+  const formats = ['avif', 'webp'].filter((format) => variants.sources.some((source) => source.format === format));
+
+  // Браузер выбирает первый поддерживаемый формат, оригинал — запасной вариант
+  return (
+    <picture className="contents">
+      {formats.map((format) => (
+        <source key={format} type={`image/${format}`} srcSet={srcSet(variants.sources, format)} sizes={sizes} />
+      ))}
+      <img
+        src={src}
+        width={variants.width}
+        height={variants.height}
+        loading="lazy"
+        decoding="async"
+        style={{ backgroundImage: `url(${variants.placeholder})`, backgroundSize: 'cover', ...style }}
+        {...props}
+      />
+    </picture>
+  );
+};
+
+export default ResponsiveImage;
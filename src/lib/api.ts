@@ -1,4 +1,4 @@
-const API_URLS = {
+const CLOUD_URLS = {
   auth: 'https://functions.poehali.dev/5a7e1b65-9d84-4af4-8aef-46cce101118e',
   dogs: 'https://functions.poehali.dev/248f0c32-575c-4187-aeaa-0c0c3d3cfdb8',
   litters: 'https://functions.poehali.dev/3cea0987-159b-4db3-9208-d034b7e59043',
@@ -6,6 +6,20 @@ const API_URLS = {
   messages: 'https://functions.poehali.dev/a0a7c0b7-511a-4b3f-aded-f47d31418940'
 };
 
+// VITE_API_BASE указывает на собственный шлюз (python -m shared.gateway): /dogs, /litters, ...
+const API_BASE = import.meta.env.VITE_API_BASE as string | undefined;
+
+const API_URLS = API_BASE
+  ? (Object.fromEntries(
+      Object.keys(CLOUD_URLS).map((name) => [name, `${API_BASE.replace(/\/$/, '')}/${name}`])
+    ) as typeof CLOUD_URLS)
+  : CLOUD_URLS;
+
+const sessionHeaders = (userRole: string) => ({
+  'X-User-Role': userRole,
+  'X-Session-Token': localStorage.getItem('sessionToken') || ''
+});
+
 export const api = {
   async login(username: string, password: string) {
     const response = await fetch(API_URLS.auth, {
@@ -26,19 +40,33 @@ export const api = {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
-        'X-User-Role': userRole
+        ...sessionHeaders(userRole)
       },
       body: JSON.stringify(data)
     });
     return response.json();
   },
 
+  // Частичное обновление; version — updated_at из списка, при чужой правке сервер вернёт 409
+  async patchDog(id: number, changes: any, userRole: string, version?: string) {
+    const response = await fetch(API_URLS.dogs, {
+      method: 'PATCH',
+      headers: {
+        'Content-Type': 'application/json',
+        ...(version ? { 'If-Match': `"${version}"` } : {}),
+        ...sessionHeaders(userRole)
+      },
+      body: JSON.stringify({ id, ...changes })
+    });
+    return response.json();
+  },
+
   async updateDog(data: any, userRole: string) {
     const response = await fetch(API_URLS.dogs, {
       method: 'PUT',
       headers: {
         'Content-Type': 'application/json',
-        'X-User-Role': userRole
+        ...sessionHeaders(userRole)
       },
       body: JSON.stringify(data)
     });
@@ -48,7 +76,7 @@ export const api = {
   async deleteDog(id: number, userRole: string) {
     const response = await fetch(`${API_URLS.dogs}?id=${id}`, {
       method: 'DELETE',
-      headers: { 'X-User-Role': userRole }
+      headers: sessionHeaders(userRole)
     });
     return response.json();
   },
@@ -63,19 +91,33 @@ export const api = {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
-        'X-User-Role': userRole
+        ...sessionHeaders(userRole)
       },
       body: JSON.stringify(data)
     });
     return response.json();
   },
 
+  // Частичное обновление; version — updated_at из списка, при чужой правке сервер вернёт 409
+  async patchLitter(id: number, changes: any, userRole: string, version?: string) {
+    const response = await fetch(API_URLS.litters, {
+      method: 'PATCH',
+      headers: {
+        'Content-Type': 'application/json',
+        ...(version ? { 'If-Match': `"${version}"` } : {}),
+        ...sessionHeaders(userRole)
+      },
+      body: JSON.stringify({ id, ...changes })
+    });
+    return response.json();
+  },
+
   async updateLitter(data: any, userRole: string) {
     const response = await fetch(API_URLS.litters, {
       method: 'PUT',
       headers: {
         'Content-Type': 'application/json',
-        'X-User-Role': userRole
+        ...sessionHeaders(userRole)
       },
       body: JSON.stringify(data)
     });
@@ -85,7 +127,7 @@ export const api = {
   async deleteLitter(id: number, userRole: string) {
     const response = await fetch(`${API_URLS.litters}?id=${id}`, {
       method: 'DELETE',
-      headers: { 'X-User-Role': userRole }
+      headers: sessionHeaders(userRole)
     });
     return response.json();
   },
@@ -100,7 +142,7 @@ export const api = {
       method: 'POST',
       headers: {
         'Content-Type': 'application/json',
-        'X-User-Role': userRole
+        ...sessionHeaders(userRole)
       },
       body: JSON.stringify(data)
     });
@@ -110,15 +152,15 @@ export const api = {
   async deletePhoto(id: number, userRole: string) {
     const response = await fetch(`${API_URLS.gallery}?id=${id}`, {
       method: 'DELETE',
-      headers: { 'X-User-Role': userRole }
+      headers: sessionHeaders(userRole)
     });
     return response.json();
   },
 
-  async sendMessage(data: any) {
+  async sendMessage(data: any, idempotencyKey: string = crypto.randomUUID()) {
     const response = await fetch(API_URLS.messages, {
       method: 'POST',
-      headers: { 'Content-Type': 'application/json' },
+      headers: { 'Content-Type': 'application/json', 'Idempotency-Key': idempotencyKey },
       body: JSON.stringify(data)
     });
     return response.json();
@@ -126,7 +168,26 @@ export const api = {
 
   async getMessages(userRole: string) {
     const response = await fetch(API_URLS.messages, {
-      headers: { 'X-User-Role': userRole }
+      headers: sessionHeaders(userRole)
+    });
+    return response.json();
+  },
+
+  async getMessagesSince(sinceId: number, userRole: string) {
+    const response = await fetch(`${API_URLS.messages}?since_id=${sinceId}`, {
+      headers: sessionHeaders(userRole)
+    });
+    return response.json();
+  },
+
+  async updateMessagesStatus(ids: number[], status: string, userRole: string) {
+    const response = await fetch(API_URLS.messages, {
+      method: 'PUT',
+      headers: {
+        'Content-Type': 'application/json',
+        ...sessionHeaders(userRole)
+      },
+      body: JSON.stringify({ ids, status })
     });
     return response.json();
   }
@@ -11,6 +11,8 @@ import { Label } from '@/components/ui/label';
 import Icon from '@/components/ui/icon';
 import { api } from '@/lib/api';
 
+const MESSAGE_POLL_INTERVAL = 30000;
+
 export default function Admin() {
   const { user, login, logout, isAdmin } = useAuth();
   const navigate = useNavigate();
@@ -28,6 +30,24 @@ export default function Admin() {
     }
   }, [isAdmin]);
 
+  // Новые сообщения подгружаются инкрементально по id, без полной перезагрузки
+  useEffect(() => {
+    if (!isAdmin) return;
+    const timer = setInterval(async () => {
+      const lastId = messages.reduce((max: number, msg: any) => Math.max(max, msg.id), 0);
+      if (!lastId) return;
+      try {
+        const data = await api.getMessagesSince(lastId, user?.role || 'admin');
+        if (data.messages?.length) {
+          setMessages((current: any[]) => [...data.messages.reverse(), ...current]);
+        }
+      } catch (error) {
+        console.error('Error polling messages:', error);
+      }
+    }, MESSAGE_POLL_INTERVAL);
+    return () => clearInterval(timer);
+  }, [isAdmin, messages]);
+
   const loadData = async () => {
     setLoading(true);
     try {
@@ -6,6 +6,7 @@ import { Input } from '@/components/ui/input';
 import { Textarea } from '@/components/ui/textarea';
 import { Badge } from '@/components/ui/badge';
 import Icon from '@/components/ui/icon';
+import ResponsiveImage from '@/components/ui/responsive-image';
 import { api } from '@/lib/api';
 import { useAuth } from '@/contexts/AuthContext';
 
@@ -218,8 +219,10 @@ export default function Index() {
                 style={{ animationDelay: `${index * 150}ms` }}
               >
                 <div className="relative overflow-hidden h-80">
-                  <img 
+                  <ResponsiveImage
                     src={dog.image_url}
+                    variants={dog.image_variants}
+                    sizes="(min-width: 768px) 50vw, 100vw"
                     alt={dog.name}
                     className="w-full h-full object-cover transition-transform duration-700 hover:scale-110"
                   />
@@ -286,8 +289,10 @@ export default function Index() {
               <Card key={litter.id} className="overflow-hidden border-2 mb-8">
                 <div className="md:flex">
                   <div className="md:w-2/5 relative overflow-hidden h-80 md:h-auto">
-                    <img 
+                    <ResponsiveImage
                       src={litter.image_url}
+                      variants={litter.image_variants}
+                      sizes="(min-width: 768px) 40vw, 100vw"
                       alt={litter.name}
                       className="w-full h-full object-cover"
                     />
@@ -385,8 +390,10 @@ export default function Index() {
                 className="relative overflow-hidden rounded-lg aspect-square group cursor-pointer animate-scale-in"
                 style={{ animationDelay: `${i * 50}ms` }}
               >
-                <img 
+                <ResponsiveImage
                   src={photo.image_url}
+                  variants={photo.image_variants}
+                  sizes="(min-width: 768px) 25vw, 50vw"
                   alt={photo.title || `Галерея ${i + 1}`}
                   className="w-full h-full object-cover transition-transform duration-500 group-hover:scale-110"
                 />